@@ -13,8 +13,33 @@
 // VTK includes
 #include <vtkCellArray.h>
 #include <vtkCellDataToPointData.h>
+#include <vtkCompositeDataSet.h>
+#include <vtkInformation.h>
+#include <vtkIntArray.h>
+#include <vtkMultiBlockDataSet.h>
+#include <vtkPoints.h>
 #include <vtkPolyData.h>
 #include <vtkPointData.h>
+#include <vtkSmartPointer.h>
+#include <vtkTransform.h>
+#include <vtkTransformPolyDataFilter.h>
+#include <vtkXMLMultiBlockDataWriter.h>
+#include <vtksys/SystemTools.hxx>
+
+// STD includes
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <sstream>
+#include <string>
+#include <vector>
+
+#ifdef _WIN32
+#include <fcntl.h>
+#include <io.h>
+#else
+#include <unistd.h>
+#endif
 
 // MRML includes
 #include "vtkMRMLModelStorageNode.h"
@@ -46,27 +71,53 @@ unsigned int count_nnz(vnl_sparse_matrix<T> &mat)
   return nnz;
 }
 
-} // end of anonymous namespace
+bool writeModel(vtkPolyData *polydata, const std::string &fileName)
+{
+  vtkNew<vtkMRMLModelNode> outputModelNode;
+  outputModelNode->SetAndObservePolyData(polydata);
+  vtkNew<vtkMRMLModelStorageNode> outputModelStorageNode;
+  outputModelStorageNode->SetFileName(fileName.c_str());
+  if (!outputModelStorageNode->WriteData(outputModelNode)) {
+    std::cerr << "Failed to write output model file " << fileName << std::endl;
+    return false;
+  }
+  return true;
+}
 
+// Models are read into RAS, blocks of a multiblock file are written in LPS like the model files
+vtkSmartPointer<vtkPolyData> toFileCoordinates(vtkPolyData *polydata)
+{
+  vtkNew<vtkTransform> rasToLps;
+  rasToLps->Scale(-1.0, -1.0, 1.0);
+  vtkNew<vtkTransformPolyDataFilter> transformFilter;
+  transformFilter->SetTransform(rasToLps);
+  transformFilter->SetInputData(polydata);
+  transformFilter->Update();
+  return transformFilter->GetOutput();
+}
 
-int main(int argc, char *argv[]) {
-  PARSE_ARGS;
-  // This inflation code accepts non-mesh medial surfaces, i.e., medial surfaces with branches
+std::string sweepBlockName(double r)
+{
+  std::ostringstream name;
+  name << "r" << r;
+  return name.str();
+}
 
-  // read the poly data
-  vtkNew<vtkMRMLModelStorageNode> modelStorageNode;
-  vtkNew<vtkMRMLModelNode> modelNode;
-  modelStorageNode->SetFileName(inputSurface.c_str());
-  if (!modelStorageNode->ReadData(modelNode)) {
-    std::cerr << "Failed to read input model file " << inputSurface << std::endl;
-    return EXIT_FAILURE;
-  }
+// Inflated mesh of a medial surface: the triangles, and per vertex the medial position, the sum of the normals of its
+// triangles, the number of its triangles and the index of its medial vertex
+struct InflationTopology
+{
+  vnl_matrix<unsigned int> m_tri;
+  vnl_matrix<double> m_pt, m_pt_offset;
+  std::vector<unsigned int> valence;
+  vnl_vector<int> m_mindex;
 
-  // Convert it into a triangle mesh
-  vtkPolyData *pd = modelNode->GetPolyData();
-  vtkDataArray *alab = pd->GetPointData()->GetArray("Label");
-  unsigned int nv = (unsigned int) pd->GetNumberOfPoints();
+  vtkSmartPointer<vtkPolyData> inflate(double r) const;
+};
 
+// Builds the inflated mesh topology of a medial surface, which may have branches
+InflationTopology buildTopology(vtkPolyData *pd)
+{
   // An edge is a pair of vertices, always stored in sorted order
   typedef std::pair<unsigned int, unsigned int> Edge;
 
@@ -261,16 +312,23 @@ int main(int argc, char *argv[]) {
 
   // Now we have a valid mesh structure in place. We can store this into a proper
   // triangle array
-  vnl_matrix<unsigned int> m_tri(tdup.size(), 3);
+  InflationTopology topology;
+  vnl_matrix<unsigned int> &m_tri = topology.m_tri;
+  m_tri.set_size(tdup.size(), 3);
 
   // We also need to compute the positions of the new vertices, i.e., by pushing them out
   // along the outward normals. We initialize each point to its original mesh location and
   // then add to the vertex all the normals of all the triangles that contain it
-  vnl_matrix<double> m_pt(vcurr, 3), m_pt_offset(vcurr, 3);
-  std::vector<unsigned int> valence(vcurr, 0);
+  vnl_matrix<double> &m_pt = topology.m_pt, &m_pt_offset = topology.m_pt_offset;
+  m_pt.set_size(vcurr, 3);
+  m_pt_offset.set_size(vcurr, 3);
+  m_pt_offset.fill(0.0);
+  std::vector<unsigned int> &valence = topology.valence;
+  valence.assign(vcurr, 0);
 
   // Create the medial index array - this is just the original medial vertex
-  vnl_vector<int> m_mindex(vcurr);
+  vnl_vector<int> &m_mindex = topology.m_mindex;
+  m_mindex.set_size(vcurr);
 
   // First pass through triangles, assigning new vertices and vertex coordinates
   for(unsigned int i = 0; i < tdup.size(); i++)
@@ -303,11 +361,13 @@ int main(int argc, char *argv[]) {
     }
   }
 
-  // Offset the vertices
-  for(unsigned int j = 0; j < vcurr; j++)
-    m_pt.set_row(j, m_pt.get_row(j) + rad * m_pt_offset.get_row(j) / valence[j]);
+  return topology;
+}
 
-  vtkNew<vtkPolyData> vmb;
+// The topology does not depend on the radius, so every requested radius only offsets the vertices
+vtkSmartPointer<vtkPolyData> InflationTopology::inflate(double r) const
+{
+  vtkSmartPointer<vtkPolyData> vmb = vtkSmartPointer<vtkPolyData>::New();
 
   vtkNew<vtkCellArray> cells;
   for (unsigned int i = 0; i < m_tri.rows(); i++)
@@ -320,8 +380,12 @@ int main(int argc, char *argv[]) {
   assert(m_pt.columns() == 3);
   vtkNew<vtkPoints> pts;
   pts->SetNumberOfPoints(m_pt.rows());
-  for (int i = 0; i < m_pt.rows(); i++)
-    pts->SetPoint(i, m_pt(i, 0), m_pt(i, 1), m_pt(i, 2));
+  for (unsigned int i = 0; i < m_pt.rows(); i++)
+  {
+    // Offset the vertex
+    vnl_vector<double> X = m_pt.get_row(i) + r * m_pt_offset.get_row(i) / valence[i];
+    pts->SetPoint(i, X[0], X[1], X[2]);
+  }
 
   vmb->SetPoints(pts);
 
@@ -330,18 +394,196 @@ int main(int argc, char *argv[]) {
   arr->SetNumberOfTuples(m_mindex.size());
   arr->SetName("MedialIndex");
   // Update the points
-  for (int i = 0; i < m_mindex.size(); i++)
+  for (unsigned int i = 0; i < m_mindex.size(); i++)
     arr->SetTuple1(i, m_mindex[i]);
   vmb->GetPointData()->AddArray(arr);
+  return vmb;
+}
 
-  vtkNew<vtkMRMLModelNode> outputModelNode;
-  outputModelNode->SetAndObservePolyData(vmb);
-  vtkNew<vtkMRMLModelStorageNode> outputModelStorageNode;
-  outputModelStorageNode->SetFileName(outputSurface.c_str());
-  if (!outputModelStorageNode->WriteData(outputModelNode)) {
-    std::cerr << "Failed to write output model file " << outputSurface << std::endl;
+bool readExactly(FILE *stream, void *buffer, size_t size)
+{
+  return size == 0 || fread(buffer, 1, size, stream) == size;
+}
+
+bool writeExactly(FILE *stream, const void *buffer, size_t size)
+{
+  return size == 0 || fwrite(buffer, 1, size, stream) == size;
+}
+
+bool writeError(FILE *stream, const std::string &message)
+{
+  uint64_t length = message.size();
+  return writeExactly(stream, "FAIL", 4) && writeExactly(stream, &length, sizeof(length)) &&
+         writeExactly(stream, message.data(), message.size());
+}
+
+// Server mode (InflateMedialModel --server) of a long-lived worker process, see SyntheticSkeletonLib/InflationWorker.py.
+// Meshes are exchanged through stdin/stdout in native byte order, requests are answered in order until stdin is closed:
+//   request:  "INFL", uint64 points, uint64 triangles, uint64 radii,
+//             double[points][3] medial vertices (RAS), int64[triangles][3], double[radii]
+//   response: "DONE", uint64 points, uint64 triangles, int64[triangles][3], int32[points] medial index,
+//             float[points][3] per radius (the vertices of the CLI output model before it is written)
+//             or "FAIL", uint64 length, message
+// The diagnostic output of buildTopology is redirected to stderr.
+int runServer()
+{
+#ifdef _WIN32
+  _setmode(_fileno(stdin), _O_BINARY);
+  int responseFd = _dup(_fileno(stdout));
+  _dup2(_fileno(stderr), _fileno(stdout));
+  FILE *response = _fdopen(responseFd, "wb");
+#else
+  int responseFd = dup(fileno(stdout));
+  dup2(fileno(stderr), fileno(stdout));
+  FILE *response = fdopen(responseFd, "wb");
+#endif
+  if (!response)
+  {
+    std::cerr << "Failed to open the response stream" << std::endl;
     return EXIT_FAILURE;
   }
 
+  char magic[4];
+  while (readExactly(stdin, magic, sizeof(magic)))
+  {
+    uint64_t header[3];
+    if (memcmp(magic, "INFL", 4) != 0 || !readExactly(stdin, header, sizeof(header)))
+    {
+      std::cerr << "Invalid inflation request" << std::endl;
+      return EXIT_FAILURE;
+    }
+    std::vector<double> points(header[0] * 3), radii(header[2]);
+    std::vector<int64_t> triangles(header[1] * 3);
+    if (!readExactly(stdin, points.data(), points.size() * sizeof(double)) ||
+        !readExactly(stdin, triangles.data(), triangles.size() * sizeof(int64_t)) ||
+        !readExactly(stdin, radii.data(), radii.size() * sizeof(double)))
+    {
+      std::cerr << "Incomplete inflation request" << std::endl;
+      return EXIT_FAILURE;
+    }
+
+    vtkNew<vtkPoints> pts;
+    pts->SetDataTypeToDouble();
+    pts->SetNumberOfPoints(header[0]);
+    for (vtkIdType i = 0; i < (vtkIdType) header[0]; i++)
+      pts->SetPoint(i, &points[3 * i]);
+    vtkNew<vtkCellArray> cells;
+    for (size_t i = 0; i < header[1]; i++)
+    {
+      cells->InsertNextCell(3);
+      for (unsigned int a = 0; a < 3; a++)
+        cells->InsertCellPoint(triangles[3 * i + a]);
+    }
+    vtkNew<vtkPolyData> pd;
+    pd->SetPoints(pts);
+    pd->SetPolys(cells);
+
+    bool written;
+    try
+    {
+      InflationTopology topology = buildTopology(pd);
+      uint64_t counts[2] = { topology.m_pt.rows(), topology.m_tri.rows() };
+      std::vector<int64_t> outputTriangles(topology.m_tri.rows() * 3);
+      for (unsigned int i = 0; i < topology.m_tri.rows(); i++)
+        for (unsigned int a = 0; a < 3; a++)
+          outputTriangles[3 * i + a] = topology.m_tri(i, a);
+      std::vector<int32_t> medialIndex(topology.m_mindex.begin(), topology.m_mindex.end());
+
+      written = writeExactly(response, "DONE", 4) && writeExactly(response, counts, sizeof(counts)) &&
+                writeExactly(response, outputTriangles.data(), outputTriangles.size() * sizeof(int64_t)) &&
+                writeExactly(response, medialIndex.data(), medialIndex.size() * sizeof(int32_t));
+      std::vector<float> inflatedPoints(counts[0] * 3);
+      for (size_t r = 0; r < radii.size() && written; r++)
+      {
+        vtkPoints *inflated = topology.inflate(radii[r])->GetPoints();
+        for (vtkIdType i = 0; i < (vtkIdType) counts[0]; i++)
+        {
+          double X[3];
+          inflated->GetPoint(i, X);
+          for (unsigned int a = 0; a < 3; a++)
+            inflatedPoints[3 * i + a] = (float) X[a];
+        }
+        written = writeExactly(response, inflatedPoints.data(), inflatedPoints.size() * sizeof(float));
+      }
+    }
+    catch (std::exception &exc)
+    {
+      written = writeError(response, exc.what());
+    }
+    if (!written || fflush(response) != 0)
+    {
+      std::cerr << "Failed to write inflation response" << std::endl;
+      return EXIT_FAILURE;
+    }
+  }
+  return EXIT_SUCCESS;
+}
+
+} // end of anonymous namespace
+
+
+int main(int argc, char *argv[]) {
+  // not a parameter of the module description since the server mode has no input and output models
+  if (argc == 2 && std::string(argv[1]) == "--server")
+    return runServer();
+
+  PARSE_ARGS;
+  // This inflation code accepts non-mesh medial surfaces, i.e., medial surfaces with branches
+
+  // read the poly data
+  vtkNew<vtkMRMLModelStorageNode> modelStorageNode;
+  vtkNew<vtkMRMLModelNode> modelNode;
+  modelStorageNode->SetFileName(inputSurface.c_str());
+  if (!modelStorageNode->ReadData(modelNode)) {
+    std::cerr << "Failed to read input model file " << inputSurface << std::endl;
+    return EXIT_FAILURE;
+  }
+
+  InflationTopology topology = buildTopology(modelNode->GetPolyData());
+  auto inflate = [&](double r) { return topology.inflate(r); };
+
+  if (!writeModel(inflate(rad), outputSurface))
+    return EXIT_FAILURE;
+
+  // Radius sweep: all radii from the same topology, written into one multiblock file (.vtm) or one file per radius
+  if (!radii.empty())
+  {
+    if (sweepOutput.empty())
+    {
+      std::cerr << "A sweep output file is required for a radius sweep" << std::endl;
+      return EXIT_FAILURE;
+    }
+    std::string extension = vtksys::SystemTools::GetFilenameLastExtension(sweepOutput);
+    if (extension == ".vtm")
+    {
+      vtkNew<vtkMultiBlockDataSet> blocks;
+      blocks->SetNumberOfBlocks(radii.size());
+      for (unsigned int i = 0; i < radii.size(); i++)
+      {
+        blocks->SetBlock(i, toFileCoordinates(inflate(radii[i])));
+        blocks->GetMetaData(i)->Set(vtkCompositeDataSet::NAME(), sweepBlockName(radii[i]).c_str());
+      }
+      vtkNew<vtkXMLMultiBlockDataWriter> writer;
+      writer->SetFileName(sweepOutput.c_str());
+      writer->SetInputData(blocks);
+      if (!writer->Write())
+      {
+        std::cerr << "Failed to write sweep output file " << sweepOutput << std::endl;
+        return EXIT_FAILURE;
+      }
+    }
+    else
+    {
+      std::string directory = vtksys::SystemTools::GetFilenamePath(sweepOutput);
+      std::string stem = (directory.empty() ? "" : directory + "/") +
+                         vtksys::SystemTools::GetFilenameWithoutLastExtension(sweepOutput);
+      for (double r : radii)
+      {
+        if (!writeModel(inflate(r), stem + "_" + sweepBlockName(r) + extension))
+          return EXIT_FAILURE;
+      }
+    }
+  }
+
   return EXIT_SUCCESS;
 }
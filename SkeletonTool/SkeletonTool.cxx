@@ -26,6 +26,25 @@
 #include <vtkPolyDataConnectivityFilter.h>
 #include <vtkTriangle.h>
 #include <vtkPolyDataNormals.h>
+#include <vtkIdTypeArray.h>
+#include <vtkXMLPolyDataReader.h>
+#include <vtkXMLPolyDataWriter.h>
+#include <vtksys/SystemTools.hxx>
+
+// STD includes
+#include <atomic>
+#include <cstdint>
+#include <cstdio>
+#include <iomanip>
+#include <random>
+#include <sstream>
+
+#ifdef _WIN32
+#include <process.h>
+#define getpid _getpid
+#else
+#include <unistd.h>
+#endif
 
 // MRML includes
 #include "vtkMRMLModelStorageNode.h"
@@ -56,6 +75,144 @@ namespace {
     }
 
 
+    /** 64 bit FNV-1a hash */
+    inline void HashBytes(uint64_t &hash, const void *data, size_t size) {
+      const unsigned char *bytes = static_cast<const unsigned char *>(data);
+      for (size_t i = 0; i < size; i++) {
+        hash ^= bytes[i];
+        hash *= 1099511628211ULL;
+      }
+    }
+
+    /** Key of the Voronoi cache: cleaned input mesh and the inside/outside tolerance */
+    uint64_t HashBoundary(vtkPolyData *bnd, double xSearchTol) {
+      uint64_t hash = 14695981039346656037ULL;
+      const int version = 1;
+      HashBytes(hash, &version, sizeof(version));
+      HashBytes(hash, &xSearchTol, sizeof(xSearchTol));
+      for (vtkIdType i = 0; i < bnd->GetNumberOfPoints(); i++) {
+        double x[3];
+        bnd->GetPoint(i, x);
+        HashBytes(hash, x, sizeof(x));
+      }
+      vtkIdType npts;
+      const vtkIdType *ptIds;
+      vtkCellArray *polys = bnd->GetPolys();
+      polys->InitTraversal();
+      while (polys->GetNextCell(npts, ptIds)) {
+        HashBytes(hash, &npts, sizeof(npts));
+        HashBytes(hash, ptIds, npts * sizeof(vtkIdType));
+      }
+      return hash;
+    }
+
+    /**
+     * Voronoi vertices, candidate faces (finite and inside the mesh) with their generator points and the distances
+     * between the generators computed so far. Distances come from Dijkstra runs limited to a bound; a distance is
+     * stored as (distance, bound) and is exact if it does not exceed the bound. Otherwise it is the tentative distance
+     * at which that run stopped, and the true distance is only known to exceed the bound.
+     */
+    struct VoronoiCache {
+      vtkNew<vtkPoints> Points;
+      vtkNew<vtkCellArray> Faces;
+      vtkNew<vtkIdTypeArray> Generators;
+      vtkNew<vtkDoubleArray> EdgeDistance;
+      vtkNew<vtkDoubleArray> GeodesicDistance;
+
+      VoronoiCache() {
+        Generators->SetNumberOfComponents(2);
+        Generators->SetName("Generators");
+        EdgeDistance->SetNumberOfComponents(2);
+        EdgeDistance->SetName("EdgeDistance");
+        GeodesicDistance->SetNumberOfComponents(2);
+        GeodesicDistance->SetName("GeodesicDistance");
+      }
+
+      void AddFace(vtkIdType m, const vtkIdType *ids, vtkIdType ip1, vtkIdType ip2) {
+        Faces->InsertNextCell(m, ids);
+        Generators->InsertNextTuple2(ip1, ip2);
+        // bound -1: not computed yet
+        EdgeDistance->InsertNextTuple2(0, -1);
+        GeodesicDistance->InsertNextTuple2(0, -1);
+      }
+
+      /** Returns the cached distance if it decides a comparison against threshold */
+      bool Lookup(vtkDoubleArray *distances, vtkIdType face, double threshold, double &distance) const {
+        double *entry = distances->GetTuple2(face);
+        if (entry[1] < 0 || (entry[0] > entry[1] && entry[1] < threshold))
+          return false;
+        distance = entry[0];
+        return true;
+      }
+
+      /**
+       * Returns the cached distance if it is the one a run limited to bound computes: an exact distance within bound,
+       * or the tentative distance of a run with the same bound. Used for distances that are written to the output,
+       * which must not depend on the runs that filled the cache.
+       */
+      bool LookupExact(vtkDoubleArray *distances, vtkIdType face, double bound, double &distance) const {
+        double *entry = distances->GetTuple2(face);
+        if (entry[1] < 0 || !((entry[0] <= entry[1] && entry[0] <= bound) || entry[1] == bound))
+          return false;
+        distance = entry[0];
+        return true;
+      }
+
+      void Store(vtkDoubleArray *distances, vtkIdType face, double distance, double bound) {
+        if (bound > distances->GetComponent(face, 1))
+          distances->SetTuple2(face, distance, bound);
+      }
+
+      bool Read(const std::string &fileName) {
+        vtkNew<vtkXMLPolyDataReader> reader;
+        reader->SetFileName(fileName.c_str());
+        reader->Update();
+        vtkPolyData *pd = reader->GetOutput();
+        vtkCellData *cd = pd->GetCellData();
+        if (!pd->GetPoints() || !cd->GetArray("Generators") || !cd->GetArray("EdgeDistance") ||
+            !cd->GetArray("GeodesicDistance"))
+          return false;
+        Points->DeepCopy(pd->GetPoints());
+        Faces->DeepCopy(pd->GetPolys());
+        Generators->DeepCopy(cd->GetArray("Generators"));
+        EdgeDistance->DeepCopy(cd->GetArray("EdgeDistance"));
+        GeodesicDistance->DeepCopy(cd->GetArray("GeodesicDistance"));
+        return Generators->GetNumberOfTuples() == Faces->GetNumberOfCells();
+      }
+
+      /** Writes through a temporary file so that concurrent runs never read a partially written cache */
+      bool Write(const std::string &fileName) {
+        vtkNew<vtkPolyData> pd;
+        pd->SetPoints(Points);
+        pd->SetPolys(Faces);
+        pd->GetCellData()->AddArray(Generators);
+        pd->GetCellData()->AddArray(EdgeDistance);
+        pd->GetCellData()->AddArray(GeodesicDistance);
+
+        vtksys::SystemTools::MakeDirectory(vtksys::SystemTools::GetFilenamePath(fileName));
+        // unique per process and write, parallel runs (e.g. PruneSweep) write the same cache
+        static std::atomic<unsigned int> counter(0);
+        std::ostringstream tempName;
+        tempName << fileName << "." << getpid() << "." << counter++ << "." << std::hex << std::random_device()()
+                 << ".tmp";
+        vtkNew<vtkXMLPolyDataWriter> writer;
+        writer->SetFileName(tempName.str().c_str());
+        writer->SetInputData(pd);
+        writer->SetDataModeToAppended();
+        if (!writer->Write())
+          return false;
+        if (std::rename(tempName.str().c_str(), fileName.c_str()) != 0) {
+          // Windows does not replace existing files
+          std::remove(fileName.c_str());
+          if (std::rename(tempName.str().c_str(), fileName.c_str()) != 0) {
+            std::remove(tempName.str().c_str());
+            return false;
+          }
+        }
+        return true;
+      }
+    };
+
 } // end of anonymous namespace
 
 int main(int argc, char *argv[]) {
@@ -92,93 +249,153 @@ int main(int argc, char *argv[]) {
   vtkBoundingBox fBoundBox;
   fBoundBox.SetBounds(bbBnd);
 
-  std::vector<double> points_3D;
-  for (vtkIdType i = 0; i < bnd->GetNumberOfPoints(); i++) {
-    points_3D.push_back(bnd->GetPoint(i)[0]);
-    points_3D.push_back(bnd->GetPoint(i)[1]);
-    points_3D.push_back(bnd->GetPoint(i)[2]);
+  // Voronoi vertices and the faces that are finite and inside the mesh (the pruning candidates), either from the
+  // cache or computed with qhull
+  VoronoiCache cache;
+  std::string fnCache;
+  bool cacheModified = false;
+  if (!cacheDirectory.empty()) {
+    std::ostringstream name;
+    name << cacheDirectory << "/SkeletonToolVoronoi_" << std::hex << std::setw(16) << std::setfill('0')
+         << HashBoundary(bnd, xSearchTol) << ".vtp";
+    fnCache = name.str();
   }
 
-  // Create a temporary file where to store the points
-  char *fnPoints = tmpnam(NULL);
-  string fnVoronoiOutput = string(fnPoints) + "_voronoi.txt";
-  cout << fnVoronoiOutput.c_str() << endl;
-  FILE *output = fopen(fnVoronoiOutput.c_str(), "w");
-
-  // https://github.com/ros-planning/geometric_shapes/blob/3c23af045de12eee725205f3e9e1c42aa1d53dc8/src/bodies.cpp#L934-L941
-  static FILE* null = fopen("/dev/null", "w");
-
-  int ndim = 3;
-  int num_points = points_3D.size() / ndim;
-
-  char qhull_cmd[] = "qhull v Qbb p Fv";
-  qhT qh_qh;
-  qhT* qh = &qh_qh;
-  QHULL_LIB_CHECK
-  qh_zero(qh, null);
-  int exitcode = qh_new_qhull(qh, 3, num_points, points_3D.data(), false, qhull_cmd, output, null);
-
-  if (exitcode != 0)
-  {
-    cerr << "Call to QVoronoi failed" << endl;
-    return -1;
+  if (!fnCache.empty() && vtksys::SystemTools::FileExists(fnCache.c_str(), true) && cache.Read(fnCache)) {
+    cout << "Read Voronoi diagram from cache " << fnCache << endl;
   }
+  else if (pruneOnly) {
+    std::cerr << "No cached Voronoi diagram for this input in '" << cacheDirectory << "'" << std::endl;
+    return EXIT_FAILURE;
+  }
+  else {
+    std::vector<double> points_3D;
+    for (vtkIdType i = 0; i < bnd->GetNumberOfPoints(); i++) {
+      points_3D.push_back(bnd->GetPoint(i)[0]);
+      points_3D.push_back(bnd->GetPoint(i)[1]);
+      points_3D.push_back(bnd->GetPoint(i)[2]);
+    }
 
-  // Process qhull voronoi output
+    // Create a temporary file where to store the points
+    char *fnPoints = tmpnam(NULL);
+    string fnVoronoiOutput = string(fnPoints) + "_voronoi.txt";
+    cout << fnVoronoiOutput.c_str() << endl;
+    FILE *output = fopen(fnVoronoiOutput.c_str(), "w");
+
+    // https://github.com/ros-planning/geometric_shapes/blob/3c23af045de12eee725205f3e9e1c42aa1d53dc8/src/bodies.cpp#L934-L941
+    static FILE* null = fopen("/dev/null", "w");
+
+    int ndim = 3;
+    int num_points = points_3D.size() / ndim;
+
+    char qhull_cmd[] = "qhull v Qbb p Fv";
+    qhT qh_qh;
+    qhT* qh = &qh_qh;
+    QHULL_LIB_CHECK
+    qh_zero(qh, null);
+    int exitcode = qh_new_qhull(qh, 3, num_points, points_3D.data(), false, qhull_cmd, output, null);
+
+    if (exitcode != 0)
+    {
+      cerr << "Call to QVoronoi failed" << endl;
+      return -1;
+    }
+    fclose(output);
 
-  // Load the file
-  ifstream fin(fnVoronoiOutput.c_str());
+    // Process qhull voronoi output
 
-  // Load the numbers
-  size_t nv, np, junk;
+    // Load the file
+    ifstream fin(fnVoronoiOutput.c_str());
 
-  // First two lines
-  fin >> junk;
-  fin >> nv;
+    // Load the numbers
+    size_t nv, np, junk;
 
-  vtkNew<vtkSelectEnclosedPoints> sel;
-  sel->SetTolerance(xSearchTol);
-  sel->Initialize(bnd);
+    // First two lines
+    fin >> junk;
+    fin >> nv;
 
-  // Create an array of points
-  vtkNew<vtkPoints> pts;
-  pts->SetNumberOfPoints(nv);
+    vtkNew<vtkSelectEnclosedPoints> sel;
+    sel->SetTolerance(xSearchTol);
+    sel->Initialize(bnd);
 
-  // Create an array of in/out flags
-  bool *ptin = new bool[nv];
+    // Create an array of points
+    cache.Points->SetNumberOfPoints(nv);
 
-  // Progress bar
-  cout << "Selecting points inside mesh (n = " << nv << ")" << endl;
-  cout << "|         |         |         |         |         |" << endl;
-  size_t next_prog_mark = nv / 50;
-
-  for (size_t i = 0; i < nv; i++) {
-    double x, y, z;
-    fin >> x;
-    fin >> y;
-    fin >> z;
-    pts->SetPoint(i, x, y, z);
-
-    // Is this point outside of the bounding box
-    if (xSearchTol > 0)
-      ptin[i] = fBoundBox.ContainsPoint(x, y, z) && sel->IsInsideSurface(x, y, z);
-    else
-      ptin[i] = fBoundBox.ContainsPoint(x, y, z);
-
-    if (i >= next_prog_mark) {
-      cout << "." << flush;
-      next_prog_mark += nv / 50;
+    // Create an array of in/out flags
+    bool *ptin = new bool[nv];
+
+    // Progress bar
+    cout << "Selecting points inside mesh (n = " << nv << ")" << endl;
+    cout << "|         |         |         |         |         |" << endl;
+    size_t next_prog_mark = nv / 50;
+
+    for (size_t i = 0; i < nv; i++) {
+      double x, y, z;
+      fin >> x;
+      fin >> y;
+      fin >> z;
+      cache.Points->SetPoint(i, x, y, z);
+
+      // Is this point outside of the bounding box
+      if (xSearchTol > 0)
+        ptin[i] = fBoundBox.ContainsPoint(x, y, z) && sel->IsInsideSurface(x, y, z);
+      else
+        ptin[i] = fBoundBox.ContainsPoint(x, y, z);
+
+      if (i >= next_prog_mark) {
+        cout << "." << flush;
+        next_prog_mark += nv / 50;
+      }
     }
+    cout << "." << endl;
+
+    // Read the number of cells
+    fin >> np;
+
+    // iterating over cells
+    for (size_t j = 0; j < np; j++) {
+      bool isinf = false;
+      bool isout = false;
+
+      size_t m;
+      fin >> m;
+      m -= 2;
+      vtkIdType ip1, ip2; // reading first two points of cell
+      fin >> ip1;
+      fin >> ip2;
+
+      // reading rest of cells
+      vtkIdType *ids = new vtkIdType[m];
+      for (size_t k = 0; k < m; k++) {
+        fin >> ids[k];
+
+        // Is this point at infinity?
+        if (ids[k] == 0) isinf = true; else ids[k]--;
+        if (!ptin[ids[k]]) isout = true;
+      }
+
+      if (!isinf && !isout)
+        cache.AddFace(m, ids, ip1, ip2);
+
+      delete[] ids;
+    }
+    delete[] ptin;
+
+    // Clean up files
+    if (fin.is_open()) {
+      fin.close();
+      remove(fnVoronoiOutput.c_str());
+    }
+    remove(fnPoints);
+    cacheModified = true;
   }
-  cout << "." << endl;
 
-  // Read the number of cells
-  fin >> np;
+  vtkIdType np = cache.Faces->GetNumberOfCells();
 
   // Progress bar
   cout << "Selecting faces using pruning criteria (n = " << np << ")" << endl;
   cout << "|         |         |         |         |         |" << endl;
-  next_prog_mark = np / 50;
+  vtkIdType next_prog_mark = np / 50;
 
   // Create and configure Dijkstra's alg for geodesic distance
   VTKMeshHalfEdgeWrapper hewrap_geo(bnd);
@@ -196,8 +413,8 @@ int main(int argc, char *argv[]) {
   dijkstra_edge.SetEdgeWeightFunction(&wfunc_edge);
   dijkstra_edge.ComputeGraph();
 
-  // Keep track of number pruned
-  size_t npruned_geo = 0, npruned_edge = 0;
+  // Keep track of number pruned and of the distances taken from the cache
+  size_t npruned_geo = 0, npruned_edge = 0, ncached = 0;
 
   // Create the polygons
   vtkNew<vtkCellArray> cells;
@@ -217,100 +434,93 @@ int main(int argc, char *argv[]) {
   daGeod->SetNumberOfComponents(1);
   daGeod->SetName("Geodesic");
 
-  // iterating over cells
-  for (size_t j = 0; j < np; j++) {
-    bool isinf = false;
-    bool isout = false;
-
-    size_t m;
-    fin >> m;
-    m -= 2;
-    vtkIdType ip1, ip2; // reading first two points of cell
-    fin >> ip1;
-    fin >> ip2;
-
-    // reading rest of cells
-    vtkIdType *ids = new vtkIdType[m];
-    for (size_t k = 0; k < m; k++) {
-      fin >> ids[k];
-
-      // Is this point at infinity?
-      if (ids[k] == 0) isinf = true; else ids[k]--;
-      if (!ptin[ids[k]]) isout = true;
+  vtkIdType m;
+  const vtkIdType *ids;
+  cache.Faces->InitTraversal();
+  for (vtkIdType j = 0; cache.Faces->GetNextCell(m, ids); j++) {
+    vtkIdType ip1 = cache.Generators->GetComponent(j, 0);
+    vtkIdType ip2 = cache.Generators->GetComponent(j, 1);
+    bool pruned = false;
+    double r = 0, dgeo = 0;
+
+    // Get the edge distance between generators
+    double elen;
+    if (cache.Lookup(cache.EdgeDistance, j, nDegrees, elen)) {
+      ncached++;
     }
-
-    if (!isinf && !isout) {
-      bool pruned = false;
-      double r = 0, dgeo = 0;
-
-      // Get the edge distance between generators
+    else {
       dijkstra_edge.ComputeDistances(ip1, nDegrees);
-      double elen = dijkstra_edge.GetVertexDistance(ip2);
-      if (elen < nDegrees) {
-        pruned = true;
-        npruned_edge++;
+      elen = dijkstra_edge.GetVertexDistance(ip2);
+      cache.Store(cache.EdgeDistance, j, elen, nDegrees);
+      cacheModified = true;
+    }
+    if (elen < nDegrees) {
+      pruned = true;
+      npruned_edge++;
+    }
+    else {
+      // Get the Euclidean distance between generator points
+      double ipDb1[3];
+      double ipDb2[3];
+      float ipFt1[3];
+      float ipFt2[3];
+      bnd->GetPoint(ip1, ipDb1);
+      bnd->GetPoint(ip2, ipDb2);
+      for (int i = 0; i < 3; i++) {
+        ipFt1[i] = (float) ipDb1[i];
+        ipFt2[i] = (float) ipDb2[i];
+      }
+      vnl_vector_fixed<float, 3> p1(ipFt1);
+      vnl_vector_fixed<float, 3> p2(ipFt2);
+      r = (p1 - p2).magnitude();
+
+      // The geodesic distance between generators should exceed d * xPrune. It is written to the output, so only
+      // distances that a run with this bound computes as well are taken from the cache.
+      if (cache.LookupExact(cache.GeodesicDistance, j, r * xPrune + 1, dgeo)) {
+        ncached++;
       }
       else {
-        // Get the Euclidean distance between generator points
-        double ipDb1[3];
-        double ipDb2[3];
-        float ipFt1[3];
-        float ipFt2[3];
-        bnd->GetPoint(ip1, ipDb1);
-        bnd->GetPoint(ip2, ipDb2);
-        for (int i = 0; i < 3; i++) {
-          ipFt1[i] = (float) ipDb1[i];
-          ipFt2[i] = (float) ipDb2[i];
-        }
-        vnl_vector_fixed<float, 3> p1(ipFt1);
-        vnl_vector_fixed<float, 3> p2(ipFt2);
-        r = (p1 - p2).magnitude();
-        /*std::cout << "p1: " << p1[0] << " " << p1[1] << " " << p1[2] << std::endl;
-        std::cout << "p2: " << p2[0] << " " << p2[1] << " " << p2[2] << std::endl;
-        std::cout << "r: " << r << std::endl;*/
-
-        // The geodesic distance between generators should exceed d * xPrune;
         dijkstra_geo.ComputeDistances(ip1, r * xPrune + 1);
 
         // Get the distance
         dgeo = dijkstra_geo.GetVertexDistance(ip2);
-
-        // If the geodesic is too short, don't insert point
-        if (dgeo < r * xPrune) {
-          pruned = true;
-          npruned_geo++;
-        }
+        cache.Store(cache.GeodesicDistance, j, dgeo, r * xPrune + 1);
+        cacheModified = true;
       }
 
-      if (!pruned) {
-        // add the cell
-        cells->InsertNextCell(m, ids);
-        daRad->InsertNextTuple(&r);
-        daGeod->InsertNextTuple(&dgeo);
-        double ratio = dgeo / r;
-        daPrune->InsertNextTuple(&ratio);
+      // If the geodesic is too short, don't insert point
+      if (dgeo < r * xPrune) {
+        pruned = true;
+        npruned_geo++;
       }
     }
 
+    if (!pruned) {
+      // add the cell
+      cells->InsertNextCell(m, ids);
+      daRad->InsertNextTuple(&r);
+      daGeod->InsertNextTuple(&dgeo);
+      double ratio = dgeo / r;
+      daPrune->InsertNextTuple(&ratio);
+    }
+
     if (j >= next_prog_mark) {
       cout << "." << flush;
       next_prog_mark += np / 50;
     }
-
-    delete[] ids;
   }
 
   cout << "." << endl;
   cout << "Edge contraint pruned " << npruned_edge << " faces." << endl;
   cout << "Geodesic to Euclidean distance ratio contraint (" << xPrune << ") pruned " << npruned_geo << " faces."
        << endl;
-
-  // Clean up files
-  if (fin.is_open()) {
-    fin.close();
-    remove(fnVoronoiOutput.c_str());
+  if (!fnCache.empty()) {
+    cout << "Distances taken from the cache: " << ncached << endl;
+    if (cacheModified && !cache.Write(fnCache)) {
+      std::cerr << "Failed to write Voronoi cache " << fnCache << std::endl;
+    }
   }
-  remove(fnPoints);
+  vtkPoints *pts = cache.Points;
 
   // Create the vtk poly data
   vtkNew<vtkPolyData> skel;
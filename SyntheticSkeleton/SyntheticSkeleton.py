@@ -2,16 +2,38 @@ import vtk, qt, slicer
 
 import logging
 
-from SyntheticSkeletonLib.CustomData import *
-from SyntheticSkeletonLib.Constants import *
+from SyntheticSkeletonLib.Core.Colors import colorNameToRGB, normalizeColorName
+from SyntheticSkeletonLib.Core.Model import *
+from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+from SyntheticSkeletonLib.Core.Constants import *
+from SyntheticSkeletonLib.Core.Geometry import pairNumber, getSortedPointIndices
+from SyntheticSkeletonLib.Core.Quality import MeshQuality, QUALITY_ARRAYS
 from SyntheticSkeletonLib.Utils import *
+from SyntheticSkeletonLib.Engine import createTemplatePolyData, subdivideTemplatePolyData, createCMRepAttributes, \
+  writeCMRepFile, createDecimatedProxy, TagPointGlyphs
+import SyntheticSkeletonLib.Engine as Engine
+from SyntheticSkeletonLib.Inflation import MedialInflation, BranchingMedialMeshError
+from SyntheticSkeletonLib.InflationWorker import InflationWorker, findExecutable
+import SyntheticSkeletonLib.Profiling as Profiling
+from SyntheticSkeletonLib.Profiling import profiled
+import SyntheticSkeletonLib.Recording as Recording
+import SyntheticSkeletonLib.Core.Journal as Journal
+from SyntheticSkeletonLib.Recording import recorded
+from SyntheticSkeletonLib.Session import SubjectSession
+from SyntheticSkeletonLib.Artifacts import ArtifactManifest, ArtifactWriter, ArtifactWriteError, writeAtomically, \
+  createKey
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
-from dataclasses import astuple
-from SyntheticSkeletonLib.Utils import getSortedPointIndices
+from dataclasses import astuple, replace
 from pathlib import Path
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import numpy as np
+from vtk.util.numpy_support import numpy_to_vtk
 
 
+# the output directory defaults to the temporary directory of Slicer, which is only looked up when needed
+PARAM_DEFAULTS[PARAM_OUTPUT_DIRECTORY] = lambda: slicer.app.temporaryPath
+
 #
 # SyntheticSkeleton
 #
@@ -78,8 +100,15 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
 
   def onReload(self):
     self.cleanup()
+    self.logic.closeInflationWorker()
     logging.debug(f"Reloading {self. moduleName}")
-    reload(packageName='SyntheticSkeletonLib', submoduleNames=['Constants', 'Utils', 'CustomData'])
+    # modules before the modules importing them
+    reload(packageName='SyntheticSkeletonLib', submoduleNames=[
+      'Profiling', 'Recording', 'Artifacts',
+      'Core', 'Core.Colors', 'Core.Constants', 'Core.Geometry', 'Core.Persistent', 'Core.Model', 'Core.Writer',
+      'Core.History', 'Core.TagIndex', 'Core.Quality', 'Core.Journal',
+      'Constants', 'Utils', 'CustomData', 'Engine', 'Session', 'Inflation', 'InflationWorker'
+    ])
     ScriptedLoadableModuleWidget.onReload(self)
 
   def cleanup(self):
@@ -88,6 +117,13 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     """
     self.removeObservers()
     self.deactivateModes()
+    self.logic.cancelInflation()
+    self.logic.cancelSubdivisionPreview()
+    self._profilingTimer.stop()
+    if Recording.isRecording():
+      self.logic.stopSessionRecording()
+    # the journal is kept for recovery
+    self.logic.stopJournal()
     self.logic.removeObservers()
 
   def setup(self):
@@ -130,15 +166,32 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     for pointType in TAG_TYPES:
       self.ui.pointTypeCombobox.addItem(pointType)
 
+    self.ui.qualityOverlayCombobox.addItem("Triangle label")
+    for name in QUALITY_ARRAYS:
+      self.ui.qualityOverlayCombobox.addItem(name)
+
+    self.ui.inflationProgressBar.hide()
+    self.ui.cancelInflationButton.hide()
+    self.ui.subdivisionStatusLabel.hide()
+
+    self.ui.profilingTable.horizontalHeader().setStretchLastSection(True)
+    self._profilingTimer = qt.QTimer()
+    self._profilingTimer.setInterval(500)
+    self._profilingTimer.timeout.connect(self.updateProfilingTable)
+
   def setupConnections(self):
 
     self.ui.outputPathLineEdit.currentPathChanged.connect(self.onOutputDirectoryChanged)
+    self.ui.autoSaveCheckbox.toggled.connect(self.onAutoSaveToggled)
     self.ui.inputModelSelector.currentNodeChanged.connect(self.onInputModelChanged)
     self.ui.outputModelSelector.currentNodeChanged.connect(self.onOutputModelChanged)
 
     self.ui.pointLabelSelector.currentNodeChanged.connect(self.onPointLabelSelected)
     self.ui.pointTypeCombobox.currentIndexChanged.connect(self.onPointTypeChanged)
     self.ui.pointIndexSpinbox.valueChanged.connect(self.onPointAnatomicalIndexChanged)
+    self.ui.rejectDuplicateTagsCheckbox.toggled.connect(lambda t: self.updateParameterNodeFromGUI())
+    self.ui.tagGlyphDisplayCheckbox.toggled.connect(self.onTagGlyphDisplayToggled)
+    self.ui.duplicateTagReportButton.clicked.connect(self.onDuplicateTagReportButtonClicked)
 
     self.ui.triangleLabelSelector.currentNodeChanged.connect(self.onTriangleLabelSelected)
     self.ui.triangleIndexSpinbox.valueChanged.connect(self.onTriangleIndexChanged)
@@ -148,6 +201,8 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     self.ui.deleteTriangleButton.toggled.connect(lambda : self.onDeleteAssignOrFlipTriangleButtonChecked(self.ui.deleteTriangleButton))
     self.ui.assignTriangleButton.toggled.connect(lambda : self.onDeleteAssignOrFlipTriangleButtonChecked(self.ui.assignTriangleButton))
     self.ui.flipNormalsButton.toggled.connect(lambda : self.onDeleteAssignOrFlipTriangleButtonChecked(self.ui.flipNormalsButton))
+    self.ui.undoButton.clicked.connect(lambda: self.logic.undo())
+    self.ui.redoButton.clicked.connect(lambda: self.logic.redo())
 
     self.ui.skeletonVisibilityCheckbox.toggled.connect(self.onSkeletonVisibilityToggled)
     self.ui.meshVisibilityCheckbox.toggled.connect(self.onMeshVisibilityToggled)
@@ -155,6 +210,8 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     self.ui.skeletonTransparencySlider.valueChanged.connect(self.onSkeletonTransparencySliderMoved)
     self.ui.meshTransparanceySlider.valueChanged.connect(self.onMeshTransparencySliderMoved)
     self.ui.pointScaleSlider.valueChanged.connect(self.onPointScaleSliderMoved)
+    self.ui.qualityOverlayCombobox.currentIndexChanged.connect(lambda i: self.updateQualityOverlay())
+    self.ui.qualitySummaryButton.clicked.connect(self.onQualitySummaryButtonClicked)
 
     self.ui.subLevelSpinbox.valueChanged.connect(self.onSubdivisionLevelChanged)
     self.ui.solverTypeCombobox.currentIndexChanged.connect(lambda i: self.updateParameterNodeFromGUI())
@@ -164,7 +221,102 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     self.ui.inflateRadiusSpinbox.valueChanged.connect(lambda v: self.updateParameterNodeFromGUI())
 
     self.ui.previewButton.toggled.connect(self.updatePreview)
-    self.ui.saveButton.clicked.connect(self.logic.save)
+    self.ui.saveButton.clicked.connect(self.onSaveButtonClicked)
+    self.ui.cancelInflationButton.clicked.connect(self.logic.cancelInflation)
+    self.ui.inflationSweepButton.toggled.connect(self.onInflationSweepButtonToggled)
+    self.ui.inflationSweepLineEdit.editingFinished.connect(lambda: self.updateParameterNodeFromGUI())
+
+    self.ui.profilingCheckbox.toggled.connect(self.onProfilingToggled)
+    self.ui.profilingExportButton.clicked.connect(self.onProfilingExportButtonClicked)
+    self.ui.profilingLogButton.clicked.connect(self.onProfilingLogButtonClicked)
+    self.ui.profilingResetButton.clicked.connect(self.onProfilingResetButtonClicked)
+    self.ui.recordSessionButton.toggled.connect(self.onRecordSessionButtonToggled)
+
+  def onSaveButtonClicked(self):
+    try:
+      self.logic.save()
+    except ArtifactWriteError as exc:
+      slicer.util.errorDisplay(str(exc), "Saving failed")
+      return
+    self.showInflationProgress(self.logic.inflationCLINode)
+
+  def showInflationProgress(self, cliNode):
+    if cliNode is not None:
+      self.ui.inflationProgressBar.setCommandLineModuleNode(cliNode)
+      self.ui.inflationProgressBar.show()
+      self.ui.cancelInflationButton.show()
+      self.addObserver(cliNode, slicer.vtkMRMLCommandLineModuleNode.StatusModifiedEvent, self.onInflationStatusModified)
+
+  def onProfilingToggled(self, checked):
+    if checked:
+      Profiling.enable()
+      self._profilingTimer.start()
+    else:
+      Profiling.disable()
+      self._profilingTimer.stop()
+    self.updateProfilingTable()
+
+  def onProfilingExportButtonClicked(self):
+    filePath = qt.QFileDialog.getSaveFileName(slicer.util.mainWindow(), "Export profiling results", "profile.json",
+                                              "JSON (*.json)")
+    if filePath:
+      Profiling.exportJSON(filePath)
+
+  def onProfilingLogButtonClicked(self):
+    Profiling.logStatistics()
+    self.logic.session.logMemoryReport()
+
+  def onProfilingResetButtonClicked(self):
+    Profiling.reset()
+    self.updateProfilingTable()
+
+  def onRecordSessionButtonToggled(self, checked):
+    if not checked:
+      self.logic.stopSessionRecording()
+      return
+    filePath = qt.QFileDialog.getSaveFileName(slicer.util.mainWindow(), "Record session", "session.jsonl",
+                                              "Session (*.jsonl)")
+    try:
+      if filePath:
+        self.logic.startSessionRecording(filePath)
+        return
+    except ValueError as exc:
+      slicer.util.warningDisplay(str(exc), "Record Session")
+    self.checkButtonBlockSignals(self.ui.recordSessionButton, False)
+
+  def updateProfilingTable(self):
+    operations = Profiling.getRecentOperations(PROFILING_PANEL_OPERATIONS)
+    table = self.ui.profilingTable
+    table.setRowCount(len(operations))
+    for row, operation in enumerate(operations):
+      table.setItem(row, 0, qt.QTableWidgetItem(operation.name))
+      table.setItem(row, 1, qt.QTableWidgetItem(f"{operation.seconds * 1000:.1f}"))
+      table.setItem(row, 2, qt.QTableWidgetItem(f"{operation.bytes / 1024:.1f}"))
+
+  def onInflationSweepButtonToggled(self, checked):
+    if checked and self.logic.isSavingInflatedModel():
+      slicer.util.warningDisplay("The inflated model of the last save is still being computed. Start the sweep once "
+                                 "it has been saved.", "Inflation Sweep")
+      self.checkButtonBlockSignals(self.ui.inflationSweepButton, False)
+    elif checked:
+      self.updateParameterNodeFromGUI()
+      self.showInflationProgress(self.logic.createInflationSweep(self.onInflationSweepCompleted))
+    else:
+      self.logic.removeInflationSweepModels()
+
+  def onInflationSweepCompleted(self, models):
+    if not models and self.ui.inflationSweepButton.checked:
+      wasBlocked = self.ui.inflationSweepButton.blockSignals(True)
+      self.ui.inflationSweepButton.setChecked(False)
+      self.ui.inflationSweepButton.blockSignals(wasBlocked)
+
+  def onInflationStatusModified(self, cliNode, event):
+    if cliNode.IsBusy():
+      return
+    self.removeObserver(cliNode, slicer.vtkMRMLCommandLineModuleNode.StatusModifiedEvent, self.onInflationStatusModified)
+    self.ui.inflationProgressBar.setCommandLineModuleNode(None)
+    self.ui.inflationProgressBar.hide()
+    self.ui.cancelInflationButton.hide()
 
   def deactivateModes(self):
     for b in [self.ui.placeTriangleButton, self.ui.assignTriangleButton, self.ui.deleteTriangleButton]:
@@ -186,6 +338,8 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     """
     # Parameter node will be reset, do not use it anymore
     self.parameterNode = None
+    self.logic.stopJournal()
+    self.logic.closeSubjects()
 
   def onSceneEndClose(self, caller, event):
     """
@@ -232,12 +386,17 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     self.ui.constantRadiusSpinbox.value = float(self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS))
     self.ui.inflateModelCheckbox.checked = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE))
     self.ui.inflateRadiusSpinbox.value = float(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS))
+    self.ui.inflationSweepLineEdit.text = self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_SWEEP_RADII)
     self.ui.outputPathLineEdit.currentPath = self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY)
+    self.ui.autoSaveCheckbox.checked = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_AUTO_SAVE))
+    self.ui.rejectDuplicateTagsCheckbox.checked = \
+      slicer.util.toBool(self.parameterNode.GetParameter(PARAM_REJECT_DUPLICATE_TAGS))
+    self.ui.tagGlyphDisplayCheckbox.checked = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_TAG_GLYPH_DISPLAY))
 
-    inputModel = self.ui.inputModelSelector.currentNode()
-    if inputModel is not None:
-      self.ui.skeletonVisibilityCheckbox.setChecked(inputModel.GetDisplayVisibility())
-      self.ui.skeletonTransparencySlider.setValue(inputModel.GetDisplayNode().GetOpacity())
+    skeletonModel = self.logic.getSkeletonDisplayModel()
+    if skeletonModel is not None:
+      self.ui.skeletonVisibilityCheckbox.setChecked(skeletonModel.GetDisplayVisibility())
+      self.ui.skeletonTransparencySlider.setValue(skeletonModel.GetDisplayNode().GetOpacity())
 
     outputModel = self.ui.outputModelSelector.currentNode()
     if outputModel is not None:
@@ -269,7 +428,11 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     self.parameterNode.SetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS, str(self.ui.constantRadiusSpinbox.value))
     self.parameterNode.SetParameter(PARAM_GRID_MODEL_INFLATE, str(self.ui.inflateModelCheckbox.checked))
     self.parameterNode.SetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS, str(self.ui.inflateRadiusSpinbox.value))
+    self.parameterNode.SetParameter(PARAM_GRID_MODEL_INFLATE_SWEEP_RADII, self.ui.inflationSweepLineEdit.text)
     self.parameterNode.SetParameter(PARAM_OUTPUT_DIRECTORY, self.ui.outputPathLineEdit.currentPath)
+    self.parameterNode.SetParameter(PARAM_AUTO_SAVE, str(self.ui.autoSaveCheckbox.checked))
+    self.parameterNode.SetParameter(PARAM_REJECT_DUPLICATE_TAGS, str(self.ui.rejectDuplicateTagsCheckbox.checked))
+    self.parameterNode.SetParameter(PARAM_TAG_GLYPH_DISPLAY, str(self.ui.tagGlyphDisplayCheckbox.checked))
     self.parameterNode.EndModify(wasModified)
 
   @whenDoneCall(updateParameterNodeFromGUI)
@@ -281,20 +444,53 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       self.ui.inputModelSelector.blockSignals(wasBlocked)
       return
 
-    if node and not self.ui.outputModelSelector.currentNode():
-      outputModelId = node.GetNodeReferenceID("OutputMeshModel")
-      outputModel = None
-      if outputModelId:
-        outputModel = slicer.util.getNode(outputModelId)
-      if not outputModel:
+    outputModel = self.getSubjectOutputModel(node) if node else self.ui.outputModelSelector.currentNode()
+    # the output model of the previous subject must not show the template of this one
+    self.logic.setOutputModel(None)
+    self.logic.stopJournal()
+    self.logic.inputModel = node
+    self.offerTemplateRecovery()
+    self.logic.updateJournal()
+
+    wasBlocked = self.ui.outputModelSelector.blockSignals(True)
+    self.ui.outputModelSelector.setCurrentNode(outputModel)
+    self.onOutputModelChanged(outputModel)
+    self.ui.outputModelSelector.blockSignals(wasBlocked)
+    self.updateSubjectNodeFilters(node)
+
+  def getSubjectOutputModel(self, node):
+    """ Output model referenced by the input model node. The selected output model is taken for the first input
+    model, every further input model gets its own.
+    """
+    outputModel = node.GetNodeReference("OutputMeshModel")
+    if outputModel is None:
+      outputModel = self.ui.outputModelSelector.currentNode()
+      usedByOthers = outputModel is not None and any(
+        other is not node and other.GetNodeReferenceID("OutputMeshModel") == outputModel.GetID()
+        for other in slicer.util.getNodesByClass("vtkMRMLModelNode"))
+      if outputModel is None or usedByOthers:
         outputModel = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", f"{node.GetName()}_syn_skeleton")
-        node.SetNodeReferenceID("OutputMeshModel", outputModel.GetID())
+      node.SetNodeReferenceID("OutputMeshModel", outputModel.GetID())
+    return outputModel
 
-      wasBlocked = self.ui.outputModelSelector.blockSignals(True)
-      self.ui.outputModelSelector.setCurrentNode(outputModel)
-      self.onOutputModelChanged(outputModel)
-      self.ui.outputModelSelector.blockSignals(wasBlocked)
-    self.logic.inputModel = node
+  def updateSubjectNodeFilters(self, node):
+    """ Only lists point and triangle labels of the subject of the input model node """
+    for selector, nodeType in [(self.ui.pointLabelSelector, "vtkMRMLMarkupsFiducialNode"),
+                               (self.ui.triangleLabelSelector, "vtkMRMLScriptedModuleNode")]:
+      selector.removeAttribute(nodeType, "SubjectID")
+      if node is not None:
+        selector.addAttribute(nodeType, "SubjectID", node.GetID())
+
+  def offerTemplateRecovery(self):
+    try:
+      recovered = self.logic.readRecoverableTemplate()
+    except Exception as exc:
+      logging.warning(f"Reading the journal failed: {exc}")
+      return
+    if recovered is not None and slicer.util.confirmYesNoDisplay(
+        f"Unsaved edits of {self.logic.inputModel.GetName()} were found in {self.logic.getJournalDirectory()}. "
+        "Do you want to recover them?", "Recover template"):
+      self.logic.restoreTemplate(recovered)
 
   @whenDoneCall(updateParameterNodeFromGUI)
   def onOutputModelChanged(self, node):
@@ -309,12 +505,13 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       dnode.SetScalarRangeFlag(4)
       dnode.EdgeVisibilityOn()
 
-      # update mesh stats upon mesh update
+    # update mesh stats upon mesh update
+    self.removeObservers(self.onOutputMeshModified)
+    if node is not None:
       self.addObserver(node, vtk.vtkCommand.ModifiedEvent, self.onOutputMeshModified)
-    else:
-      self.removeObservers(self.onOutputMeshModified)
 
     self.logic.setOutputModel(node)
+    self.updateQualityOverlay()
 
   def onOutputMeshModified(self, caller=None, event=None):
     self.ui.pointNumberLabel.setText(str(caller.GetPolyData().GetNumberOfPoints()))
@@ -323,6 +520,7 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
   @whenDoneCall(updateParameterNodeFromGUI)
   def onPointLabelSelected(self, node):
     self.ui.pointTypeCombobox.setEnabled(node is not None)
+    self.updateInteractiveTagNodes()
 
     if not node:
       self.ui.pointTypeCombobox.setCurrentIndex(0)
@@ -391,7 +589,7 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     if color:
       self.ui.triangleColorPickerButton.setColor(qt.QColor(color))
     else:
-      color = qt.QColor("#ff0000")
+      color = qt.QColor(DEFAULT_TRIANGLE_COLOR)
       self.ui.triangleColorPickerButton.setColor(color)
       self.onTriangleColorChanged(color)
 
@@ -407,15 +605,15 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     if not triangleNode:
       return
 
-    triangleNode.SetAttribute("Color", str(color))
+    triangleNode.SetAttribute("Color", color.name())
 
   def onSkeletonVisibilityToggled(self, toggled):
-    node = self.ui.inputModelSelector.currentNode()
+    node = self.logic.getSkeletonDisplayModel()
     if node:
       node.SetDisplayVisibility(toggled)
 
   def onSkeletonTransparencySliderMoved(self, value):
-    node = self.ui.inputModelSelector.currentNode()
+    node = self.logic.getSkeletonDisplayModel()
     if node:
       dNode = node.GetDisplayNode()
       dNode.SetOpacity(value)
@@ -431,30 +629,71 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
       dNode = node.GetDisplayNode()
       dNode.SetOpacity(value)
 
+  def updateQualityOverlay(self):
+    index = self.ui.qualityOverlayCombobox.currentIndex
+    self.logic.setMeshQualityOverlay(QUALITY_ARRAYS[index - 1] if index > 0 else None)
+
+  def onQualitySummaryButtonClicked(self):
+    summary = self.logic.getMeshQualitySummary()
+    self.ui.qualitySummaryLabel.setText("\n".join(
+      f"{name}: {values['min']:.3g} / {values['mean']:.3g} / {values['max']:.3g} (min / mean / max), "
+      f"{values['poor']} poor" for name, values in summary.items()))
+
+  def onDuplicateTagReportButtonClicked(self):
+    report = self.logic.getDuplicateTagReport()
+    slicer.util.infoDisplay("\n".join(report) if report else "Every skeleton vertex has at most one tag point.",
+                            "Duplicate Tags")
+
   def onPointScaleSliderMoved(self, value):
     for mn in self.logic.getAllMarkupNodes():
       mn.GetDisplayNode().SetGlyphScale(value)
+    self.updateParameterNodeFromGUI()
+    self.logic.updateTagGlyphs()
+
+  def onTagGlyphDisplayToggled(self, checked):
+    self.updateParameterNodeFromGUI()
+    self.updateInteractiveTagNodes()
+
+  def updateInteractiveTagNodes(self):
+    """ With tag points displayed as glyphs, the points of the selected point label remain markups, or those of all
+    point labels while triangles are placed
+    """
+    if self.ui.placeTriangleButton.checked:
+      self.logic.setInteractiveTagNodes(list(self.logic.getAllMarkupNodes()))
+    else:
+      self.logic.setInteractiveTagNodes([self.ui.pointLabelSelector.currentNode()])
 
-  @whenDoneCall(updateParameterNodeFromGUI)
   def onOutputDirectoryChanged(self, path):
     self.ui.saveButton.setEnabled(Path(path).exists())
+    self.updateParameterNodeFromGUI()
+    self.logic.updateJournal()
+
+  def onAutoSaveToggled(self, checked):
+    self.updateParameterNodeFromGUI()
+    self.logic.updateJournal()
 
   def updatePreview(self, checked):
     if checked:
-      subdividedModel = self.logic.createSubdivideMesh()
-      if subdividedModel:
-        if not subdividedModel.GetDisplayNode():
-          subdividedModel.CreateDefaultDisplayNodes()
-        dnode = subdividedModel.GetDisplayNode()
-        dnode.SetScalarVisibility(True)
-        dnode.SetScalarRangeFlag(4)
-        dnode.EdgeVisibilityOn()
+      self.logic.requestSubdivisionPreview(self.onSubdivisionPreviewReady)
+      self.ui.subdivisionStatusLabel.setVisible(self.logic.isSubdivisionPending())
     else:
+      self.logic.cancelSubdivisionPreview()
+      self.ui.subdivisionStatusLabel.hide()
       m = self.parameterNode.GetNodeReference(PARAM_SUBDIVISION_PREVIEW_MODEL)
       if m:
         slicer.mrmlScene.RemoveNode(m)
         self.parameterNode.SetNodeReferenceID(PARAM_SUBDIVISION_PREVIEW_MODEL, "")
 
+  def onSubdivisionPreviewReady(self, subdividedModel):
+    self.ui.subdivisionStatusLabel.hide()
+    if subdividedModel:
+      if not subdividedModel.GetDisplayNode():
+        subdividedModel.CreateDefaultDisplayNodes()
+      dnode = subdividedModel.GetDisplayNode()
+      dnode.SetScalarVisibility(True)
+      dnode.SetScalarRangeFlag(4)
+      dnode.EdgeVisibilityOn()
+
   def onSubdivisionLevelChanged(self, value):
     self.updateParameterNodeFromGUI()
     if value > 0:
@@ -471,6 +710,7 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     if checked and self.ui.assignTriangleButton.checked:
       self.ui.assignTriangleButton.setChecked(False)
 
+    self.updateInteractiveTagNodes()
     if checked:
       self.addObserversForTriangleCreation()
     else:
@@ -610,6 +850,14 @@ class SyntheticSkeletonWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
 # SyntheticSkeletonLogic
 #
 
+def _encodeTriangleLabel(recorder, triLabelId):
+  return recorder.describeNode(slicer.mrmlScene.GetNodeByID(triLabelId)) if triLabelId else None
+
+
+def _encodeSelectedPoints(recorder, selectedPoints):
+  return [[recorder.describeNode(slicer.util.getNode(mnId)), int(pIdx)] for mnId, pIdx in selectedPoints]
+
+
 class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
 
   @property
@@ -627,7 +875,11 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
   @inputModel.setter
   def inputModel(self, node):
     self.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL, "" if node is None else node.GetID())
+    if self.activateSubject(node):
+      # the subject was open already, its workspace is complete
+      return
     self.configurePointLocator(node)
+    self.updateSkeletonDisplayProxy(node)
 
     if node:
       polydata = node.GetPolyData()
@@ -636,15 +888,65 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       if customInfo.hasCustomData() is not None and len(list(self.getAllMarkupNodes())) == 0:
         self.readCustomInformation(customInfo)
 
+  # template, point locator, undo history etc. belong to the workspace of the active subject
+
+  @property
+  def data(self):
+    return self._workspace.data
+
+  @data.setter
+  def data(self, data):
+    self._workspace.setData(data)
+
+  @property
+  def pointArray(self):
+    return self._workspace.pointArray
+
+  @pointArray.setter
+  def pointArray(self, pointArray):
+    self._workspace.pointArray = pointArray
+
+  @property
+  def locator(self):
+    return self._workspace.getLocator()
+
+  @property
+  def tagIndex(self):
+    return self._workspace.tagIndex
+
   def __init__(self):
     VTKObservationMixin.__init__(self)
     ScriptedLoadableModuleLogic.__init__(self)
 
-    self.locator = None
-    self.data = CustomInformation()
-    self.pointArray = dict()
+    self.inflationCLINode = None
+    self._inflationRuns = dict()  # CLI node ID -> (callback, output model ID) of the InflateMedialModel runs
+    self._savedInflation = None  # token of the inflation whose model save() writes, None once it has finished
+    self._inflationWorker = None
+    self._pendingInflation = None  # (future, callback)
+    self._inflationTimer = qt.QTimer()
+    self._inflationTimer.setInterval(50)
+    self._inflationTimer.timeout.connect(self._onInflationTimeout)
+    self.session = SubjectSession(SESSION_MEMORY_BUDGET_KIB)
+    self._workspace = self.session.activate(None)
     self._outputMesh = Mesh(self.data) # TODO: notify if data is changed?
+    self._synchronizingMarkups = False
+    self._readingTemplate = False
+    self._interactiveTagNodeIDs = set()
+    self._tagGlyphs = TagPointGlyphs()
+    self._tagGlyphStamp = None  # (data, interactive node IDs, radius) of the glyph model
+    self._tagGlyphData = None  # template whose edits are followed by onTagGlyphsEdited
+    self._tagGlyphsOutdated = True
+    self._subdivisionBase = (None, None)
+    self._medialInflation = (None, None)
+    self._subdivisionExecutor = ThreadPoolExecutor(max_workers=1)
+    self._subdivisionRequest = 0
+    self._pendingSubdivision = None  # (request, future, callback)
+    self._subdivisionTimer = qt.QTimer()
+    self._subdivisionTimer.setInterval(50)
+    self._subdivisionTimer.timeout.connect(self._onSubdivisionTimeout)
+    self._journal = None
     self.addObserver(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAddedEvent, self.onNodeAdded)
+    self.addObserver(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAboutToBeRemovedEvent, self.onNodeAboutToBeRemoved)
 
   def __del__(self):
     pass
@@ -653,6 +955,10 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     # TODO: need to clean point array
     self.data = CustomInformation(self.inputModel.GetPolyData() if self.inputModel else None)
     self._outputMesh.data = self.data
+    if self._journal is not None:
+      self._journal.attach(self.data)
+    self.cancelSubdivisionPreview()
+    self._workspace.subdivisionCache.clear()
 
   def createParameterNode(self):
     parameterNode = ScriptedLoadableModuleLogic.createParameterNode(self)
@@ -664,24 +970,247 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       if not parameterNode.GetParameter(paramName):
         parameterNode.SetParameter(paramName, str(paramDefaultValue))
 
+  def getSkeletonDisplayModel(self):
+    """ Model that displays the skeleton: the decimated proxy for large skeletons, the input model otherwise """
+    proxy = self.parameterNode.GetNodeReference(PARAM_INPUT_MODEL_PROXY)
+    return proxy if proxy is not None else self.inputModel
+
+  def updateSkeletonDisplayProxy(self, node):
+    """ Shows a decimated proxy instead of skeletons with more than SKELETON_PROXY_VERTEX_THRESHOLD vertices.
+
+    Markups are placed onto the proxy, which keeps rendering and picking interactive, and are then snapped to the
+    closest vertex of the full resolution skeleton through the point locator.
+    """
+    proxy = self.parameterNode.GetNodeReference(PARAM_INPUT_MODEL_PROXY)
+    if proxy is not None:
+      # show the skeleton the proxy was displayed for again
+      source = slicer.mrmlScene.GetNodeByID(proxy.GetAttribute("ProxySourceNodeID") or "")
+      if source is not None:
+        source.SetDisplayVisibility(proxy.GetDisplayVisibility())
+      self.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL_PROXY, "")
+      slicer.mrmlScene.RemoveNode(proxy)
+    if node is None or node.GetPolyData().GetNumberOfPoints() <= SKELETON_PROXY_VERTEX_THRESHOLD:
+      return
+
+    proxyPolyData = createDecimatedProxy(node.GetPolyData(), SKELETON_PROXY_TARGET_VERTICES)
+    logging.info(f"Displaying {node.GetName()} with {proxyPolyData.GetNumberOfPoints()} of "
+                 f"{node.GetPolyData().GetNumberOfPoints()} vertices")
+    proxy = slicer.modules.models.logic().AddModel(proxyPolyData)
+    proxy.SetName(f"{node.GetName()}_LOD")
+    proxy.SetAttribute("ModuleName", self.moduleName)
+    proxy.SetAttribute("ProxySourceNodeID", node.GetID())
+    proxy.SetSaveWithScene(False)
+    if node.GetDisplayNode():
+      proxy.GetDisplayNode().SetColor(node.GetDisplayNode().GetColor())
+      proxy.GetDisplayNode().SetOpacity(node.GetDisplayNode().GetOpacity())
+    node.SetDisplayVisibility(False)
+    self.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL_PROXY, proxy.GetID())
+
   def configurePointLocator(self, node):
-    if node:
-      self.locator = vtk.vtkKdTreePointLocator()
-      self.locator.SetDataSet(node.GetPolyData())
-      self.locator.BuildLocator()
-    else:
-      self.locator = None
+    self.cancelSubdivisionPreview()
+    self._workspace.setSkeleton(node.GetPolyData() if node else None)
+    # built now rather than with the first placed point
+    self._workspace.getLocator()
+
+  def activateSubject(self, node):
+    """ Switches to the workspace of the input model node (None for no input model), opening a new one for it if
+    needed. Markups, triangle labels and skeleton of the previous subject are hidden, those of node are shown. Returns
+    whether the workspace was open already.
+    """
+    subjectID = node.GetID() if node is not None else None
+    wasOpen = subjectID in self.session
+    previous = self._workspace
+    if previous.subjectID == subjectID:
+      return wasOpen
+
+    self.cancelSubdivisionPreview()
+    previous.proxyNodeID = self.parameterNode.GetNodeReferenceID(PARAM_INPUT_MODEL_PROXY) or ""
+    self.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL_PROXY, "")
+    self.setSubjectVisibility(previous, False)
+
+    self._workspace = self.session.activate(subjectID, node.GetPolyData() if node else None,
+                                            node.GetName() if node else "")
+    self._outputMesh.data = self.data
+    self.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL_PROXY, self._workspace.proxyNodeID)
+    if wasOpen:
+      self.setSubjectVisibility(self._workspace, True)
+    elif subjectID is not None:
+      # markups and triangle labels of the subject in the scene, including those of scenes without subjects
+      for moduleNode in list(self.getAllMarkupNodes()) + list(self.getAllTriangleNodes()):
+        self.onNodeAdded(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAddedEvent, moduleNode)
+    self.updateTagDisplay()
+    return wasOpen
+
+  def setSubjectVisibility(self, workspace, visible):
+    if workspace.subjectID is None:
+      return
+    for markupsNode in slicer.util.getNodesByClass('vtkMRMLMarkupsNode'):
+      if markupsNode.GetAttribute('ModuleName') == self.moduleName and \
+          markupsNode.GetAttribute('SubjectID') == workspace.subjectID:
+        markupsNode.SetDisplayVisibility(visible)
+    skeletonModel = slicer.mrmlScene.GetNodeByID(workspace.proxyNodeID or workspace.subjectID)
+    if skeletonModel is not None:
+      skeletonModel.SetDisplayVisibility(visible)
+
+  def closeSubjects(self):
+    """ Closes the workspaces of all subjects, e.g. when the scene is closed """
+    self.cancelSubdivisionPreview()
+    self.session.closeAll()
+    self._workspace = self.session.activate(None)
+    self._outputMesh.data = self.data
+
+  def isActiveSubjectNode(self, node):
+    """ Nodes without subject belong to every subject """
+    subjectID = node.GetAttribute('SubjectID')
+    return self._workspace.subjectID is None or not subjectID or subjectID == self._workspace.subjectID
 
   def setOutputModel(self, node):
     self._outputMesh.setMeshModelNode(node)
 
+  def setMeshQualityOverlay(self, name):
+    """ Colors the output model by the quality measure name (see Core/Quality.py), or by triangle label if None.
+    Degenerate triangles are shown in the NaN color.
+    """
+    modelNode = self._outputMesh.meshModelNode
+    if modelNode is None or modelNode.GetDisplayNode() is None:
+      return
+    dnode = modelNode.GetDisplayNode()
+    if name:
+      dnode.SetActiveScalar(name, vtk.vtkAssignAttribute.CELL_DATA)
+      dnode.SetAndObserveColorNodeID("vtkMRMLColorTableNodeRainbow")
+      dnode.SetScalarRangeFlag(slicer.vtkMRMLDisplayNode.UseDataScalarRange)
+    else:
+      dnode.SetActiveScalar("Colors", vtk.vtkAssignAttribute.CELL_DATA)
+      dnode.SetScalarRangeFlag(slicer.vtkMRMLDisplayNode.UseDirectMapping)
+
+  def getMeshQualitySummary(self):
+    return self._outputMesh.quality.getSummary()
+
+  def isTagGlyphDisplay(self):
+    return slicer.util.toBool(self.parameterNode.GetParameter(PARAM_TAG_GLYPH_DISPLAY))
+
+  def isGlyphTagPoint(self, point):
+    """ Whether point is shown as glyph, i.e. it does not belong to an interactive markups node """
+    tagInfos = self.data.vectorTagInfo
+    return not 0 <= point.comboBoxIndex < len(tagInfos) or \
+      tagInfos[point.comboBoxIndex].mrmlNodeID not in self._interactiveTagNodeIDs
+
+  def onTagGlyphsEdited(self, data, changes):
+    """ Marks the glyph model outdated unless only points of interactive nodes changed (e.g. while one is dragged) """
+    if self._tagGlyphsOutdated:
+      return
+    for change in changes:
+      if change.vector == TAG_INFO or change.vector == TAG_POINTS and (
+          change.key is None or any(point is not None and self.isGlyphTagPoint(point)
+                                    for point in (change.old, change.new))):
+        self._tagGlyphsOutdated = True
+        return
+
+  def setInteractiveTagNodes(self, nodes):
+    """ Markups nodes whose control points stay markups, i.e. can be edited, when tag points are displayed as glyphs """
+    self._interactiveTagNodeIDs = {node.GetID() for node in nodes if node is not None}
+    self.updateTagDisplay()
+
+  def updateTagDisplay(self):
+    """ Shows the tag points of the active subject as markups or, with PARAM_TAG_GLYPH_DISPLAY, as one glyph model
+    colored by tag type plus the markups of the interactive nodes only
+    """
+    glyphDisplay = self.isTagGlyphDisplay()
+    for markupsNode in self.getAllMarkupNodes():
+      visible = not glyphDisplay or markupsNode.GetID() in self._interactiveTagNodeIDs
+      if bool(markupsNode.GetDisplayVisibility()) != visible:
+        markupsNode.SetDisplayVisibility(visible)
+    self.updateTagGlyphs()
+
+  def getTagGlyphRadius(self):
+    """ Glyph radius matching the markups glyph size (percent of the view) for a view fitting the skeleton """
+    bounds = [0.0] * 6
+    if self._workspace.skeleton is not None:
+      self._workspace.skeleton.GetBounds(bounds)
+    diagonal = ((bounds[1] - bounds[0]) ** 2 + (bounds[3] - bounds[2]) ** 2 + (bounds[5] - bounds[4]) ** 2) ** 0.5
+    return float(self.parameterNode.GetParameter(PARAM_POINT_GLYPH_SIZE)) / 100.0 * (diagonal or 1.0) / 2.0
+
+  @profiled
+  def updateTagGlyphs(self):
+    """ Rebuilds the glyph model of the tag points that are not interactive if any of them changed since (see
+    onTagGlyphsEdited)
+    """
+    model = self.parameterNode.GetNodeReference(PARAM_TAG_GLYPH_MODEL)
+    if not self.isTagGlyphDisplay():
+      if model is not None:
+        self.parameterNode.SetNodeReferenceID(PARAM_TAG_GLYPH_MODEL, "")
+        slicer.mrmlScene.RemoveNode(model)
+      self._tagGlyphStamp = None
+      self._tagGlyphsOutdated = True
+      return
+
+    if self._tagGlyphData is not self.data:
+      if self._tagGlyphData is not None:
+        self._tagGlyphData.removeListener(self.onTagGlyphsEdited)
+      self._tagGlyphData = self.data
+      self.data.addListener(self.onTagGlyphsEdited)
+      self._tagGlyphsOutdated = True
+    radius = self.getTagGlyphRadius()
+    stamp = (self.data, frozenset(self._interactiveTagNodeIDs), radius)
+    if model is not None and stamp == self._tagGlyphStamp and not self._tagGlyphsOutdated:
+      return
+    if model is None:
+      model = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode', "TagPoints")
+      model.SetAttribute("ModuleName", self.moduleName)
+      model.SetSaveWithScene(False)
+      model.CreateDefaultDisplayNodes()
+      dnode = model.GetDisplayNode()
+      if dnode is not None:
+        dnode.SetActiveScalar("TagType", vtk.vtkAssignAttribute.POINT_DATA)
+        dnode.SetAndObserveColorNodeID(self.getTagTypeColorNode().GetID())
+        dnode.SetScalarRangeFlag(slicer.vtkMRMLDisplayNode.UseColorNodeScalarRange)
+        dnode.SetScalarVisibility(True)
+      self.parameterNode.SetNodeReferenceID(PARAM_TAG_GLYPH_MODEL, model.GetID())
+
+    # per tag info plus one entry for points without a valid one
+    tagInfos = self.data.vectorTagInfo
+    interactive = np.array([ti.mrmlNodeID in self._interactiveTagNodeIDs for ti in tagInfos] + [False])
+    tagTypes = np.array([ti.tagType if 0 <= ti.tagType < len(TAG_TYPES) else 0 for ti in tagInfos] + [0])
+    points = self.data.vectorTagPoints
+    infoIndices = np.array([point.comboBoxIndex for point in points], dtype=np.int64)
+    infoIndices[(infoIndices < 0) | (infoIndices >= len(tagInfos))] = len(tagInfos)
+    positions = np.array([(point.pos.x, point.pos.y, point.pos.z) for point in points], dtype=np.float64)
+    shown = ~interactive[infoIndices]
+    model.SetAndObservePolyData(self._tagGlyphs.update(positions.reshape(-1, 3)[shown], tagTypes[infoIndices[shown]],
+                                                       radius))
+    self._tagGlyphStamp = stamp
+    self._tagGlyphsOutdated = False
+
+  def getTagTypeColorNode(self):
+    """ Color table of the tag types (TAG_TYPE_COLORS) for the glyph model """
+    colorNode = self.parameterNode.GetNodeReference(PARAM_TAG_TYPE_COLORS)
+    if colorNode is None:
+      colorNode = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLColorTableNode', "TagTypeColors")
+      colorNode.SetAttribute("ModuleName", self.moduleName)
+      colorNode.SetSaveWithScene(False)
+      colorNode.SetHideFromEditors(True)
+      colorNode.SetTypeToUser()
+      colorNode.SetNumberOfColors(len(TAG_TYPES))
+      for tagType, (name, color) in enumerate(zip(TAG_TYPES, TAG_TYPE_COLORS)):
+        r, g, b = colorNameToRGB(color)
+        colorNode.SetColor(tagType, name or "Unassigned", r / 255.0, g / 255.0, b / 255.0, 1.0)
+      self.parameterNode.SetNodeReferenceID(PARAM_TAG_TYPE_COLORS, colorNode.GetID())
+    return colorNode
+
+  def onTemplateModified(self):
+    self.data.modified()
+    self._outputMesh.updateMesh()
+    self.updateTagGlyphs()
+
   def getAllMarkupNodes(self):
-    return filter(lambda node: node.GetAttribute('ModuleName') == self.moduleName,
+    """ Markups nodes of the active subject """
+    return filter(lambda node: node.GetAttribute('ModuleName') == self.moduleName and self.isActiveSubjectNode(node),
                   slicer.util.getNodesByClass('vtkMRMLMarkupsNode'))
 
   def getAllTriangleNodes(self):
+    """ Triangle label nodes of the active subject """
     return filter(lambda node: node.GetAttribute('ModuleName') == self.moduleName and
-                               node.GetAttribute('Type') == "Triangle",
+                               node.GetAttribute('Type') == "Triangle" and self.isActiveSubjectNode(node),
                   slicer.util.getNodesByClass('vtkMRMLScriptedModuleNode'))
 
   def addMarkupNodesObserver(self, markupsNode):
@@ -693,23 +1222,40 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
   @vtk.calldata_type(vtk.VTK_OBJECT)
   def onNodeAdded(self, caller, event, calldata):
     node = calldata
+    if not self.isActiveSubjectNode(node):
+      return
     if isinstance(node, slicer.vtkMRMLScriptedModuleNode) and \
         node.GetAttribute('ModuleName') == self.moduleName and node.GetAttribute('Type') == "Triangle":
         self.onTriangleLabelAdded(node)
     elif isinstance(node, slicer.vtkMRMLMarkupsFiducialNode) and node.GetAttribute('ModuleName') == self.moduleName:
         self.onPointLabelAdded(node)
 
+  @vtk.calldata_type(vtk.VTK_OBJECT)
+  def onNodeAboutToBeRemoved(self, caller, event, calldata):
+    node = calldata
+    if node.GetID() not in self.session:
+      return
+    if node.GetID() == self._workspace.subjectID:
+      self.inputModel = None
+    self.session.close(node.GetID())
+
+  def assignToActiveSubject(self, node):
+    if self._workspace.subjectID is not None and not node.GetAttribute('SubjectID'):
+      node.SetAttribute('SubjectID', self._workspace.subjectID)
+
+  @recorded(lambda recorder, self, node: {"node": recorder.describeNode(node)})
   def onTriangleLabelAdded(self, node):
-    color = node.GetAttribute("Color")
-    color = qt.QColor(color) if color else qt.QColor(DEFAULT_TRIANGLE_COLOR)
-    self.data.vectorLabelInfo.append(
-      LabelTriangle(labelName=node.GetName(), labelColor=str(color), mrmlNodeID=node.GetID())
-    )
+    self.assignToActiveSubject(node)
+    color = normalizeColorName(node.GetAttribute("Color"), DEFAULT_TRIANGLE_COLOR)
+    self.data.appendLabelInfo(LabelTriangle(labelName=node.GetName(), labelColor=color, mrmlNodeID=node.GetID()))
     # need to observe the node in case of changes
     # print(self.data.vectorLabelInfo)
-    self.addObserver(node, vtk.vtkCommand.ModifiedEvent, self.onTriangleModified)
+    if not self.hasObserver(node, vtk.vtkCommand.ModifiedEvent, self.onTriangleModified):
+      self.addObserver(node, vtk.vtkCommand.ModifiedEvent, self.onTriangleModified)
 
+  @recorded(lambda recorder, self, node: {"node": recorder.describeNode(node)})
   def onPointLabelAdded(self, node):
+    self.assignToActiveSubject(node)
     dnode = node.GetDisplayNode()
     if not dnode:
       node.CreateDefaultDisplayNodes()
@@ -729,27 +1275,34 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       tagColor=Color(color[0] * 255, color[1] * 255, color[2] * 255),
       mrmlNodeID=node.GetID()
     )
-    self.data.vectorTagInfo.append(ti)
-    self.addObserver(node, vtk.vtkCommand.ModifiedEvent, self.onMarkupsNodeModified)
+    self.data.appendTagInfo(ti)
+    if not self.hasObserver(node, vtk.vtkCommand.ModifiedEvent, self.onMarkupsNodeModified):
+      self.addObserver(node, vtk.vtkCommand.ModifiedEvent, self.onMarkupsNodeModified)
 
   def onTriangleModified(self, caller, event):
-    for tl in self.data.vectorLabelInfo:
+    for lblIdx, tl in enumerate(self.data.vectorLabelInfo):
       if caller.GetID() == tl.mrmlNodeID:
-        tl.labelName = caller.GetName()
-        tl.labelColor = caller.GetAttribute("Color")
+        self.data.setLabelInfo(lblIdx, replace(
+          tl,
+          labelName=caller.GetName(),
+          labelColor=normalizeColorName(caller.GetAttribute("Color"), DEFAULT_TRIANGLE_COLOR)
+        ))
         # print(self.data.vectorLabelInfo)
         break
-    self._outputMesh.updateMesh()
+    self.onTemplateModified()
 
   def onMarkupsNodeModified(self, node, event):
-    for ti in self.data.vectorTagInfo:
+    for tagIdx, ti in enumerate(self.data.vectorTagInfo):
       if node.GetID() == ti.mrmlNodeID:
         dnode = node.GetDisplayNode()
         color = dnode.GetSelectedColor()
-        ti.tagName = node.GetName()
-        ti.tagType = int(node.GetAttribute("TypeIndex") if node.GetAttribute("TypeIndex") else -1)
-        ti.tagIndex = int(node.GetAttribute("AnatomicalIndex"))
-        ti.tagColor = Color(color[0] * 255, color[1] * 255, color[2] * 255)
+        self.data.setTagInfo(tagIdx, replace(
+          ti,
+          tagName=node.GetName(),
+          tagType=int(node.GetAttribute("TypeIndex") if node.GetAttribute("TypeIndex") else -1),
+          tagIndex=int(node.GetAttribute("AnatomicalIndex")),
+          tagColor=Color(color[0] * 255, color[1] * 255, color[2] * 255)
+        ))
         # print(self.data.vectorTagInfo)
         break
 
@@ -767,10 +1320,15 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       self.onNodeAdded(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAddedEvent, n)
       self.addMarkupNodesObserver(n)
 
-    for p in customInfo.vectorTagPoints:
-      pos = p.pos
-      mn = markupNodes[p.comboBoxIndex]
-      mn.AddControlPoint(vtk.vtkVector3d(pos.x, pos.y, pos.z))
+    # duplicate tags of the template are kept and reported below
+    self._readingTemplate = True
+    try:
+      for p in customInfo.vectorTagPoints:
+        pos = p.pos
+        mn = markupNodes[p.comboBoxIndex]
+        mn.AddControlPoint(vtk.vtkVector3d(pos.x, pos.y, pos.z))
+    finally:
+      self._readingTemplate = False
 
     for tl in customInfo.vectorLabelInfo:
       n = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLScriptedModuleNode", tl.labelName)
@@ -779,29 +1337,72 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       n.SetAttribute("Type", "Triangle")
       self.onNodeAdded(slicer.mrmlScene, slicer.vtkMRMLScene.NodeAddedEvent, n)
 
-    self.data.vectorTagTriangles = customInfo.vectorTagTriangles.copy()
+    self.data.assign(vectorTagTriangles=customInfo.vectorTagTriangles)
 
     self.generateEdges()
 
     for uniqueId, edge in self.data.vectorTagEdges.items():
       assert uniqueId == pairNumber(edge.ptId1, edge.ptId2)
 
-    self._outputMesh.updateMesh()
+    if self._journal is not None:
+      self._journal.checkpoint()
+    if self.tagIndex.hasDuplicates():
+      logging.warning("Skeleton vertices with more than one tag point:\n" + "\n".join(self.getDuplicateTagReport()))
+    self.onTemplateModified()
+
+  def checkDuplicateTag(self, vertIdx, globPIdx=None):
+    """ Warns if a tag point other than the one at globPIdx (a point that is moved) is on skeleton vertex vertIdx.
+    Returns True if the point must not be placed on it (PARAM_REJECT_DUPLICATE_TAGS).
+    """
+    if self._readingTemplate or not self.tagIndex.isOccupied(vertIdx, globPIdx):
+      return False
+    reject = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_REJECT_DUPLICATE_TAGS))
+    message = f"Skeleton vertex {vertIdx} is tagged already by {', '.join(self.getTagPointNames(vertIdx))}"
+    message += ", the point was not placed" if reject else ""
+    logging.warning(message)
+    slicer.util.showStatusMessage(message, 5000)
+    return reject
+
+  def getTagPointNames(self, vertIdx):
+    """ Labels of the control points of the tag points on skeleton vertex vertIdx """
+    controlPoints = {globPIdx: key for key, globPIdx in self.pointArray.items()}
+    names = []
+    for globPIdx in self.tagIndex.getPointIndices(vertIdx):
+      nodeID, localPointIdx = controlPoints.get(globPIdx, (None, None))
+      node = slicer.mrmlScene.GetNodeByID(nodeID) if nodeID else None
+      if node is not None and localPointIdx < node.GetNumberOfControlPoints():
+        names.append(node.GetNthControlPointLabel(localPointIdx))
+      else:
+        names.append(f"point {globPIdx}")
+    return names
+
+  def getDuplicateTagReport(self):
+    """ One line per skeleton vertex with more than one tag point """
+    return [f"vertex {vertIdx}: {', '.join(self.getTagPointNames(vertIdx))}"
+            for vertIdx in self.tagIndex.getDuplicates()]
 
   def getClosestVertexAndRadius(self, pos):
     assert self.locator is not None
-    vertexIdx = self.locator.FindClosestPoint(pos)
-    poly = self.locator.GetDataSet()
-    radiusArray = poly.GetPointData().GetArray("Radius")
-    return vertexIdx, radiusArray.GetValue(vertexIdx)
+    return Engine.getClosestVertexAndRadius(self.locator, pos)
 
+  @recorded(lambda recorder, self, caller, event:
+            Recording.encodeControlPoint(recorder, caller, caller.GetNumberOfControlPoints() - 1))
   def onPointAdded(self, caller, event):
+    if self._synchronizingMarkups:
+      return
     # print("Point Added")
     pointIdx = caller.GetNumberOfControlPoints()-1
     # print(pointIdx)
     pos = caller.GetNthControlPointPosition(pointIdx)
     vertIdx, radius = self.getClosestVertexAndRadius(pos)
-    poly = self.inputModel.GetPolyData()
+    if self.checkDuplicateTag(vertIdx):
+      self._synchronizingMarkups = True
+      try:
+        caller.RemoveNthControlPoint(pointIdx)
+      finally:
+        self._synchronizingMarkups = False
+      return
+    poly = self.locator.GetDataSet()
     caller.SetNthControlPointPosition(pointIdx, poly.GetPoints().GetPoint(vertIdx))
 
     pt = TagPoint(
@@ -812,40 +1413,53 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       seq=vertIdx
     )
     # print("New:", pt)
-    self.data.vectorTagPoints.append(pt)
-    self.pointArray[(caller.GetID(), pointIdx)] = len(self.data.vectorTagPoints) - 1
+    self.pointArray[(caller.GetID(), pointIdx)] = self.data.appendPoint(pt)
 
   def onPointInteractionStarted(self, caller, event):
+    # dragging and snapping the point is undone at once
+    self._workspace.history.beginGroup()
     self.addObserver(caller, caller.PointModifiedEvent, self.onPointModified)
 
   @vtk.calldata_type(vtk.VTK_INT)
+  @recorded(lambda recorder, self, caller, event, pointIdx:
+            Recording.encodeControlPoint(recorder, caller, caller.GetDisplayNode().GetActiveControlPoint()))
   def onPointModified(self, caller, event, pointIdx):
     # print(f"modified event {caller.GetID}, {pointIdx}, {self.pointArray[(caller.GetID(), pointIdx)]}")
 
     pointIdx = caller.GetDisplayNode().GetActiveControlPoint()
     pos = caller.GetNthControlPointPosition(pointIdx)
-    pt = self.data.vectorTagPoints[self.pointArray[(caller.GetID(), pointIdx)]]
-    pt.pos = Point(*pos)
-    self._outputMesh.updateMesh()
+    globPIdx = self.pointArray[(caller.GetID(), pointIdx)]
+    self.data.setPoint(globPIdx, replace(self.data.vectorTagPoints[globPIdx], pos=Point(*pos)))
+    self.onTemplateModified()
 
+  @recorded(lambda recorder, self, caller, event:
+            Recording.encodeControlPoint(recorder, caller, caller.GetDisplayNode().GetActiveControlPoint()))
   def onPointInteractionEnded(self, caller, event):
     self.removeObserver(caller, caller.PointModifiedEvent, self.onPointModified)
     pointIdx = caller.GetDisplayNode().GetActiveControlPoint()
     pos = caller.GetNthControlPointPosition(pointIdx)
     vertIdx, radius = self.getClosestVertexAndRadius(pos)
+    globPIdx = self.pointArray[(caller.GetID(), pointIdx)]
+    tagPoint = self.data.vectorTagPoints[globPIdx]
+    if vertIdx != tagPoint.seq and self.checkDuplicateTag(vertIdx, globPIdx):
+      # back to the vertex the point was dragged from
+      vertIdx, radius = tagPoint.seq, tagPoint.radius
     poly = self.locator.GetDataSet()
     caller.SetNthControlPointPosition(pointIdx, poly.GetPoints().GetPoint(vertIdx))
     pos = caller.GetNthControlPointPosition(pointIdx)
 
-    pt = self.data.vectorTagPoints[self.pointArray[(caller.GetID(), pointIdx)]]
-    pt.pos = Point(*pos)
-    pt.radius = radius
-    pt.seq = vertIdx
+    self.data.setPoint(globPIdx, replace(self.data.vectorTagPoints[globPIdx], pos=Point(*pos), radius=radius,
+                                         seq=vertIdx))
+    self._workspace.history.endGroup()
 
-    self._outputMesh.updateMesh()
+    self.onTemplateModified()
 
   @vtk.calldata_type(vtk.VTK_INT)
+  @recorded(lambda recorder, self, caller, event, localPointIdx:
+            Recording.encodeControlPoint(recorder, caller, localPointIdx))
   def onPointRemoved(self, caller, event, localPointIdx):
+    if self._synchronizingMarkups:
+      return
     print("onPointRemoved")
     try:
       globPIdx = self.pointArray[(caller.GetID(), localPointIdx)]
@@ -853,21 +1467,27 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       print("could not find point in global array")
       return
 
-    # delete triangles
-    delete = []
-    for triIdx, tri in enumerate(self.data.vectorTagTriangles):
-      if any(pId == globPIdx for pId in tri.triPtIds):
-        delete.append(triIdx)
-    for index in sorted(delete, reverse=True):
-      del self.data.vectorTagTriangles[index]
-
-    # update triangle ids
-    for tri in self.data.vectorTagTriangles:
-      tri.id1 = tri.id1 - 1 if tri.id1 > globPIdx else tri.id1
-      tri.id2 = tri.id2 - 1 if tri.id2 > globPIdx else tri.id2
-      tri.id3 = tri.id3 - 1 if tri.id3 > globPIdx else tri.id3
-
-    del self.data.vectorTagPoints[globPIdx]
+    with self.data.edit():
+      # delete triangles
+      delete = []
+      for triIdx, tri in enumerate(self.data.vectorTagTriangles):
+        if any(pId == globPIdx for pId in tri.triPtIds):
+          delete.append(triIdx)
+      for index in sorted(delete, reverse=True):
+        self.data.removeTriangle(index)
+
+      # update triangle ids
+      for triIdx, tri in enumerate(self.data.vectorTagTriangles):
+        if any(pId > globPIdx for pId in tri.triPtIds):
+          self.data.setTriangle(triIdx, replace(
+            tri,
+            id1=tri.id1 - 1 if tri.id1 > globPIdx else tri.id1,
+            id2=tri.id2 - 1 if tri.id2 > globPIdx else tri.id2,
+            id3=tri.id3 - 1 if tri.id3 > globPIdx else tri.id3
+          ))
+
+      self.data.removePoint(globPIdx)
+      self.generateEdges()
     del self.pointArray[(caller.GetID(), localPointIdx)]
 
     # updating global array including global index and their local index if from the same markups list
@@ -882,14 +1502,69 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
         newDict[key] =  val
     self.pointArray = newDict
 
-    self.generateEdges()
+    self.onTemplateModified()
 
-    self._outputMesh.updateMesh()
+  @recorded(lambda recorder, self: {})
+  def undo(self):
+    """ Reverts the last point or triangle edit. Returns False if there is nothing to undo. """
+    return self._onHistoryApplied(self._workspace.history.undo())
+
+  @recorded(lambda recorder, self: {})
+  def redo(self):
+    """ Applies the last undone edit again. Returns False if there is nothing to redo. """
+    return self._onHistoryApplied(self._workspace.history.redo())
 
+  def canUndo(self):
+    return self._workspace.history.canUndo()
+
+  def canRedo(self):
+    return self._workspace.history.canRedo()
+
+  def _onHistoryApplied(self, changes):
+    if not changes:
+      return False
+    tagIndices = {item.comboBoxIndex for change in changes if change.vector == TAG_POINTS
+                  for item in (change.old, change.new) if item is not None}
+    if tagIndices:
+      self.synchronizeMarkups(tagIndices)
+    self.onTemplateModified()
+    return True
+
+  def synchronizeMarkups(self, tagIndices):
+    """ Moves, adds and removes control points of the markups nodes of the given tag indices to match the template
+    points and rebuilds the mapping of control points to template points
+    """
+    self._synchronizingMarkups = True
+    try:
+      for tagIdx in tagIndices:
+        node = slicer.mrmlScene.GetNodeByID(self.data.vectorTagInfo[tagIdx].mrmlNodeID)
+        if node is None:
+          continue
+        positions = [astuple(p.pos) for p in self.data.vectorTagPoints if p.comboBoxIndex == tagIdx]
+        for localPointIdx, position in enumerate(positions):
+          if localPointIdx < node.GetNumberOfControlPoints():
+            node.SetNthControlPointPosition(localPointIdx, *position)
+          else:
+            node.AddControlPoint(vtk.vtkVector3d(*position))
+        while node.GetNumberOfControlPoints() > len(positions):
+          node.RemoveNthControlPoint(node.GetNumberOfControlPoints() - 1)
+    finally:
+      self._synchronizingMarkups = False
+
+    nodeIDs = [ti.mrmlNodeID for ti in self.data.vectorTagInfo]
+    numberOfPoints = dict()
+    self.pointArray = dict()
+    for globPIdx, p in enumerate(self.data.vectorTagPoints):
+      localPointIdx = numberOfPoints.get(p.comboBoxIndex, 0)
+      numberOfPoints[p.comboBoxIndex] = localPointIdx + 1
+      self.pointArray[(nodeIDs[p.comboBoxIndex], localPointIdx)] = globPIdx
+
+  @profiled
   def generateEdges(self):
-    self.data.vectorTagEdges = OrderedDict()
+    edges = dict()
     for tri in self.data.vectorTagTriangles:
-      self.checkEdgeConstraints(tri.triPtIds)
+      self.checkEdgeConstraints(tri.triPtIds, edges)
+    self.data.setEdges(edges)
 
   def preCheckConstraints(self, points):
     types = [TAG_TYPES[int(slicer.util.getNode(mn).GetAttribute("TypeIndex"))] for mn, pIdx in points]
@@ -928,12 +1603,14 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     # this could be a CLI module
     pass
 
+  @recorded(lambda recorder, self, selectedPoints, triLabelId: {
+    "points": _encodeSelectedPoints(recorder, selectedPoints), "label": _encodeTriangleLabel(recorder, triLabelId)})
   def attemptToAddTriangle(self, selectedPoints, triLabelId):
     for lblIdx, triLabel in enumerate(self.data.vectorLabelInfo):
       if triLabel.mrmlNodeID == triLabelId:
         triPtIds = [self.pointArray[i] for i in selectedPoints]
         tri = self.createTriangle(triPtIds, lblIdx)
-        self._outputMesh.updateMesh()
+        self.onTemplateModified()
         nextTriPtIds = self.getNextTriPt(tri)
         print("after ", triPtIds)
         print("Next PT ids ", nextTriPtIds)
@@ -979,54 +1656,60 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     print(triPtIds)
     triPtIds = self.checkNormal(triPtIds.copy())
     print(triPtIds)
-    m = self.checkEdgeConstraints(triPtIds)
-    if m:
-      raise ValueError(m)
+    with self.data.edit():
+      m = self.checkEdgeConstraints(triPtIds)
+      if m:
+        raise ValueError(m)
 
-    vectorTagPoints = self.data.vectorTagPoints
+      vectorTagPoints = self.data.vectorTagPoints
 
-    # Store the new triangle
-    tri = TagTriangle(
-      p1=vectorTagPoints[triPtIds[0]].pos,
-      p2=vectorTagPoints[triPtIds[1]].pos,
-      p3=vectorTagPoints[triPtIds[2]].pos,
-      id1=triPtIds[0],
-      id2=triPtIds[1],
-      id3=triPtIds[2],
-      seq1=vectorTagPoints[triPtIds[0]].seq,
-      seq2=vectorTagPoints[triPtIds[1]].seq,
-      seq3=vectorTagPoints[triPtIds[2]].seq,
-      index=currentTriIndex
-    )
+      # Store the new triangle
+      tri = TagTriangle(
+        p1=vectorTagPoints[triPtIds[0]].pos,
+        p2=vectorTagPoints[triPtIds[1]].pos,
+        p3=vectorTagPoints[triPtIds[2]].pos,
+        id1=triPtIds[0],
+        id2=triPtIds[1],
+        id3=triPtIds[2],
+        seq1=vectorTagPoints[triPtIds[0]].seq,
+        seq2=vectorTagPoints[triPtIds[1]].seq,
+        seq3=vectorTagPoints[triPtIds[2]].seq,
+        index=currentTriIndex
+      )
 
-    self.data.vectorTagTriangles.append(tri)
+      self.data.appendTriangle(tri)
     return tri
 
-  def checkEdgeConstraints(self, triPtIds):
-    edge1 = self.getOrCreateEdge(triPtIds[0], triPtIds[1])
-    if edge1.numEdge >= edge1.constrain:
-      return f"Edge number 1 already has {edge1.numEdge} connection(s) and can only have {edge1.constrain} connection(s) maximum."
-    edge2 = self.getOrCreateEdge(triPtIds[1], triPtIds[2])
-    if edge2.numEdge >= edge2.constrain:
-      return f"Edge number 2 already has {edge2.numEdge} connection(s) and can only have {edge2.constrain} connection(s) maximum."
-    edge3 = self.getOrCreateEdge(triPtIds[2], triPtIds[0])
-    if edge3.numEdge >= edge3.constrain:
-      return f"Edge number 3 already has {edge3.numEdge} connection(s) and can only have {edge3.constrain} connection(s) maximum."
-
-    edge1.increaseNumEdges()
-    edge2.increaseNumEdges()
-    edge3.increaseNumEdges()
-
+  def checkEdgeConstraints(self, triPtIds, edges=None):
+    """ Counts the triangle triPtIds in its three edges, in edges (dict of pair number -> TagEdge) if given and in the
+    template otherwise. Returns a message and counts nothing if one of the edges cannot have another triangle.
+    """
+    counted = dict()
+    for number, (ptId1, ptId2) in enumerate([triPtIds[0:2], triPtIds[1:3], [triPtIds[2], triPtIds[0]]], 1):
+      edgeId = pairNumber(ptId1, ptId2)
+      edge = counted.get(edgeId) or self.getOrCreateEdge(ptId1, ptId2, edges)
+      if edge.numEdge >= edge.constrain:
+        return f"Edge number {number} already has {edge.numEdge} connection(s) and can only have {edge.constrain} connection(s) maximum."
+      counted[edgeId] = replace(edge, numEdge=edge.numEdge + 1)
+
+    if edges is not None:
+      edges.update(counted)
+    else:
+      with self.data.edit():
+        for edgeId, edge in counted.items():
+          self.data.setEdge(edgeId, edge)
     return ""
 
   def allPointsAreEdges(self, triPtIds):
     tagTypes = [self.data.vectorTagInfo[self.data.vectorTagPoints[ptId].comboBoxIndex].tagType for ptId in triPtIds]
     return all(t == 2 for t in tagTypes)
 
-  def getOrCreateEdge(self, ptId1, ptId2):
+  def getOrCreateEdge(self, ptId1, ptId2, edges=None):
+    """ Returns the edge from edges (the edges of the template by default) or a new edge without triangles """
+    edges = self.data.vectorTagEdges if edges is None else edges
     edgeId = pairNumber(ptId1, ptId2)
     try:
-      edge = self.data.vectorTagEdges[edgeId]
+      edge = edges[edgeId]
     except KeyError:
       vectorTagPoints = self.data.vectorTagPoints
       cons = self.data.getEdgeConstraint(vectorTagPoints[ptId1], vectorTagPoints[ptId2])
@@ -1037,9 +1720,10 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
         numEdge=0,
         constrain=cons
       )
-      self.data.vectorTagEdges[edgeId] = edge
     return edge
 
+  @recorded(lambda recorder, self, pos, triLabelId: {
+    "position": Recording.encodePosition(pos), "label": _encodeTriangleLabel(recorder, triLabelId)})
   def assignTriangleLabel(self, pos, triLabelId: str):
     poly = self._outputMesh.meshPoly
     if not poly:
@@ -1049,12 +1733,13 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       if triLabel.mrmlNodeID == triLabelId:
         for triIdx, tri in enumerate(self.data.vectorTagTriangles):
           if poly.GetCell(triIdx).PointInTriangle(pos, astuple(tri.p1), astuple(tri.p2), astuple(tri.p3), 0.1):
-            tri.index = lblIdx
-            self._outputMesh.updateMesh()
+            self.data.setTriangle(triIdx, replace(tri, index=lblIdx))
+            self.onTemplateModified()
             break
         break
     return "No valid triangle label found"
 
+  @recorded(lambda recorder, self, pos: {"position": Recording.encodePosition(pos)})
   def attemptTriangleDeletion(self, pos):
     poly = self._outputMesh.meshPoly
     if not poly:
@@ -1064,8 +1749,9 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
       if poly.GetCell(triIdx).PointInTriangle(pos, astuple(tri.p1), astuple(tri.p2), astuple(tri.p3), 0.1):
         self.deleteTriangle(triIdx)
         break
-    self._outputMesh.updateMesh()
+    self.onTemplateModified()
 
+  @recorded(lambda recorder, self, pos: {"position": Recording.encodePosition(pos)})
   def flipTriangleNormal(self, pos):
     poly = self._outputMesh.meshPoly
     if not poly:
@@ -1074,20 +1760,10 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     for triIdx, tri in enumerate(self.data.vectorTagTriangles):
       if poly.GetCell(triIdx).PointInTriangle(pos, astuple(tri.p1), astuple(tri.p2), astuple(tri.p3), 0.1):
         # flip the 2nd and 3rd vertices
-        tempChange = tri.id2
-        tri.id2 = tri.id3
-        tri.id3 = tempChange
-
-        tempChange = tri.seq2
-        tri.seq2 = tri.seq3
-        tri.seq3 = tempChange
-
-        tempPos = tri.p2
-        tri.p2= tri.p3
-        tri.p3 = tempPos
-
+        self.data.setTriangle(triIdx, replace(tri, id2=tri.id3, id3=tri.id2, seq2=tri.seq3, seq3=tri.seq2,
+                                              p2=tri.p3, p3=tri.p2))
         break
-    self._outputMesh.updateMesh()
+    self.onTemplateModified()
 
   def deleteTriangle(self, triIdx):
     tri = self.data.vectorTagTriangles[triIdx]
@@ -1097,35 +1773,30 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     edgeId2 = pairNumber(triPtIds[1], triPtIds[2])
     edgeId3 = pairNumber(triPtIds[2], triPtIds[0])
 
-    self.data.vectorTagEdges[edgeId1].numEdge -= 1
-    self.data.vectorTagEdges[edgeId2].numEdge -= 1
-    self.data.vectorTagEdges[edgeId3].numEdge -= 1
-    del self.data.vectorTagTriangles[triIdx]
+    with self.data.edit():
+      for edgeId in [edgeId1, edgeId2, edgeId3]:
+        edge = self.data.vectorTagEdges[edgeId]
+        self.data.setEdge(edgeId, replace(edge, numEdge=edge.numEdge - 1))
+      self.data.removeTriangle(triIdx)
 
   def deletePointIdxRelatedEdges(self, globPIdx):
     delete = [key for key, ed in self.data.vectorTagEdges.items() if any(pId == globPIdx for pId in ed.edgPtIds)]
     for key in delete:
-      del self.data.vectorTagEdges[key]
+      self.data.removeEdge(key)
       
+  @profiled
   def checkNormal(self, triPtIds):
     id1, id2, id3 = triPtIds
 
-    normalGenerator = vtk.vtkPolyDataNormals()
-    surface = slicer.util.getNode(self.getParameterNode().GetNodeReferenceID(PARAM_INPUT_MODEL))
-    normalGenerator.SetInputData(surface.GetPolyData())
-    normalGenerator.Update()
-    normalPolyData = normalGenerator.GetOutput()
-    normalDataFloat = normalPolyData.GetPointData().GetArray("Normals")
+    # computed once per skeleton
+    normals = self._workspace.getNormals()
 
     vectorTagPoints = self.data.vectorTagPoints
 
-    if normalDataFloat:
-      normal1 = [0, 0, 0]
-      normalDataFloat.GetTypedTuple(vectorTagPoints[id1].seq, normal1)
-      normal2 = [0, 0, 0]
-      normalDataFloat.GetTypedTuple(vectorTagPoints[id2].seq, normal2)
-      normal3 = [0, 0, 0]
-      normalDataFloat.GetTypedTuple(vectorTagPoints[id2].seq, normal3)
+    if normals is not None:
+      normal1 = normals[vectorTagPoints[id1].seq]
+      normal2 = normals[vectorTagPoints[id2].seq]
+      normal3 = normals[vectorTagPoints[id2].seq]
 
       import numpy as np
 
@@ -1161,64 +1832,184 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
 
     return triPtIds
 
-  def save(self):
-    outputDirectory = self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY)
-    logging.info(f"Saving to directory: {outputDirectory}")
-    modelName = self.parameterNode.GetParameter(PARAM_OUTPUT_MODEL)
-    self.saveTriangulatedMesh()
-    self.saveAffixVTKFile()
-    self.saveCMRepFile(outputDirectory, modelName)
-    subdividedModel = self.createSubdivideMesh()
-    if subdividedModel:
-      slicer.util.saveNode(subdividedModel, str(Path(outputDirectory) / f"{subdividedModel.GetName()}.vtk"))
-      slicer.mrmlScene.RemoveNode(subdividedModel)
+  def startSessionRecording(self, filePath):
+    """ Records all following editing operations to filePath for replay with Testing/Python/ReplaySession.py. The
+    current template is written next to it as '<name>Affix.vtk'.
+    """
+    if self.data.polydata is None:
+      raise ValueError("An input model is required for recording a session")
+    filePath = Path(filePath)
+    affixFile = filePath.with_name(f"{filePath.stem}Affix.vtk")
+    CustomInformationWriter(self.data).writeCustomDataToFile(str(affixFile))
+    nodes = list(self.getAllMarkupNodes()) + list(self.getAllTriangleNodes())
+    Recording.start(filePath, {
+      "affix": affixFile.name,
+      "nodes": [Recording.getNodeDescription(node, controlPoints=True) for node in nodes],
+      "tagInfoNodeIDs": [ti.mrmlNodeID for ti in self.data.vectorTagInfo],
+      "labelInfoNodeIDs": [tl.mrmlNodeID for tl in self.data.vectorLabelInfo],
+      "pointArray": [[mnId, pIdx, globPIdx] for (mnId, pIdx), globPIdx in self.pointArray.items()],
+      "parameters": {name: self.parameterNode.GetParameter(name) for name in PARAM_DEFAULTS}
+    })
 
-    if slicer.util.toBool(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE)) is True:
-      inflatedModel = self.createInflatedModel()
-      slicer.util.saveNode(inflatedModel, str(Path(outputDirectory) / f"{inflatedModel.GetName()}.vtk"))
-      slicer.mrmlScene.RemoveNode(inflatedModel)
+  def stopSessionRecording(self):
+    Recording.stop(templateHash=self.data.getTemplateHash(), numberOfTriangles=len(self.data.vectorTagTriangles))
 
-  def saveAffixVTKFile(self):
+  def getJournalDirectory(self):
     if self.inputModel is None:
-      return
+      return None
+    return Path(self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY)) / f"{self.inputModel.GetName()}Journal"
 
-    outputDirectory = self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY)
-    writer = CustomInformationWriter(self.data)
-    out = f"{outputDirectory}/{self.inputModel.GetName()}Affix.vtk"
-    writer.writeCustomDataToFile(out)
+  def updateJournal(self):
+    """ Starts, moves or stops journaling the template edits according to the AutoSave parameter, the input model
+    and the output directory. Journaling starts with a checkpoint, i.e. earlier journals of the input model can no
+    longer be recovered. A journal that is stopped since AutoSave was disabled is removed.
+    """
+    enabled = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_AUTO_SAVE))
+    directory = self.getJournalDirectory() if enabled else None
+    if self._journal is not None and self._journal.directory != directory:
+      self.stopJournal(remove=not enabled)
+    if directory is not None and self._journal is None:
+      self._journal = Journal.JournalWriter(directory, self.data)
+      logging.info(f"Journaling template edits to {directory}")
+
+  def stopJournal(self, remove=False):
+    if self._journal is not None:
+      journal, self._journal = self._journal, None
+      journal.close(remove=remove)
+
+  def readRecoverableTemplate(self):
+    """ Returns the template recovered from the journal of the input model if it differs from the current one """
+    directory = self.getJournalDirectory()
+    if directory is None or self._journal is not None:
+      return None
+    recovered = Journal.recover(directory, CustomInformation(self.inputModel.GetPolyData()).getSkeletonHash())
+    if recovered is None or recovered.getTemplateHash() == self.data.getTemplateHash():
+      return None
+    return recovered
 
-  def saveTriangulatedMesh(self):
-    if self._outputMesh is None or self._outputMesh.meshModelNode is None:
-      return
-    outputDirectory = self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY)
-    outputModel = self._outputMesh.meshModelNode
-    slicer.util.saveNode(outputModel, str(Path(outputDirectory) / f"{outputModel.GetName()}.vtk"))
-
-  def saveCMRepFile(self, outputDirectory, modelName):
-    outFile = Path(outputDirectory) / f"{modelName}.cmrep"
-
-    attrs = OrderedDict({
-      "Grid.Type": self.parameterNode.GetParameter(PARAM_GRID_TYPE),
-      "Grid.Model.SolverType": self.parameterNode.GetParameter(PARAM_GRID_MODEL_SOLVER_TYPE),
-      "Grid.Model.Atom.SubdivisionLevel": self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL),
-      "Grid.Model.Coefficient.FileName": f"{modelName}.vtk",
-      "Grid.Model.Coefficient.FileType": "VTK",
-      "Grid.Model.nLabels": len(set([t.tagIndex for t in self.data.vectorTagInfo]))
-    })
+  def restoreTemplate(self, customInfo: CustomInformation):
+    """ Replaces the template and its markups and triangle label nodes by customInfo """
+    for node in list(self.getAllMarkupNodes()) + list(self.getAllTriangleNodes()):
+      slicer.mrmlScene.RemoveNode(node)
+    self.pointArray = dict()
+    self.readCustomInformation(customInfo)
+
+  @profiled
+  def save(self):
+    """ Writes triangulated mesh, Affix file, .cmrep file and (if enabled) subdivided mesh in parallel from a snapshot
+    of the current data. Returns a dictionary of ArtifactResult (path, seconds, bytes, sha256) by artifact name.
 
-    if self.parameterNode.GetParameter(PARAM_GRID_MODEL_SOLVER_TYPE) == "PDE":
-      attrs["Grid.Model.Coefficient.ConstantRho"] = \
-        self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RHO)
+    Nothing is replaced in the output directory if any of the artifacts fails. Artifacts that did not change since
+    they were last saved to the output directory (according to its manifest file) are skipped. The inflated model is
+    written once the inflation running in the background has finished.
+    """
+    outputDirectory = Path(self.parameterNode.GetParameter(PARAM_OUTPUT_DIRECTORY))
+    logging.info(f"Saving to directory: {outputDirectory}")
+    modelName = self.parameterNode.GetParameter(PARAM_OUTPUT_MODEL)
+
+    templateHash = self.data.getTemplateHash()
+    skeletonHash = self.data.getSkeletonHash()
+
+    artifacts = ArtifactWriter(manifest=ArtifactManifest(outputDirectory))
+    meshPoly = None
+    if self._outputMesh is not None and self._outputMesh.meshModelNode is not None:
+      outputModel = self._outputMesh.meshModelNode
+      meshPoly = vtk.vtkPolyData()
+      meshPoly.DeepCopy(outputModel.GetPolyData())
+      # the quality measures are only displayed
+      for name in QUALITY_ARRAYS:
+        meshPoly.GetCellData().RemoveArray(name)
+      artifacts.add("triangulatedMesh", outputDirectory / f"{outputModel.GetName()}.vtk",
+                    lambda path: writeModelFile(meshPoly, path),
+                    key=createKey("triangulatedMesh", templateHash))
+
+    if self.inputModel is not None:
+      dataSnapshot = self.data.snapshot()
+      artifacts.add("affix", outputDirectory / f"{self.inputModel.GetName()}Affix.vtk",
+                    lambda path: CustomInformationWriter(dataSnapshot).writeCustomDataToFile(path),
+                    key=createKey("affix", templateHash, skeletonHash))
+
+    attrs = self.getCMRepAttributes(modelName)
+    artifacts.add("cmrep", outputDirectory / f"{modelName}.cmrep", lambda path: writeCMRepFile(path, attrs),
+                  key=createKey("cmrep", attrs))
 
-    if slicer.util.toBool(self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_USE_CONSTANT_RADIUS)) is True:
-      attrs["Grid.Model.Coefficient.ConstantRadius"] = \
-        self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS)
+    numberOfSubdivisions = int(self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL))
+    if numberOfSubdivisions > 0 and meshPoly is not None and self.locator is not None:
+      # reuse the preview if it is up to date (cached results are never modified), otherwise subdivide on the worker
+      subdivided = self._workspace.subdivisionCache.peek(self.data.version, numberOfSubdivisions)
+      locator = self.locator
+      artifacts.add("subdividedMesh", outputDirectory / f"{self.inputModel.GetName()}_Subdivide.vtk",
+                    lambda path: writeModelFile(subdivided if subdivided is not None else
+                                                subdivideTemplatePolyData(meshPoly, numberOfSubdivisions, locator), path),
+                    key=createKey("subdividedMesh", templateHash, skeletonHash, numberOfSubdivisions))
+
+    summary = artifacts.write()
+    for result in summary.values():
+      if result.skipped:
+        logging.info(f"Unchanged {result.name}: {result.path}")
+      else:
+        logging.info(f"Saved {result.name} ({result.bytes} bytes, {result.seconds:.2f}s): {result.path}")
 
-    with open(outFile, "w") as f:
-      for key, value in attrs.items():
-        f.write(f"{key} = {value}\n")
+    if slicer.util.toBool(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE)) is True:
+      inflatedFile = outputDirectory / f"{self.inputModel.GetName()}_Inflated.vtk"
+      inflatedKey = createKey("inflatedModel", templateHash, self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS))
+      if ArtifactManifest(outputDirectory).isUpToDate(inflatedFile, inflatedKey):
+        logging.info(f"Unchanged inflatedModel: {inflatedFile}")
+        return summary
+
+      # inflation runs in the background and the inflated model is written once the CLI has finished
+      token = self._savedInflation = object()
+
+      def onInflationCompleted(inflatedModel):
+        if self._savedInflation is token:
+          self._savedInflation = None
+        if inflatedModel is None:
+          return
+        polydata = inflatedModel.GetPolyData()
+        result = writeAtomically(inflatedFile, lambda path: writeModelFile(polydata, path),
+                                 ArtifactManifest(outputDirectory), inflatedKey)
+        logging.info(f"Saved inflated model ({result.bytes} bytes, {result.seconds:.2f}s): {result.path}")
+        slicer.mrmlScene.RemoveNode(inflatedModel)
+      self.createInflatedModel(onInflationCompleted)
+    return summary
+
+  def getCMRepAttributes(self, modelName):
+    useConstantRadius = slicer.util.toBool(self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_USE_CONSTANT_RADIUS))
+    return createCMRepAttributes(
+      self.data,
+      modelName,
+      gridType=self.parameterNode.GetParameter(PARAM_GRID_TYPE),
+      solverType=self.parameterNode.GetParameter(PARAM_GRID_MODEL_SOLVER_TYPE),
+      subdivisionLevel=self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL),
+      constantRho=self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RHO),
+      constantRadius=self.parameterNode.GetParameter(PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS) if useConstantRadius else None
+    )
 
-  def createInflatedModel(self):
+  def getMedialInflation(self):
+    """ Returns the in-process inflation of the triangulated mesh (topology built once per template version) or None
+    if the mesh has branches, which only InflateMedialModel handles.
+    """
+    stamp, inflation = self._medialInflation
+    if stamp != (self.data, self.data.version):
+      inputSurface = self.parameterNode.GetNodeReference(PARAM_OUTPUT_MODEL)
+      try:
+        inflation = MedialInflation.fromPolyData(inputSurface.GetPolyData())
+      except BranchingMedialMeshError as exc:
+        logging.debug(f"Using InflateMedialModel: {exc}")
+        inflation = None
+      self._medialInflation = ((self.data, self.data.version), inflation)
+    return inflation
+
+  def createInflatedModel(self, callback=None):
+    """ Inflates the triangulated mesh and returns the CLI node if InflateMedialModel had to be started (None
+    otherwise or on failure).
+
+    Non-branching meshes are inflated in-process right away. Meshes with branches are inflated by the inflation worker
+    (see getInflationWorker), or by an InflateMedialModel run if there is none, without blocking the application.
+    callback is called with the inflated model node once inflation has completed successfully or with None if it
+    failed or was cancelled. A running inflation is cancelled when a new one is requested.
+    """
+    self.cancelInflation()
     try:
       outputModel = self.parameterNode.GetNodeReference(PARAM_INFLATED_MODEL)
       if not outputModel:
@@ -1226,55 +2017,283 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
         self.parameterNode.SetNodeReferenceID(PARAM_INFLATED_MODEL, outputModel.GetID())
       outputModel.SetName(f"{self.inputModel.GetName()}_Inflated")
       inputSurface = self.parameterNode.GetNodeReference(PARAM_OUTPUT_MODEL)
+      rad = float(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS))
+
+      inflation = self.getMedialInflation()
+      if inflation is not None:
+        outputModel.SetAndObservePolyData(inflation.inflatePolyData(rad))
+        if callback:
+          callback(outputModel)
+        return None
+
+      outputModelID = outputModel.GetID()
+
+      def onInflated(models):
+        model = slicer.mrmlScene.GetNodeByID(outputModelID)
+        if models and model is not None:
+          model.SetAndObservePolyData(models[0])
+        else:
+          model = None
+        if callback:
+          callback(model)
+
+      if self._submitInflation(inputSurface.GetPolyData(), [rad], onInflated):
+        return None
+
       params = {
         'inputSurface': inputSurface.GetID(),
         'outputSurface': outputModel.GetID(),
-        'rad': float(self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_RADIUS))
+        'rad': rad
       }
-      slicer.cli.run(slicer.modules.inflatemedialmodel, None, params, wait_for_completion=True)
-      return outputModel
+      return self._startInflationCLI(params, outputModel, callback)
     except Exception as exc:
-      print(exc)
+      logging.error(f"Failed to start model inflation: {exc}")
+      if callback:
+        callback(None)
       return None
 
-  def createSubdivideMesh(self):
-    numberOfSubdivisions = int(self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL))
-
-    inputSurfaceId = self.parameterNode.GetNodeReferenceID(PARAM_OUTPUT_MODEL)
-
-    if not numberOfSubdivisions > 0 or inputSurfaceId is None:
+  def _startInflationCLI(self, params, outputModel, callback):
+    cliNode = slicer.cli.run(slicer.modules.inflatemedialmodel, None, params, wait_for_completion=False)
+    self.inflationCLINode = cliNode
+    self._inflationRuns[cliNode.GetID()] = (callback, outputModel.GetID())
+    self.addObserver(cliNode, slicer.vtkMRMLCommandLineModuleNode.StatusModifiedEvent, self.onInflationStatusModified)
+    return cliNode
+
+  def getInflationSweepRadii(self):
+    radii = []
+    for value in self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_SWEEP_RADII).replace(";", ",").split(","):
+      if value.strip():
+        radii.append(float(value))
+    return radii
+
+  def createInflationSweep(self, callback=None):
+    """ Inflates the triangulated mesh with every radius of the sweep and places the inflated models side by side.
+    Returns the CLI node if InflateMedialModel had to be started (None otherwise or on failure).
+
+    The topology is built only once: in-process for non-branching meshes, otherwise by a single request to the
+    inflation worker or InflateMedialModel run in sweep mode. callback is called with the list of inflated model nodes
+    (empty if inflation failed). The sweep is not started while the inflated model of a save is being computed.
+    """
+    if self.isSavingInflatedModel():
+      logging.warning("Inflation sweep not started: the inflated model of the last save is still being computed")
+      (callback or (lambda models: None))([])
+      return None
+    self.cancelInflation()
+    self.removeInflationSweepModels()
+    callback = callback or (lambda models: None)
+    try:
+      radii = self.getInflationSweepRadii()
+    except ValueError:
+      logging.error(f"Invalid sweep radii: {self.parameterNode.GetParameter(PARAM_GRID_MODEL_INFLATE_SWEEP_RADII)}")
+      callback([])
+      return None
+    inputSurface = self.parameterNode.GetNodeReference(PARAM_OUTPUT_MODEL)
+    if not radii or inputSurface is None:
+      callback([])
       return None
 
-    # output model
-    modelNode = slicer.util.getNode(inputSurfaceId)
+    try:
+      inflation = self.getMedialInflation()
+      if inflation is not None:
+        models = []
+        for rad in radii:
+          model = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode')
+          model.SetAndObservePolyData(inflation.inflatePolyData(rad))
+          models.append(model)
+        callback(self._arrangeInflationSweepModels(models, radii))
+        return None
+
+      def onInflated(polydatas):
+        if not polydatas:
+          callback([])
+          return
+        models = []
+        for polydata in polydatas:
+          model = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode')
+          model.SetAndObservePolyData(polydata)
+          models.append(model)
+        callback(self._arrangeInflationSweepModels(models, radii))
+
+      if self._submitInflation(inputSurface.GetPolyData(), radii, onInflated):
+        return None
+
+      sweepOutput = Path(slicer.app.temporaryPath) / f"{inputSurface.GetName()}_Sweep.vtk"
+      outputModel = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode')
+      params = {
+        'inputSurface': inputSurface.GetID(),
+        'outputSurface': outputModel.GetID(),
+        'rad': radii[0],
+        'radii': ",".join(str(rad) for rad in radii),
+        'sweepOutput': str(sweepOutput)
+      }
 
-    # clean
-    cleanPoly = vtk.vtkCleanPolyData()
-    cleanPoly.SetInputData(modelNode.GetPolyData())
+      def onSweepCompleted(model):
+        slicer.mrmlScene.RemoveNode(outputModel)
+        if model is None:
+          callback([])
+          return
+        models = []
+        for rad in radii:
+          # same naming as the CLI: <name>_r<radius><extension>
+          sweepFile = sweepOutput.with_name(f"{sweepOutput.stem}_r{rad:g}{sweepOutput.suffix}")
+          models.append(slicer.util.loadModel(str(sweepFile)))
+          sweepFile.unlink()
+        callback(self._arrangeInflationSweepModels(models, radii))
+
+      return self._startInflationCLI(params, outputModel, onSweepCompleted)
+    except Exception as exc:
+      logging.error(f"Failed to start inflation sweep: {exc}")
+      callback([])
+      return None
 
-    # subdivide
-    subdivisionFilter = vtk.vtkLoopSubdivisionFilter()
-    subdivisionFilter.SetNumberOfSubdivisions(numberOfSubdivisions)
-    subdivisionFilter.SetInputConnection(cleanPoly.GetOutputPort())
-    subdivisionFilter.Update()
-    subdivisionOutput = subdivisionFilter.GetOutput()
+  def _arrangeInflationSweepModels(self, models, radii):
+    """ Names the sweep models after their radius and moves each one next to the previous one (along R) """
+    bounds = [0.0] * 6
+    self.parameterNode.GetNodeReference(PARAM_OUTPUT_MODEL).GetPolyData().GetBounds(bounds)
+    width = bounds[1] - bounds[0]
+    spacing = width + 2 * max(radii) + 0.1 * width
+    for idx, (model, rad) in enumerate(zip(models, radii)):
+      model.SetName(f"{self.inputModel.GetName()}_Inflated_r{rad:g}")
+      if not model.GetDisplayNode():
+        model.CreateDefaultDisplayNodes()
+      transform = vtk.vtkTransform()
+      transform.Translate(idx * spacing, 0, 0)
+      transformNode = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLLinearTransformNode', f"{model.GetName()}_Offset")
+      transformNode.SetMatrixTransformToParent(transform.GetMatrix())
+      model.SetAndObserveTransformNodeID(transformNode.GetID())
+      self.parameterNode.AddNodeReferenceID(PARAM_INFLATION_SWEEP_MODEL, model.GetID())
+    return models
+
+  def removeInflationSweepModels(self):
+    for idx in range(self.parameterNode.GetNumberOfNodeReferences(PARAM_INFLATION_SWEEP_MODEL)):
+      model = self.parameterNode.GetNthNodeReference(PARAM_INFLATION_SWEEP_MODEL, idx)
+      if model is None:
+        continue
+      transformNode = model.GetParentTransformNode()
+      if transformNode:
+        slicer.mrmlScene.RemoveNode(transformNode)
+      slicer.mrmlScene.RemoveNode(model)
+    self.parameterNode.RemoveNodeReferenceIDs(PARAM_INFLATION_SWEEP_MODEL)
+
+  def isSavingInflatedModel(self):
+    """ Whether save() waits for an inflation to write the inflated model """
+    return self._savedInflation is not None
+
+  def isInflationRunning(self):
+    return self._pendingInflation is not None or \
+      (self.inflationCLINode is not None and self.inflationCLINode.IsBusy())
+
+  def cancelInflation(self):
+    if self._pendingInflation is not None:
+      future, callback = self._pendingInflation
+      self._pendingInflation = None
+      self._inflationTimer.stop()
+      self._inflationWorker.cancel(future)
+      logging.info("Model inflation cancelled")
+      callback(None)
+    cliNode, self.inflationCLINode = self.inflationCLINode, None
+    if cliNode is not None and cliNode.IsBusy():
+      # the status events of the cancelled run are ignored from now on, it only removes its node once it has stopped
+      callback, _ = self._inflationRuns.pop(cliNode.GetID(), (None, None))
+      cliNode.Cancel()
+      logging.info("Model inflation cancelled")
+      if callback:
+        callback(None)
+
+  def getInflationWorker(self):
+    """ Long-lived InflateMedialModel process (see InflationWorker.py), started with the first inflation of a mesh
+    with branches. None if the InflateMedialModel executable is not available.
+    """
+    if self._inflationWorker is None:
+      try:
+        executable = findExecutable(slicer.modules.inflatemedialmodel.path)
+      except (AttributeError, FileNotFoundError) as exc:
+        logging.debug(f"Inflation worker not available, using InflateMedialModel runs: {exc}")
+        return None
+      self._inflationWorker = InflationWorker(executable)
+    return self._inflationWorker
+
+  def closeInflationWorker(self):
+    self.cancelInflation()
+    if self._inflationWorker is not None:
+      self._inflationWorker.close()
+      self._inflationWorker = None
+
+  def _submitInflation(self, polydata, radii, callback):
+    """ Inflates polydata with every radius by the inflation worker. callback is called on the main thread with the
+    list of inflated polydata, or with None if inflation failed or was cancelled. Returns False if there is no worker.
+    """
+    worker = self.getInflationWorker()
+    if worker is None:
+      return False
+    self._pendingInflation = (worker.submit(polydata, radii), callback)
+    self._inflationTimer.start()
+    return True
 
-    # clean radius array if exists
-    pointdata = subdivisionOutput.GetPointData()
-    if pointdata.GetArray("Radius"):
-      pointdata.RemoveArray("Radius")
+  def _onInflationTimeout(self):
+    """ Polls the pending inflation on the main thread since MRML nodes must not be touched from the worker """
+    if self._pendingInflation is None:
+      self._inflationTimer.stop()
+      return
+    future, callback = self._pendingInflation
+    if not future.done():
+      return
+    self._inflationTimer.stop()
+    self._pendingInflation = None
+    try:
+      models = future.result()
+    except CancelledError:
+      logging.info("Model inflation cancelled")
+      models = None
+    except Exception as exc:
+      logging.error(f"Model inflation failed: {exc}")
+      models = None
+    else:
+      logging.info("Model inflation completed")
+    callback(models)
 
-    fltArray1 = vtk.vtkFloatArray()
-    fltArray1.SetName("Radius")
+  def onInflationStatusModified(self, cliNode, event):
+    logging.debug(f"InflateMedialModel: {cliNode.GetStatusString()} ({cliNode.GetProgress()}%)")
+    if cliNode.IsBusy():
+      return
+    self.removeObserver(cliNode, slicer.vtkMRMLCommandLineModuleNode.StatusModifiedEvent, self.onInflationStatusModified)
+    if cliNode is self.inflationCLINode:
+      self.inflationCLINode = None
+    run = self._inflationRuns.pop(cliNode.GetID(), None)
+    slicer.mrmlScene.RemoveNode(cliNode)
+    if run is None:
+      # cancelled, its callback was called already
+      return
 
-    pos = [0.0, 0.0, 0.0]
-    for i in range(subdivisionOutput.GetNumberOfPoints()):
-      subdivisionOutput.GetPoint(i, pos)
-      _, radius = self.getClosestVertexAndRadius(pos)
-      fltArray1.InsertNextValue(radius)
+    callback, outputModelID = run
+    outputModel = slicer.mrmlScene.GetNodeByID(outputModelID)
+    if cliNode.GetStatus() == cliNode.Completed and outputModel is not None:
+      logging.info("Model inflation completed")
+    else:
+      if cliNode.GetStatus() == cliNode.Cancelled:
+        logging.info("Model inflation cancelled")
+      else:
+        logging.error(f"Model inflation failed: {cliNode.GetErrorText()}")
+      outputModel = None
 
-    pointdata.AddArray(fltArray1)
+    if callback:
+      callback(outputModel)
 
+  def _getSubdivisionBase(self):
+    """ Snapshot of the triangulated mesh that is subdivided. Only copied once per template version, which keeps the
+    subdivision cache valid and lets the worker thread use it while the mesh keeps being edited.
+    """
+    modelNode = self._outputMesh.meshModelNode
+    if modelNode is None or modelNode.GetPolyData() is None:
+      return None
+    stamp, snapshot = self._subdivisionBase
+    if stamp != (self.data, self.data.version):
+      snapshot = vtk.vtkPolyData()
+      snapshot.DeepCopy(modelNode.GetPolyData())
+      self._subdivisionBase = ((self.data, self.data.version), snapshot)
+    return snapshot
+
+  def _setSubdivisionPreview(self, subdivisionOutput):
     outputModel = self.parameterNode.GetNodeReference(PARAM_SUBDIVISION_PREVIEW_MODEL)
     if not outputModel:
       outputModel = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode')
@@ -1283,6 +2302,73 @@ class SyntheticSkeletonLogic(VTKObservationMixin, ScriptedLoadableModuleLogic):
     outputModel.SetAndObservePolyData(subdivisionOutput)
     return outputModel
 
+  @profiled
+  def createSubdivideMesh(self):
+    numberOfSubdivisions = int(self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL))
+    basePolyData = self._getSubdivisionBase()
+    if not numberOfSubdivisions > 0 or basePolyData is None:
+      return None
+
+    self.cancelSubdivisionPreview()
+    subdivisionOutput = self._workspace.subdivisionCache.get(basePolyData, self.data.version, numberOfSubdivisions,
+                                                             self.locator)
+    return self._setSubdivisionPreview(subdivisionOutput)
+
+  def requestSubdivisionPreview(self, callback):
+    """ Subdivides the triangulated mesh on a worker thread and calls callback(previewModel) on the main thread once
+    the preview model was updated. A request supersedes any request that is still running; the callback of a
+    superseded or cancelled request is never called. Cached levels are applied right away.
+    """
+    numberOfSubdivisions = int(self.parameterNode.GetParameter(PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL))
+    basePolyData = self._getSubdivisionBase()
+    self.cancelSubdivisionPreview()
+    if not numberOfSubdivisions > 0 or basePolyData is None or self.locator is None:
+      callback(None)
+      return
+
+    cached = self._workspace.subdivisionCache.peek(self.data.version, numberOfSubdivisions)
+    if cached is not None:
+      callback(self._setSubdivisionPreview(cached))
+      return
+
+    request = self._subdivisionRequest
+    future = self._subdivisionExecutor.submit(self._workspace.subdivisionCache.get, basePolyData, self.data.version,
+                                              numberOfSubdivisions, self.locator,
+                                              lambda: self._subdivisionRequest != request)
+    self._pendingSubdivision = (request, future, callback)
+    self._subdivisionTimer.start()
+
+  def isSubdivisionPending(self):
+    return self._pendingSubdivision is not None
+
+  def cancelSubdivisionPreview(self):
+    # the running worker stops before its next subdivision step
+    self._subdivisionRequest += 1
+    if self._pendingSubdivision is not None:
+      self._pendingSubdivision[1].cancel()
+      self._pendingSubdivision = None
+    self._subdivisionTimer.stop()
+
+  def _onSubdivisionTimeout(self):
+    """ Polls the pending subdivision on the main thread since MRML nodes must not be touched from the worker """
+    if self._pendingSubdivision is None:
+      self._subdivisionTimer.stop()
+      return
+    request, future, callback = self._pendingSubdivision
+    if not future.done():
+      return
+    self._subdivisionTimer.stop()
+    self._pendingSubdivision = None
+    if request != self._subdivisionRequest or future.cancelled():
+      return
+    try:
+      subdivisionOutput = future.result()
+    except Exception:
+      logging.exception("Subdivision failed")
+      callback(None)
+      return
+    callback(self._setSubdivisionPreview(subdivisionOutput) if subdivisionOutput is not None else None)
+
 
 #
 # SyntheticSkeletonTest
@@ -1306,59 +2392,91 @@ class SyntheticSkeletonTest(ScriptedLoadableModuleTest):
     """
     self.setUp()
     self.test_SyntheticSkeleton1()
+    self.setUp()
+    self.test_InflationMatchesCLI()
 
   def test_SyntheticSkeleton1(self):
 
     self.delayDisplay('Test passed')
 
+  def test_InflationMatchesCLI(self):
+    """ In-process inflation of a non-branching mesh yields the same model as InflateMedialModel """
+    import numpy as np
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    plane = vtk.vtkPlaneSource()
+    plane.SetResolution(6, 4)
+    triangulate = vtk.vtkTriangleFilter()
+    triangulate.SetInputConnection(plane.GetOutputPort())
+    warp = vtk.vtkPolyData()
+    triangulate.Update()
+    warp.DeepCopy(triangulate.GetOutput())
+    for i in range(warp.GetNumberOfPoints()):
+      x, y, _ = warp.GetPoint(i)
+      warp.GetPoints().SetPoint(i, 20 * x, 10 * y, 3 * np.sin(4 * x) * np.cos(3 * y))
+    medialModel = slicer.modules.models.logic().AddModel(warp)
+
+    rad = 1.5
+    cliModel = slicer.mrmlScene.AddNewNodeByClass('vtkMRMLModelNode')
+    slicer.cli.runSync(slicer.modules.inflatemedialmodel, None,
+                       {'inputSurface': medialModel.GetID(), 'outputSurface': cliModel.GetID(), 'rad': rad})
+    expected = cliModel.GetPolyData()
+
+    inflation = MedialInflation.fromPolyData(medialModel.GetPolyData())
+    actual = inflation.inflatePolyData(rad)
+
+    self.assertEqual(actual.GetNumberOfPoints(), expected.GetNumberOfPoints())
+    self.assertEqual(actual.GetNumberOfPolys(), expected.GetNumberOfPolys())
+    np.testing.assert_allclose(vtk_to_numpy(actual.GetPoints().GetData()),
+                               vtk_to_numpy(expected.GetPoints().GetData()), atol=1e-4)
+    np.testing.assert_array_equal(vtk_to_numpy(actual.GetPolys().GetData()),
+                                  vtk_to_numpy(expected.GetPolys().GetData()))
+    np.testing.assert_array_equal(vtk_to_numpy(actual.GetPointData().GetArray("MedialIndex")),
+                                  vtk_to_numpy(expected.GetPointData().GetArray("MedialIndex")))
+
+    # three triangles sharing an edge (branch) are left to the CLI
+    branching = vtk.vtkPolyData()
+    branching.DeepCopy(warp)
+    branching.GetPolys().InsertNextCell(3, [0, 1, warp.GetNumberOfPoints() - 1])
+    branching.GetPolys().InsertNextCell(3, [1, 0, warp.GetNumberOfPoints() - 2])
+    self.assertFalse(MedialInflation.isSupported(branching))
+
+    self.delayDisplay('Test passed')
+
 
 class Mesh:
 
   def __init__(self, data: CustomInformation):
     self.meshModelNode = None
     self.meshPoly = None
-    self.data = data
+    self._data = data
+    self.quality = MeshQuality(data)
+
+  @property
+  def data(self):
+    return self._data
+
+  @data.setter
+  def data(self, data):
+    if data is not self._data:
+      self._data = data
+      self.quality.attach(data)
 
   def setMeshModelNode(self, destination):
     self.meshModelNode = destination
     if self.meshModelNode:
       self.updateMesh()
 
+  @profiled
   def updateMesh(self):
-    triangles = vtk.vtkCellArray()
-
-    self.meshPoly = vtk.vtkPolyData()
-    self.meshPoints = vtk.vtkPoints()
-    self.meshPoly.SetPoints(self.meshPoints)
-
-    for pt in self.data.vectorTagPoints:
-      self.meshPoints.InsertNextPoint(astuple(pt.pos))
-
-    radiusArray = vtk.vtkFloatArray()
-    radiusArray.SetName("Radius")
-
-    for pt in self.data.vectorTagPoints:
-      radiusArray.InsertNextValue(pt.radius)
-
-    self.meshPoly.GetPointData().AddArray(radiusArray)
-
-    colorsArray = vtk.vtkUnsignedCharArray()
-    colorsArray.SetNumberOfComponents(3)
-    colorsArray.SetName("Colors")
-
-    for tri in self.data.vectorTagTriangles:
-      triangle = vtk.vtkTriangle()
-      triangle.GetPointIds().SetId(0, tri.id1)
-      triangle.GetPointIds().SetId(1, tri.id2)
-      triangle.GetPointIds().SetId(2, tri.id3)
-      triangles.InsertNextCell(triangle)
-
-      color = qt.QColor(self.data.vectorLabelInfo[tri.index].labelColor)
-      colorsArray.InsertNextTuple3(color.red(), color.green(), color.blue())
-
-    self.meshPoly.GetCellData().SetScalars(colorsArray)
-    self.meshPoly.SetPoints(self.meshPoints)
-    self.meshPoly.SetPolys(triangles)
-
+    self.meshPoly = createTemplatePolyData(self.data)
+    # only the triangles edited since the last update are recomputed
+    for name in QUALITY_ARRAYS:
+      values = self.quality.getArray(name)
+      array = numpy_to_vtk(np.where(np.isfinite(values), values, np.nan), deep=True, array_type=vtk.VTK_DOUBLE)
+      array.SetName(name)
+      self.meshPoly.GetCellData().AddArray(array)
+    if self.meshModelNode is None:
+      return
     self.meshModelNode.SetAndObservePolyData(self.meshPoly)
     self.meshModelNode.Modified()
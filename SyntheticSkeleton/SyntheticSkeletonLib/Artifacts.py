@@ -0,0 +1,203 @@
+""" Concurrent and atomic writing of output artifacts.
+
+Every artifact is serialized into a temporary file next to its destination. Only once all of them have been written
+successfully, the temporary files are renamed into place. If any artifact fails, all temporary files are removed and
+the output directory is left untouched.
+
+Artifacts can be added with a key describing their content (e.g. a hash of the data they are written from). Together
+with an ArtifactManifest, artifacts whose key did not change since they were last written are skipped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+
+MANIFEST_FILE_NAME = "SyntheticSkeletonManifest.json"
+
+
+def _getUmask():
+  umask = os.umask(0)
+  os.umask(umask)
+  return umask
+
+
+# mode of files created with open(). mkstemp creates the temporary files owner-only, which os.replace would keep.
+FILE_MODE = 0o666 & ~_getUmask()
+
+
+class ArtifactWriteError(Exception):
+  pass
+
+
+@dataclass
+class ArtifactResult:
+  name: str
+  path: str
+  seconds: float = 0.0
+  bytes: int = 0
+  sha256: str = ""
+  skipped: bool = False
+
+
+def hashFile(filePath, chunkSize=1 << 20):
+  digest = hashlib.sha256()
+  with open(filePath, "rb") as f:
+    for chunk in iter(lambda: f.read(chunkSize), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+class ArtifactManifest(object):
+  """ Keeps key and content hash of all artifacts written to a directory in a JSON manifest file.
+
+  An artifact is up to date if its key matches and the file on disk still has the size and modification time it had
+  when it was written, so checking does not require reading the artifact.
+  """
+
+  def __init__(self, directory):
+    self.filePath = Path(directory) / MANIFEST_FILE_NAME
+    try:
+      with open(self.filePath) as f:
+        self.entries = json.load(f)
+    except (OSError, ValueError):
+      self.entries = {}
+
+  def isUpToDate(self, filePath, key):
+    entry = self.entries.get(Path(filePath).name)
+    if entry is None or entry.get("key") != key:
+      return False
+    try:
+      stat = os.stat(filePath)
+    except OSError:
+      return False
+    return stat.st_size == entry.get("bytes") and stat.st_mtime_ns == entry.get("mtime")
+
+  def getEntry(self, filePath):
+    return self.entries.get(Path(filePath).name)
+
+  def update(self, filePath, key, sha256):
+    stat = os.stat(filePath)
+    self.entries[Path(filePath).name] = {"key": key, "sha256": sha256, "bytes": stat.st_size, "mtime": stat.st_mtime_ns}
+
+  def save(self):
+    fd, tempPath = tempfile.mkstemp(prefix=f".{self.filePath.stem}.", suffix=".tmp", dir=self.filePath.parent)
+    with os.fdopen(fd, "w") as f:
+      json.dump(self.entries, f, indent=2, sort_keys=True)
+    os.chmod(tempPath, FILE_MODE)
+    os.replace(tempPath, self.filePath)
+
+
+class ArtifactWriter(object):
+  """ Collects artifacts to write and writes them on a thread pool.
+
+  The write function of an artifact receives the temporary file path to write to. It runs on a worker thread, which
+  means it must only work on data that is not modified concurrently (i.e. a snapshot).
+  """
+
+  def __init__(self, maxWorkers=None, manifest: ArtifactManifest = None):
+    self.maxWorkers = maxWorkers
+    self.manifest = manifest
+    self._artifacts = []
+    self._skipped = []
+
+  def add(self, name, filePath, writeFunc, key=None):
+    """ Adds an artifact. Returns False if it is skipped since the manifest has it up to date for the given key. """
+    filePath = Path(filePath)
+    if key is not None and self.manifest is not None and self.manifest.isUpToDate(filePath, key):
+      entry = self.manifest.getEntry(filePath)
+      self._skipped.append(ArtifactResult(name, str(filePath), bytes=entry["bytes"], sha256=entry["sha256"],
+                                          skipped=True))
+      return False
+    self._artifacts.append((name, filePath, writeFunc, key))
+    return True
+
+  def __len__(self):
+    return len(self._artifacts)
+
+  @staticmethod
+  def _createTemporaryPath(filePath):
+    # keep the suffix since some writers pick the file format from it
+    fd, tempPath = tempfile.mkstemp(prefix=f".{filePath.stem}.", suffix=f".tmp{filePath.suffix}", dir=filePath.parent)
+    os.close(fd)
+    return tempPath
+
+  @staticmethod
+  def _removeQuietly(filePath):
+    try:
+      os.remove(filePath)
+    except OSError:
+      pass
+
+  def _writeArtifact(self, name, filePath, writeFunc):
+    tempPath = self._createTemporaryPath(filePath)
+    start = time.perf_counter()
+    try:
+      writeFunc(tempPath)
+      size = os.path.getsize(tempPath)
+      if size == 0:
+        raise ArtifactWriteError(f"Nothing was written for '{name}'")
+      sha256 = hashFile(tempPath) if self.manifest is not None else ""
+    except Exception:
+      self._removeQuietly(tempPath)
+      raise
+    return tempPath, ArtifactResult(name, str(filePath), time.perf_counter() - start, size, sha256)
+
+  def write(self):
+    """ Writes all artifacts and returns a dictionary of ArtifactResult by artifact name.
+
+    Raises ArtifactWriteError if at least one artifact could not be written. In that case no file was replaced.
+    """
+    for _, filePath, _, _ in self._artifacts:
+      filePath.parent.mkdir(parents=True, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+      futures = [(name, key, executor.submit(self._writeArtifact, name, filePath, writeFunc))
+                 for name, filePath, writeFunc, key in self._artifacts]
+
+    written, errors = [], []
+    for name, key, future in futures:
+      try:
+        written.append((key,) + future.result())
+      except Exception as exc:
+        errors.append(f"{name}: {exc}")
+
+    if errors:
+      for _, tempPath, _ in written:
+        self._removeQuietly(tempPath)
+      raise ArtifactWriteError("Failed to write artifacts:\n" + "\n".join(errors))
+
+    summary = {result.name: result for result in self._skipped}
+    for key, tempPath, result in written:
+      os.chmod(tempPath, FILE_MODE)
+      os.replace(tempPath, result.path)
+      summary[result.name] = result
+      if self.manifest is not None and key is not None:
+        self.manifest.update(result.path, key, result.sha256)
+      logging.debug(f"{result.name}: {result.bytes} bytes in {result.seconds:.3f}s ({result.path})")
+    for result in self._skipped:
+      logging.debug(f"{result.name}: unchanged ({result.path})")
+
+    if self.manifest is not None and written:
+      self.manifest.save()
+    self._artifacts = []
+    self._skipped = []
+    return summary
+
+
+def writeAtomically(filePath, writeFunc, manifest: ArtifactManifest = None, key=None):
+  """ Writes a single artifact through a temporary file and returns its ArtifactResult """
+  writer = ArtifactWriter(maxWorkers=1, manifest=manifest)
+  writer.add(Path(filePath).name, filePath, writeFunc, key)
+  return next(iter(writer.write().values()))
+
+
+def createKey(*values):
+  """ Combines values (e.g. content hashes and parameters) into an artifact key """
+  return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
@@ -0,0 +1,297 @@
+""" Cohort batch processing from surface model to inflated template.
+
+Every subject of a manifest runs through the following stages:
+
+  skeleton  Voronoi skeleton of the input surface (SkeletonTool CLI)
+  template  template snapped onto the skeleton, subdivided and exported (SyntheticSkeletonEngine)
+  inflate   inflated model of the triangulated template (InflateMedialModel CLI)
+
+Subjects are processed in parallel by a process pool. A stage is skipped if the hash of its inputs (files and
+parameters) matches the one stored when it last completed. A per subject timing report is written at the end.
+
+Manifest (JSON):
+
+  {
+    "skeletonTool": ["/path/to/Slicer", "--launch", "SkeletonTool"],
+    "inflateMedialModel": "/path/to/InflateMedialModel",
+    "defaults": {
+      "skeleton": {"nDegrees": 3, "xPrune": 1.2},
+      "template": {"modelName": "template", "subdivisionLevel": 2},
+      "inflate": {"rad": 1.0}
+    },
+    "subjects": [
+      {"id": "subject01", "surface": "subject01.vtk", "affix": "subject01Affix.vtk", "template": {"subdivisionLevel": 1}}
+    ]
+  }
+
+Relative paths are resolved against the manifest directory. Subjects without "surface" use the skeleton stored in
+their Affix file, subjects without "affix" stop after the skeleton stage.
+
+  python -m SyntheticSkeletonLib.Batch manifest.json --outputDirectory out --workers 8
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+
+STAGE_SKELETON = "skeleton"
+STAGE_TEMPLATE = "template"
+STAGE_INFLATE = "inflate"
+
+STAGES = [STAGE_SKELETON, STAGE_TEMPLATE, STAGE_INFLATE]
+
+STATUS_DONE = "done"
+STATUS_CACHED = "cached"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+CACHE_DIRECTORY_NAME = ".batchcache"
+
+SKELETON_TOOL_PARAMETERS = ["nDegrees", "xPrune", "nComp", "xSearchTol", "nBins"]
+
+
+def hashFile(filePath, chunkSize=1 << 20):
+  digest = hashlib.sha256()
+  with open(filePath, "rb") as f:
+    for chunk in iter(lambda: f.read(chunkSize), b""):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def hashInputs(stage, inputFiles, parameters):
+  """ Key of a stage run: stage name, content of all input files and the parameters """
+  digest = hashlib.sha256(stage.encode())
+  for filePath in inputFiles:
+    digest.update(hashFile(filePath).encode())
+  digest.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+  return digest.hexdigest()
+
+
+def toCommand(executable):
+  if executable is None:
+    return None
+  if isinstance(executable, str):
+    return [shutil.which(executable) or executable]
+  return list(executable)
+
+
+def runCLI(command, arguments, logFile):
+  """ Runs a Slicer execution model CLI, logging its output. Raises on non zero exit code. """
+  with open(logFile, "a") as log:
+    log.write(" ".join(str(c) for c in command + arguments) + "\n")
+    log.flush()
+    result = subprocess.run([str(c) for c in command + arguments], stdout=log, stderr=subprocess.STDOUT)
+  if result.returncode != 0:
+    raise RuntimeError(f"{Path(command[-1]).name} exited with code {result.returncode} (see {logFile})")
+
+
+def getSkeletonToolArguments(parameters, inputSurface, outputSurface):
+  arguments = []
+  for name in SKELETON_TOOL_PARAMETERS:
+    if name in parameters:
+      arguments += [f"--{name}", parameters[name]]
+  return arguments + [inputSurface, outputSurface]
+
+
+class StageCache(object):
+  """ Remembers the input hash of completed stages in <subject output directory>/.batchcache/<stage>.json """
+
+  def __init__(self, directory):
+    self.directory = Path(directory) / CACHE_DIRECTORY_NAME
+
+  def _entryPath(self, stage):
+    return self.directory / f"{stage}.json"
+
+  def isUpToDate(self, stage, key):
+    try:
+      with open(self._entryPath(stage)) as f:
+        entry = json.load(f)
+    except (OSError, ValueError):
+      return False
+    return entry.get("key") == key and all(Path(o).exists() for o in entry.get("outputs", []))
+
+  def store(self, stage, key, outputs, seconds):
+    self.directory.mkdir(parents=True, exist_ok=True)
+    with open(self._entryPath(stage), "w") as f:
+      json.dump({"key": key, "outputs": [str(o) for o in outputs], "seconds": seconds}, f, indent=2)
+
+  def outputs(self, stage):
+    with open(self._entryPath(stage)) as f:
+      return [Path(o) for o in json.load(f)["outputs"]]
+
+
+def runSkeletonStage(subject, outputDirectory, skeletonTool, parameters):
+  outputSkeleton = outputDirectory / f"{subject['id']}_skeleton.vtk"
+  runCLI(skeletonTool, getSkeletonToolArguments(parameters, subject["surface"], outputSkeleton),
+         outputDirectory / "SkeletonTool.log")
+  return [outputSkeleton]
+
+
+def runTemplateStage(subject, outputDirectory, skeletonFile, parameters):
+  from SyntheticSkeletonLib.Engine import SyntheticSkeletonEngine
+
+  engine = SyntheticSkeletonEngine()
+  if skeletonFile:
+    engine.loadSkeleton(skeletonFile)
+  engine.loadAffix(subject["affix"])
+  # unchanged files of a previous run are kept (see SyntheticSkeletonLib.Artifacts)
+  return engine.save(outputDirectory / "template", **parameters)
+
+
+def runInflateStage(subject, outputDirectory, meshFile, inflateMedialModel, parameters):
+  outputModel = outputDirectory / f"{subject['id']}_inflated.vtk"
+  runCLI(inflateMedialModel, ["--rad", parameters.get("rad", 1.0), meshFile, outputModel],
+         outputDirectory / "InflateMedialModel.log")
+  return [outputModel]
+
+
+def processSubject(subject, outputRoot, config):
+  """ Runs all stages of one subject. Executed in a worker process, returns the timing records of the subject. """
+  logging.basicConfig(level=config.get("logLevel", logging.INFO))
+  outputDirectory = Path(outputRoot) / subject["id"]
+  outputDirectory.mkdir(parents=True, exist_ok=True)
+  cache = StageCache(outputDirectory)
+  records = []
+
+  def stageParameters(stage):
+    parameters = dict(config.get("defaults", {}).get(stage, {}))
+    parameters.update(subject.get(stage, {}))
+    return parameters
+
+  def runStage(stage, inputFiles, parameters, func):
+    start = time.perf_counter()
+    key = hashInputs(stage, inputFiles, parameters)
+    if cache.isUpToDate(stage, key):
+      outputs = cache.outputs(stage)
+      status = STATUS_CACHED
+    else:
+      outputs = func()
+      status = STATUS_DONE
+    seconds = time.perf_counter() - start
+    if status == STATUS_DONE:
+      cache.store(stage, key, outputs, seconds)
+    records.append({"subject": subject["id"], "stage": stage, "status": status, "seconds": seconds, "error": ""})
+    return outputs
+
+  def skip(stage):
+    records.append({"subject": subject["id"], "stage": stage, "status": STATUS_SKIPPED, "seconds": 0.0, "error": ""})
+
+  stage = STAGE_SKELETON
+  try:
+    skeletonFile = None
+    if subject.get("surface"):
+      parameters = stageParameters(stage)
+      skeletonFile = runStage(stage, [subject["surface"]], parameters,
+                              lambda: runSkeletonStage(subject, outputDirectory, config["skeletonTool"], parameters))[0]
+    else:
+      skip(stage)
+
+    stage = STAGE_TEMPLATE
+    if not subject.get("affix"):
+      skip(STAGE_TEMPLATE)
+      skip(STAGE_INFLATE)
+      return records
+    parameters = stageParameters(stage)
+    parameters.setdefault("modelName", subject["id"])
+    inputFiles = [subject["affix"]] + ([skeletonFile] if skeletonFile else [])
+    templateFiles = runStage(stage, inputFiles, parameters,
+                             lambda: runTemplateStage(subject, outputDirectory, skeletonFile, parameters))
+
+    stage = STAGE_INFLATE
+    if not config.get("inflateMedialModel") or stageParameters(stage).get("enabled") is False:
+      skip(stage)
+      return records
+    meshFile = templateFiles[0]
+    parameters = stageParameters(stage)
+    runStage(stage, [meshFile], parameters,
+             lambda: runInflateStage(subject, outputDirectory, meshFile, config["inflateMedialModel"], parameters))
+  except Exception as exc:
+    logging.exception(f"Subject {subject['id']}: stage '{stage}' failed")
+    records.append({"subject": subject["id"], "stage": stage, "status": STATUS_FAILED, "seconds": 0.0,
+                    "error": str(exc)})
+  return records
+
+
+def readManifest(manifestPath):
+  manifestPath = Path(manifestPath)
+  with open(manifestPath) as f:
+    manifest = json.load(f)
+
+  def resolve(filePath):
+    return str((manifestPath.parent / filePath).resolve()) if filePath else filePath
+
+  subjectIds = set()
+  for subject in manifest["subjects"]:
+    if "id" not in subject:
+      raise ValueError(f"Manifest subject without 'id': {subject}")
+    if subject["id"] in subjectIds:
+      raise ValueError(f"Duplicate subject id '{subject['id']}' in manifest")
+    subjectIds.add(subject["id"])
+    for key in ["surface", "affix"]:
+      subject[key] = resolve(subject.get(key))
+  return manifest
+
+
+def writeTimingReport(records, reportPath):
+  with open(reportPath, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=["subject", "stage", "status", "seconds", "error"])
+    writer.writeheader()
+    for record in sorted(records, key=lambda r: (r["subject"], STAGES.index(r["stage"]))):
+      writer.writerow(dict(record, seconds=f"{record['seconds']:.3f}"))
+
+
+def runBatch(manifest, outputDirectory, workers=None, logLevel=logging.INFO):
+  """ Processes all subjects of the manifest and returns the timing records """
+  outputDirectory = Path(outputDirectory)
+  outputDirectory.mkdir(parents=True, exist_ok=True)
+  config = {
+    "skeletonTool": toCommand(manifest.get("skeletonTool", "SkeletonTool")),
+    "inflateMedialModel": toCommand(manifest.get("inflateMedialModel")),
+    "defaults": manifest.get("defaults", {}),
+    "logLevel": logLevel
+  }
+
+  records = []
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = {executor.submit(processSubject, subject, str(outputDirectory), config): subject["id"]
+               for subject in manifest["subjects"]}
+    for future in as_completed(futures):
+      subjectRecords = future.result()
+      records.extend(subjectRecords)
+      failed = [r for r in subjectRecords if r["status"] == STATUS_FAILED]
+      logging.info(f"{futures[future]}: {'failed' if failed else 'finished'} "
+                   f"({sum(r['seconds'] for r in subjectRecords):.1f}s)")
+  return records
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Run SkeletonTool, template export and InflateMedialModel for a cohort")
+  parser.add_argument("manifest", help="JSON manifest of the subjects")
+  parser.add_argument("--outputDirectory", required=True)
+  parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of subjects processed in parallel")
+  parser.add_argument("--report", default=None, help="timing report (default: <outputDirectory>/timings.csv)")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logLevel = logging.DEBUG if args.verbose else logging.INFO
+  logging.basicConfig(level=logLevel)
+
+  records = runBatch(readManifest(args.manifest), args.outputDirectory, args.workers, logLevel)
+  reportPath = args.report or str(Path(args.outputDirectory) / "timings.csv")
+  writeTimingReport(records, reportPath)
+  logging.info(f"Timing report written to {reportPath}")
+  return 1 if any(r["status"] == STATUS_FAILED for r in records) else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,31 @@
+""" Colour codec for the colour names stored in triangle label nodes and Affix files, compatible with QColor.name() """
+
+import logging
+
+
+def colorNameToRGB(name: str):
+  """ Parses a colour name as produced by QColor.name() ('#rgb', '#rrggbb' or '#aarrggbb') into 0-255 (r, g, b).
+
+  Invalid names result in black, which is what QColor does for them as well.
+  """
+  hexDigits = name.strip().lstrip("#") if name else ""
+  try:
+    if len(hexDigits) == 3:
+      return tuple(int(c * 2, 16) for c in hexDigits)
+    if len(hexDigits) in (6, 8):
+      hexDigits = hexDigits[-6:]
+      return tuple(int(hexDigits[i:i + 2], 16) for i in (0, 2, 4))
+  except ValueError:
+    pass
+  logging.warning(f"Invalid color name '{name}'")
+  return 0, 0, 0
+
+
+def rgbToColorName(r, g, b) -> str:
+  """ Formats 0-255 (r, g, b) values the same way QColor.name() does """
+  return "#{:02x}{:02x}{:02x}".format(*(min(max(int(c), 0), 255) for c in (r, g, b)))
+
+
+def normalizeColorName(name: str, default: str = "#000000") -> str:
+  """ Returns name as '#rrggbb', or default if name is empty """
+  return rgbToColorName(*colorNameToRGB(name)) if name else default
@@ -0,0 +1,116 @@
+import tempfile
+
+
+class ParameterDefaults(dict):
+  """ Default values of the parameter node. Callable values are resolved whenever they are looked up, so that defaults
+  provided by the application (e.g. its temporary directory) are only queried once they are needed.
+  """
+
+  def __getitem__(self, name):
+    value = dict.__getitem__(self, name)
+    return value() if callable(value) else value
+
+  def get(self, name, default=None):
+    return self[name] if name in self else default
+
+  def values(self):
+    return [self[name] for name in self]
+
+  def items(self):
+    return [(name, self[name]) for name in self]
+
+
+UNASSIGNED_POINT = ""
+BRANCH_POINT = "Branch point"
+EDGE_POINT = "Free Edge point"
+INTERIOR_POINT = "Interior point"
+OTHER_POINT = "Other"
+
+
+TAG_TYPES = [UNASSIGNED_POINT, BRANCH_POINT, EDGE_POINT, INTERIOR_POINT, OTHER_POINT]
+
+# colors of the tag types when tag points are displayed as glyphs
+TAG_TYPE_COLORS = ["#ffffff", "#ff0000", "#00ff00", "#0000ff", "#ffff00"]
+
+
+PARAM_POINT_GLYPH_SIZE = "GlyphSizePerCent"
+PARAM_INPUT_MODEL = "InputModel"
+PARAM_INPUT_MODEL_PROXY = "InputModelProxy"
+PARAM_OUTPUT_MODEL = "OutputModel"
+PARAM_SUBDIVISION_PREVIEW_MODEL = "SubdivisionModel"
+PARAM_INFLATED_MODEL = "InflatedModel"
+PARAM_INFLATION_SWEEP_MODEL = "InflationSweepModel"
+PARAM_CURRENT_POINT_LABEL_LIST = "CurrentPointLabelList"
+PARAM_CURRENT_TRIANGLE_LABEL_LIST = "CurrentTriangleLabelList"
+PARAM_GRID_TYPE = "GridType"
+PARAM_GRID_MODEL_SOLVER_TYPE = "GridModelSolverType"
+PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL = "GridModelSubdivisionLevel"
+PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RHO = "GridModelCoefficientConstantRho"
+PARAM_GRID_MODEL_COEFFICIENT_USE_CONSTANT_RADIUS = "GridModelCoefficientUseConstantRadius"
+PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS = "GridModelCoefficientConstantRadius"
+PARAM_GRID_MODEL_INFLATE = "GridModelInflate"
+PARAM_GRID_MODEL_INFLATE_RADIUS = "GridModelInflateRadius"
+PARAM_GRID_MODEL_INFLATE_SWEEP_RADII = "GridModelInflateSweepRadii"
+PARAM_OUTPUT_DIRECTORY = "OutputDirectory"
+PARAM_AUTO_SAVE = "AutoSave"
+PARAM_REJECT_DUPLICATE_TAGS = "RejectDuplicateTags"
+PARAM_TAG_GLYPH_DISPLAY = "TagGlyphDisplay"
+PARAM_TAG_GLYPH_MODEL = "TagGlyphModel"
+PARAM_TAG_TYPE_COLORS = "TagTypeColors"
+
+
+PARAM_DEFAULTS = ParameterDefaults({
+  PARAM_POINT_GLYPH_SIZE: 3,
+  PARAM_INPUT_MODEL: "",
+  PARAM_OUTPUT_MODEL: "",
+  PARAM_SUBDIVISION_PREVIEW_MODEL: "",
+  PARAM_INFLATED_MODEL: "",
+  PARAM_CURRENT_POINT_LABEL_LIST: "",
+  PARAM_CURRENT_TRIANGLE_LABEL_LIST: "",
+  PARAM_GRID_TYPE: "LoopSubdivision",
+  PARAM_GRID_MODEL_SOLVER_TYPE: "BruteForce",
+  PARAM_GRID_MODEL_ATOM_SUBDIVISION_LEVEL: 0,
+  PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RHO: -0.001,
+  PARAM_GRID_MODEL_COEFFICIENT_CONSTANT_RADIUS: 0.5,
+  PARAM_GRID_MODEL_COEFFICIENT_USE_CONSTANT_RADIUS: False,
+  PARAM_GRID_MODEL_INFLATE: False,
+  PARAM_GRID_MODEL_INFLATE_RADIUS: 1.0,
+  PARAM_GRID_MODEL_INFLATE_SWEEP_RADII: "0.5, 1.0, 1.5",
+  # replaced by the temporary directory of Slicer when the module is loaded
+  PARAM_OUTPUT_DIRECTORY: tempfile.gettempdir,
+  PARAM_AUTO_SAVE: False,
+  PARAM_REJECT_DUPLICATE_TAGS: False,
+  PARAM_TAG_GLYPH_DISPLAY: False
+})
+
+
+# skeletons with more vertices are displayed (and picked) through a decimated proxy with about the target number of
+# vertices; snapping always uses the full resolution skeleton
+SKELETON_PROXY_VERTEX_THRESHOLD = 500000
+SKELETON_PROXY_TARGET_VERTICES = 100000
+
+
+# number of most recent operations listed in the profiling panel
+PROFILING_PANEL_OPERATIONS = 20
+
+
+# memory bound of the cached subdivision previews (all levels of the current template)
+SUBDIVISION_CACHE_MAX_MEMORY_KIB = 256 * 1024
+
+
+# number of template edits that can be undone
+UNDO_MAX_STEPS = 500
+
+
+# triangles beyond these are counted as poor in the mesh quality summary
+QUALITY_MAX_ASPECT_RATIO = 5.0
+QUALITY_MIN_ANGLE_DEGREES = 10.0
+QUALITY_MAX_DIHEDRAL_DEGREES = 90.0
+
+
+# memory bound of the point locators, skeleton normals and subdivision previews of all open subjects
+SESSION_MEMORY_BUDGET_KIB = 1024 * 1024
+
+
+DEFAULT_TRIANGLE_COLOR = "#ff0000"
+DEFAULT_POINT_COLOR = [1,1,1]
\ No newline at end of file
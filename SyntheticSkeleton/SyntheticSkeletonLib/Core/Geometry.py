@@ -0,0 +1,54 @@
+""" Geometry utilities of the template editor """
+
+import numpy as np
+
+
+def pairNumber(a: int, b: int) -> int:
+  """ Cantor pairing function """
+  a1 = min(a, b)
+  b1 = max(a, b)
+  return int((a1 + b1) * (a1 + b1 + 1) / 2.0 + b1)
+
+
+# source: http://stackoverflow.com/questions/12299540/plane-fitting-to-4-or-more-xyz-points
+def planeFit(points):
+  """
+  p, n = planeFit(points)
+
+  Given an array, points, of shape (d,...)
+  representing points in d-dimensional space,
+  fit an d-dimensional plane to the points.
+  Return a point, p, on the plane (the point-cloud centroid),
+  and the normal, n.
+  """
+  from numpy.linalg import svd
+  points = np.reshape(points, (np.shape(points)[0], -1)) # Collapse trialing dimensions
+  assert points.shape[0] <= points.shape[1], "There are only {} points in {} dimensions.".format(points.shape[1],
+                                                                                                 points.shape[0])
+  ctr = points.mean(axis=1)
+  x = points - ctr[:,np.newaxis]
+  M = np.dot(x, x.T) # Could also use np.cov(x) here.
+  return ctr, svd(M)[0][:,-1]
+
+
+def getBasePointToLineAngle(planeNormal, basePoint, lineOrigin, lineTip):
+  def getUnitVector(lineOrigin, lineTip):
+    vector = lineTip - lineOrigin
+    return vector / np.linalg.norm(vector)
+  planeNormal = planeNormal / np.linalg.norm(planeNormal)
+  v1 = getUnitVector(lineOrigin, lineTip)
+  v2 = getUnitVector(lineOrigin, basePoint)
+  dot = np.dot(v1, v2)
+  det = np.dot(planeNormal, np.cross(v1, v2))
+  angle_deg = np.rad2deg(np.arctan2(det, dot))
+  angle_deg = np.abs(angle_deg) if angle_deg < 0 else 360.0 - angle_deg
+  return angle_deg
+
+
+def getSortedPointIndices(rawPointsArray):
+  planePosition, planeNormal = planeFit(rawPointsArray.T)
+  base = rawPointsArray[0]
+  angles = []
+  for pos in rawPointsArray:
+    angles.append(getBasePointToLineAngle(planeNormal, base, planePosition, pos))
+  return list(np.argsort(angles))
@@ -0,0 +1,115 @@
+""" Undo and redo of template edits.
+
+EditHistory is a listener of CustomInformation and keeps the Changes (see Model.py) of every edit as one step. Only the
+changed items are kept, so the memory used grows with the edits made and not with the size of the template. Undoing a
+step applies the inverse of its Changes in reverse order, redoing applies them again, both as a single edit.
+
+Tag and label infos follow the markups and triangle label nodes they describe and are not undone. Replacing a whole
+vector (e.g. reading a template) clears the history.
+"""
+
+from collections import deque
+
+from SyntheticSkeletonLib.Core.Constants import UNDO_MAX_STEPS
+from SyntheticSkeletonLib.Core.Model import CustomInformation, Change, TAG_POINTS, TAG_TRIANGLES, TAG_EDGES
+
+
+UNDOABLE_VECTORS = [TAG_POINTS, TAG_TRIANGLES, TAG_EDGES]
+
+
+def mergeChanges(changes):
+  """ Merges consecutive replacements of the same item (e.g. while a point is dragged) into one Change """
+  merged = []
+  for change in changes:
+    previous = merged[-1] if merged else None
+    if previous is not None and previous.vector == change.vector and previous.key == change.key and \
+        previous.key is not None and None not in (previous.old, previous.new, change.old, change.new):
+      merged[-1] = Change(change.vector, change.key, previous.old, change.new)
+    else:
+      merged.append(change)
+  return [change for change in merged if change.old != change.new]
+
+
+class EditHistory(object):
+
+  def __init__(self, data: CustomInformation, maxSteps=UNDO_MAX_STEPS):
+    self.data = data
+    self._undo = deque(maxlen=maxSteps)
+    self._redo = []
+    self._group = None  # changes of the open group
+    self._applying = False
+    data.addListener(self.onTemplateEdited)
+
+  def attach(self, data: CustomInformation):
+    """ Records the edits of data from now on, e.g. once the template was replaced, and clears the history """
+    self.data.removeListener(self.onTemplateEdited)
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self.clear()
+
+  def clear(self):
+    self._undo.clear()
+    self._redo = []
+    if self._group is not None:
+      self._group = []
+
+  def canUndo(self):
+    return len(self._undo) > 0
+
+  def canRedo(self):
+    return len(self._redo) > 0
+
+  def beginGroup(self):
+    """ Records all edits until endGroup (e.g. of an interaction) as one step """
+    if self._group is None:
+      self._group = []
+
+  def endGroup(self):
+    group, self._group = self._group, None
+    if group:
+      self._push(group)
+
+  def onTemplateEdited(self, data, changes):
+    if self._applying:
+      return
+    if any(change.key is None for change in changes):
+      self.clear()
+      return
+    changes = [change for change in changes if change.vector in UNDOABLE_VECTORS]
+    if self._group is not None:
+      self._group.extend(changes)
+    elif changes:
+      self._push(changes)
+
+  def _push(self, changes):
+    changes = mergeChanges(changes)
+    if changes:
+      self._undo.append(changes)
+      self._redo = []
+
+  def _apply(self, changes):
+    self._applying = True
+    try:
+      self.data.applyChanges(changes)
+    finally:
+      self._applying = False
+
+  def undo(self):
+    """ Reverts the last step and returns the Changes applied for it (empty if there is nothing to undo) """
+    self.endGroup()
+    if not self._undo:
+      return []
+    step = self._undo.pop()
+    changes = [change.inverse() for change in reversed(step)]
+    self._apply(changes)
+    self._redo.append(step)
+    return changes
+
+  def redo(self):
+    """ Applies the last undone step again and returns its Changes (empty if there is nothing to redo) """
+    if not self._redo:
+      return []
+    step = self._redo.pop()
+    self._apply(step)
+    self._undo.append(step)
+    return step
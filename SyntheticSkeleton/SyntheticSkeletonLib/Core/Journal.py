@@ -0,0 +1,293 @@
+""" Append-only journal of template edits for autosave and crash recovery.
+
+A journal directory holds generations of two files: a checkpoint, the template written to a (binary) Affix file, and a
+journal, a JSON lines file with a header line followed by one line per edit of the template since the checkpoint. An
+edit is written as its list of Changes (see Model.py) with the items encoded as nested lists of their dataclass fields.
+
+JournalWriter is a listener of CustomInformation. The editing thread only queues the Changes of every edit, which hold
+immutable items; encoding and writing run on a background thread. After COMPACTION_CHANGES journaled changes, or with
+the first edit after COMPACTION_SECONDS, a new generation is started from a snapshot of the template. Its checkpoint is
+written before its journal, both through temporary files, and the previous generation is only removed afterwards, so
+that the last generation with both files is always complete.
+
+recover() reads the checkpoint of that generation and applies the journal on top of it. A last line that was cut off
+by a crash is ignored.
+"""
+
+from dataclasses import astuple, fields, is_dataclass
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import vtk
+
+from SyntheticSkeletonLib.Artifacts import writeAtomically
+from SyntheticSkeletonLib.Core.Model import (CustomInformation, Change, TagInfo, LabelTriangle, TagPoint, TagTriangle,
+                                             TagEdge, TAG_INFO, LABEL_INFO, TAG_POINTS, TAG_TRIANGLES, TAG_EDGES,
+                                             TEMPLATE_VECTORS)
+from SyntheticSkeletonLib.Core.Persistent import PersistentList, PersistentMap
+from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+from SyntheticSkeletonLib.Profiling import profiled
+
+
+JOURNAL_FORMAT = "SyntheticSkeletonJournal"
+JOURNAL_VERSION = 1
+
+COMPACTION_CHANGES = 1000
+COMPACTION_SECONDS = 300
+
+VECTOR_ITEM_TYPES = {
+  TAG_INFO: TagInfo,
+  LABEL_INFO: LabelTriangle,
+  TAG_POINTS: TagPoint,
+  TAG_TRIANGLES: TagTriangle,
+  TAG_EDGES: TagEdge
+}
+
+_OP_CHANGES = "changes"
+_OP_CHECKPOINT = "checkpoint"
+_OP_CLOSE = "close"
+
+
+def getCheckpointFilePath(directory, generation):
+  return Path(directory) / f"checkpoint{generation:06d}.vtk"
+
+
+def getJournalFilePath(directory, generation):
+  return Path(directory) / f"journal{generation:06d}.jsonl"
+
+
+def getGenerations(directory):
+  """ Generations in directory that have both checkpoint and journal, in ascending order """
+  directory = Path(directory)
+  if not directory.is_dir():
+    return []
+  generations = []
+  for filePath in directory.glob("journal*.jsonl"):
+    try:
+      generation = int(filePath.stem[len("journal"):])
+    except ValueError:
+      continue
+    if getCheckpointFilePath(directory, generation).exists():
+      generations.append(generation)
+  return sorted(generations)
+
+
+def _encodeItem(item):
+  return None if item is None else astuple(item)
+
+
+def _decodeItem(cls, values):
+  if values is None:
+    return None
+  return cls(*(_decodeItem(f.type, v) if is_dataclass(f.type) else v for f, v in zip(fields(cls), values)))
+
+
+def encodeChange(change: Change):
+  """ JSON serializable [vector, key, old, new]. The old value of whole vectors (key None) is not kept. """
+  if change.key is None:
+    if change.vector == TAG_EDGES:
+      return [change.vector, None, None, [[key, _encodeItem(edge)] for key, edge in change.new.items()]]
+    return [change.vector, None, None, [_encodeItem(item) for item in change.new]]
+  return [change.vector, change.key, _encodeItem(change.old), _encodeItem(change.new)]
+
+
+def decodeChange(values) -> Change:
+  vector, key, old, new = values
+  cls = VECTOR_ITEM_TYPES[vector]
+  if key is None:
+    if vector == TAG_EDGES:
+      return Change(vector, None, None, PersistentMap((k, _decodeItem(cls, v)) for k, v in new))
+    return Change(vector, None, None, PersistentList(_decodeItem(cls, v) for v in new))
+  return Change(vector, key, _decodeItem(cls, old), _decodeItem(cls, new))
+
+
+def _countChanges(changes):
+  # replacing a whole vector is as expensive to replay as adding all its items
+  return sum(len(change.new) if change.key is None else 1 for change in changes)
+
+
+class JournalWriter(object):
+  """ Journals every edit of a template into directory, see module documentation. Starts with a checkpoint. """
+
+  def __init__(self, directory, data: CustomInformation, compactionChanges=COMPACTION_CHANGES,
+               compactionSeconds=COMPACTION_SECONDS):
+    self.directory = Path(directory)
+    self.compactionChanges = compactionChanges
+    self.compactionSeconds = compactionSeconds
+    self.error = None  # last error of the background thread
+
+    generations = getGenerations(self.directory)
+    self._generation = generations[-1] if generations else 0
+    self._file = None
+    self._changesSinceCheckpoint = 0
+    self._lastCheckpoint = time.monotonic()
+    self._queue = queue.Queue()
+    self._thread = threading.Thread(target=self._run, name="SyntheticSkeletonJournal", daemon=True)
+    self._thread.start()
+
+    self.directory.mkdir(parents=True, exist_ok=True)
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self.checkpoint()
+
+  def attach(self, data: CustomInformation):
+    """ Journals the edits of data from now on, e.g. once the template was replaced. Its current state is journaled
+    as an edit replacing all vectors.
+    """
+    self.data.removeListener(self.onTemplateEdited)
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self.onTemplateEdited(data, [Change(name, None, None, getattr(data, name)) for name in TEMPLATE_VECTORS])
+
+  def onTemplateEdited(self, data, changes):
+    self._queue.put((_OP_CHANGES, changes))
+    self._changesSinceCheckpoint += _countChanges(changes)
+    if self._changesSinceCheckpoint >= self.compactionChanges or \
+        time.monotonic() - self._lastCheckpoint >= self.compactionSeconds:
+      self.checkpoint()
+
+  def checkpoint(self):
+    """ Starts a new generation from a snapshot of the current template """
+    self._changesSinceCheckpoint = 0
+    self._lastCheckpoint = time.monotonic()
+    self._queue.put((_OP_CHECKPOINT, self.data.snapshot()))
+
+  def flush(self):
+    """ Waits until everything queued so far is written """
+    self._queue.join()
+
+  def close(self, remove=False):
+    """ Writes the remaining edits and stops journaling. The journal directory is emptied if remove is True. """
+    self.data.removeListener(self.onTemplateEdited)
+    self._queue.put((_OP_CLOSE, None))
+    self._thread.join()
+    if remove:
+      self._removeGenerations(self._generation + 1)
+
+  def _run(self):
+    while True:
+      op, payload = self._queue.get()
+      try:
+        if op == _OP_CLOSE:
+          break
+        elif op == _OP_CHECKPOINT:
+          self._writeCheckpoint(payload)
+        else:
+          # write all edits queued meanwhile at once
+          edits = [payload]
+          while self._peekOp() == _OP_CHANGES:
+            edits.append(self._queue.get()[1])
+          try:
+            self._writeLines([json.dumps({"changes": [encodeChange(c) for c in changes]}) for changes in edits])
+          finally:
+            for _ in edits[1:]:
+              self._queue.task_done()
+      except Exception as exc:
+        logging.error(f"Journal {self.directory}: {exc}")
+        self.error = exc
+      finally:
+        self._queue.task_done()
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+
+  def _peekOp(self):
+    with self._queue.mutex:
+      return self._queue.queue[0][0] if self._queue.queue else None
+
+  def _writeLines(self, lines):
+    if self._file is None:
+      # the failed checkpoint was reported, the next one will contain these edits
+      return
+    self._file.write("\n".join(lines) + "\n")
+    self._file.flush()
+    os.fsync(self._file.fileno())
+
+  @profiled
+  def _writeCheckpoint(self, snapshot):
+    generation = self._generation + 1
+    writeAtomically(getCheckpointFilePath(self.directory, generation),
+                    lambda path: CustomInformationWriter(snapshot).writeCustomDataToFile(path, binary=True))
+    header = {
+      "format": JOURNAL_FORMAT,
+      "version": JOURNAL_VERSION,
+      "generation": generation,
+      "skeletonHash": snapshot.getSkeletonHash(),
+      "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+    def writeHeader(path):
+      with open(path, "w") as f:
+        f.write(json.dumps(header) + "\n")
+    journalFilePath = getJournalFilePath(self.directory, generation)
+    writeAtomically(journalFilePath, writeHeader)
+
+    if self._file is not None:
+      self._file.close()
+    self._file = open(journalFilePath, "a")
+    self._generation = generation
+    self._removeGenerations(generation)
+    logging.debug(f"Journal checkpoint {generation} written to {self.directory}")
+
+  def _removeGenerations(self, before):
+    for generation in getGenerations(self.directory):
+      if generation < before:
+        for filePath in [getJournalFilePath(self.directory, generation),
+                         getCheckpointFilePath(self.directory, generation)]:
+          try:
+            os.remove(filePath)
+          except OSError:
+            pass
+
+
+def readJournalHeader(directory):
+  """ Header of the last complete generation in directory or None """
+  generations = getGenerations(directory)
+  if not generations:
+    return None
+  with open(getJournalFilePath(directory, generations[-1])) as f:
+    try:
+      header = json.loads(f.readline())
+    except ValueError:
+      return None
+  return header if header.get("format") == JOURNAL_FORMAT else None
+
+
+@profiled
+def recover(directory, skeletonHash=None):
+  """ Returns the template of the last checkpoint in directory with all journaled edits applied (its polydata is the
+  skeleton of the checkpoint), or None if there is no journal or it was written for another skeleton than the one of
+  the given hash.
+  """
+  header = readJournalHeader(directory)
+  if header is None:
+    return None
+  if skeletonHash is not None and header.get("skeletonHash") != skeletonHash:
+    logging.info(f"The journal in {directory} was written for another skeleton")
+    return None
+
+  generation = header["generation"]
+  reader = vtk.vtkPolyDataReader()
+  reader.SetFileName(str(getCheckpointFilePath(directory, generation)))
+  reader.Update()
+  data = CustomInformation(reader.GetOutput())
+  data.readCustomData()
+
+  edits = 0
+  with open(getJournalFilePath(directory, generation)) as f:
+    f.readline()
+    for line in f:
+      try:
+        changes = [decodeChange(values) for values in json.loads(line)["changes"]]
+      except (ValueError, KeyError, TypeError):
+        logging.warning(f"Journal {directory}: ignoring incomplete edit {edits + 1}")
+        break
+      data.applyChanges(changes)
+      edits += 1
+  logging.info(f"Recovered template from checkpoint {generation} and {edits} edits in {directory}")
+  return data
@@ -0,0 +1,493 @@
+""" Template data model and the reader of the template arrays stored in the field data of Affix files.
+
+Importing it only loads the standard library; numpy and vtk are imported by the methods that need them and the
+polydata is provided by the caller.
+
+The template vectors are immutable (see Persistent.py) and hold frozen dataclasses. CustomInformation is modified
+through its mutation methods only, which replace the modified items and record every modification as a Change.
+snapshot() is therefore O(1) and a snapshot stays unchanged while the template keeps being edited.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, astuple, fields, is_dataclass
+import hashlib
+import numbers
+from collections import OrderedDict
+import logging
+
+from SyntheticSkeletonLib.Core.Colors import rgbToColorName
+from SyntheticSkeletonLib.Core.Persistent import PersistentList, PersistentMap
+from SyntheticSkeletonLib.Profiling import profiled
+
+
+@dataclass(frozen=True)
+class Color:
+  r: float
+  g: float
+  b: float
+
+
+@dataclass(frozen=True)
+class Point:
+  x: float
+  y: float
+  z: float
+
+
+@dataclass(frozen=True)
+class TagInfo:
+  tagName: str
+  tagType: int  # 1 = Branch point  2 = Free Edge point 3 = Interior point  4 = others
+  tagColor: Color
+  tagIndex: int  # anatomical index
+  mrmlNodeID: str = ""
+
+
+@dataclass(frozen=True)
+class LabelTriangle:
+  labelName: str
+  labelColor: str
+  mrmlNodeID: str = ""
+
+
+@dataclass(frozen=True)
+class TagTriangle:
+  p1: Point
+  p2: Point
+  p3: Point
+  id1: int  # index in global point array
+  id2: int
+  id3: int
+  seq1: int # vertex index in skeleton
+  seq2: int
+  seq3: int
+  index: int # the triangle label index
+
+  @property
+  def triPtIds(self):
+    return [self.id1, self.id2, self.id3]
+
+  @property
+  def centerPos(self):
+    import numpy as np
+    return np.array([astuple(self.p1), astuple(self.p2), astuple(self.p3)]).mean(axis=0)
+
+
+@dataclass(frozen=True)
+class TagPoint:
+  pos: Point
+  radius: float   # TODO: this could be calculated upon request
+  typeIndex: int  # tag index
+  comboBoxIndex: int  # index in combobox
+  seq: int  # the sequence in all vertices  on skeleton
+
+
+@dataclass(frozen=True)
+class TagEdge:
+  ptId1: int
+  ptId2: int
+  constrain: int
+  numEdge: int
+  seq: int
+
+  @property
+  def edgPtIds(self):
+    return [self.ptId1, self.ptId2]
+
+
+TAG_INFO = "vectorTagInfo"
+LABEL_INFO = "vectorLabelInfo"
+TAG_POINTS = "vectorTagPoints"
+TAG_TRIANGLES = "vectorTagTriangles"
+TAG_EDGES = "vectorTagEdges"  # pair number of the point indices -> TagEdge
+
+TEMPLATE_VECTORS = [TAG_INFO, LABEL_INFO, TAG_POINTS, TAG_TRIANGLES, TAG_EDGES]
+
+
+@dataclass(frozen=True)
+class Change:
+  """ Modification of one template vector item: added (old is None), removed (new is None) or replaced. Items of
+  lists are inserted and removed at index key, which shifts the following items. A key of None stands for the whole
+  vector (old and new are vectors then).
+  """
+  vector: str
+  key: object
+  old: object
+  new: object
+
+  def inverse(self):
+    return Change(self.vector, self.key, self.new, self.old)
+
+
+class TemplateView(object):
+  """ Read access shared by the editable template and its snapshots """
+
+  def getEdgeConstraint(self, tagPoint1: TagPoint, tagPoint2: TagPoint) -> int:
+    type1 = self.vectorTagInfo[tagPoint1.comboBoxIndex].tagType
+    type2 = self.vectorTagInfo[tagPoint2.comboBoxIndex].tagType
+
+    # 1 = Branch point  2 = Free Edge point 3 = Interior point  4 = others
+    if type1 == 1 and type2 == 1:  # branch points
+      return 3
+    elif type1 == 2 and type2 == 2:  # edge points
+      return 1
+    elif type1 == 3 and type2 == 3:  # interior points
+      return 2
+    elif (type1 == 1 and type2 == 2) or (type1 == 2 and type2 == 1):  # branch point and edge point
+      return 2
+    elif (type1 == 1 and type2 == 3) or (type1 == 3 and type2 == 1):  # branch point and interior point
+      return 2
+    elif (type1 == 2 and type2 == 3) or (type1 == 3 and type2 == 2):  # edge point and interior point
+      return 2
+
+  def getTemplateHash(self) -> str:
+    """ Hash of everything written to the Affix file except for the skeleton. Computed once per version. """
+    version, templateHash = self._templateHash
+    if version != self.version:
+      def values(obj):
+        # MRML node IDs are session specific and not written. Numbers are hashed as floats, as a template hashes the
+        # same whether its values were read from an Affix file (floats) or are those it was edited with (e.g. ints).
+        if is_dataclass(obj):
+          return tuple(values(getattr(obj, f.name)) for f in fields(obj) if f.name != "mrmlNodeID")
+        return float(obj) if isinstance(obj, numbers.Real) else obj
+      digest = hashlib.sha256()
+      for vector in [self.vectorTagInfo, self.vectorLabelInfo, self.vectorTagTriangles, self.vectorTagPoints]:
+        digest.update(repr([values(v) for v in vector]).encode())
+      digest.update(repr([(k, values(e)) for k, e in sorted(self.vectorTagEdges.items())]).encode())
+      templateHash = digest.hexdigest()
+      self._templateHash = (self.version, templateHash)
+    return templateHash
+
+  def getSkeletonHash(self) -> str:
+    """ Hash of skeleton points, cells and point data. Only recomputed if the skeleton polydata was modified. """
+    if self.polydata is None:
+      return ""
+    stamp, skeletonHash = self._skeletonHash
+    if stamp != (self.polydata, self.polydata.GetMTime()):
+      import numpy as np
+      from vtk.util.numpy_support import vtk_to_numpy
+      digest = hashlib.sha256()
+      arrays = [self.polydata.GetPoints().GetData() if self.polydata.GetPoints() else None,
+                self.polydata.GetPolys().GetData()]
+      pointData = self.polydata.GetPointData()
+      arrays += [pointData.GetArray(i) for i in range(pointData.GetNumberOfArrays())]
+      for array in arrays:
+        if array is not None and array.GetNumberOfTuples() > 0:
+          digest.update(str(array.GetName()).encode())
+          digest.update(np.ascontiguousarray(vtk_to_numpy(array)).tobytes())
+      skeletonHash = digest.hexdigest()
+      self._skeletonHash = ((self.polydata, self.polydata.GetMTime()), skeletonHash)
+    return skeletonHash
+
+  def hasCustomData(self):
+    return len(self.vectorTagInfo) > 0
+
+  def __repr__(self):
+    return f"TagInfo: \n\t{self.vectorTagInfo}\n\n" + \
+           f"LabelInfo: \n\t{self.vectorLabelInfo}\n\n" + \
+           f"TagTriangles: \n\t{self.vectorTagTriangles}\n\n" + \
+           f"TagPoints: \n\t{self.vectorTagPoints}\n\n" + \
+           f"TagEdges: \n\t{self.vectorTagEdges}\n\n" + \
+           f"LabelData: \n\t{self.labelData}"
+
+
+class TemplateSnapshot(TemplateView):
+  """ Immutable view of a template at one version, see CustomInformation.snapshot. The (read-only) skeleton polydata
+  is shared.
+  """
+
+  def __init__(self, data):
+    self.polydata = data.polydata
+    self.labelData = data.labelData
+    for name in TEMPLATE_VECTORS:
+      setattr(self, name, getattr(data, name))
+    self.version = data.version
+    self._templateHash = data._templateHash
+    self._skeletonHash = data._skeletonHash
+
+
+class CustomInformation(TemplateView):
+
+  def __init__(self, polydata=None):
+    self.polydata = polydata
+
+    self.labelData = tuple()
+
+    self.vectorTagInfo = PersistentList()
+    self.vectorLabelInfo = PersistentList()
+    self.vectorTagTriangles = PersistentList()
+    self.vectorTagPoints = PersistentList()
+    self.vectorTagEdges = PersistentMap()
+
+    # incremented with every modification of the template
+    self.version = 0
+    self._templateHash = (None, None)  # (version, hash)
+    self._skeletonHash = (None, None)  # ((polydata, MTime), hash)
+
+    self._listeners = []
+    self._editDepth = 0
+    self._pendingChanges = []
+
+  def modified(self):
+    self.version += 1
+
+  def snapshot(self) -> TemplateSnapshot:
+    """ Returns the template at the current version in O(1). It can be used from any thread without locking while
+    this template keeps being edited.
+    """
+    return TemplateSnapshot(self)
+
+  def copy(self):
+    """ Returns an editable copy of the template in O(1). Both share all vectors until either of them is modified. """
+    other = CustomInformation(self.polydata)
+    other.labelData = self.labelData
+    for name in TEMPLATE_VECTORS:
+      setattr(other, name, getattr(self, name))
+    other.version = self.version
+    other._templateHash = self._templateHash
+    other._skeletonHash = self._skeletonHash
+    return other
+
+  def addListener(self, listener):
+    """ listener(data, changes) is called with the list of Changes after every edit """
+    self._listeners.append(listener)
+
+  def removeListener(self, listener):
+    if listener in self._listeners:
+      self._listeners.remove(listener)
+
+  @contextmanager
+  def edit(self):
+    """ Groups all modifications made within the block into one edit: listeners are notified once, at its end """
+    self._editDepth += 1
+    try:
+      yield self
+    finally:
+      self._editDepth -= 1
+      if self._editDepth == 0:
+        self._notify()
+
+  def _notify(self):
+    if not self._pendingChanges:
+      return
+    changes, self._pendingChanges = self._pendingChanges, []
+    for listener in list(self._listeners):
+      listener(self, changes)
+
+  def _record(self, changes, **vectors):
+    for name, vector in vectors.items():
+      setattr(self, name, vector)
+    self.version += 1
+    self._pendingChanges.extend(changes)
+    if self._editDepth == 0:
+      self._notify()
+
+  def applyChange(self, change: Change):
+    vector = getattr(self, change.vector)
+    if change.key is None:
+      vector = change.new
+    elif change.new is None:
+      vector = vector.removeItem(change.key)
+    elif change.old is None and isinstance(vector, PersistentList):
+      vector = vector.insertItem(change.key, change.new)
+    else:
+      vector = vector.setItem(change.key, change.new)
+    self._record([change], **{change.vector: vector})
+
+  def applyChanges(self, changes):
+    with self.edit():
+      for change in changes:
+        self.applyChange(change)
+
+  def assign(self, **vectors):
+    """ Replaces whole vectors, e.g. assign(vectorTagPoints=points, vectorTagTriangles=triangles) """
+    changes, assigned = [], {}
+    for name, items in vectors.items():
+      if name not in TEMPLATE_VECTORS:
+        raise ValueError(f"Unknown template vector '{name}'")
+      assigned[name] = PersistentMap(items) if name == TAG_EDGES else PersistentList(items)
+      changes.append(Change(name, None, getattr(self, name), assigned[name]))
+    self._record(changes, **assigned)
+
+  def _append(self, name, item):
+    index = len(getattr(self, name))
+    self.applyChange(Change(name, index, None, item))
+    return index
+
+  def _set(self, name, key, item):
+    old = getattr(self, name)[key]
+    if old != item:
+      self.applyChange(Change(name, key, old, item))
+
+  def _remove(self, name, key):
+    self.applyChange(Change(name, key, getattr(self, name)[key], None))
+
+  def appendTagInfo(self, tagInfo: TagInfo) -> int:
+    return self._append(TAG_INFO, tagInfo)
+
+  def setTagInfo(self, index, tagInfo: TagInfo):
+    self._set(TAG_INFO, index, tagInfo)
+
+  def appendLabelInfo(self, labelInfo: LabelTriangle) -> int:
+    return self._append(LABEL_INFO, labelInfo)
+
+  def setLabelInfo(self, index, labelInfo: LabelTriangle):
+    self._set(LABEL_INFO, index, labelInfo)
+
+  def appendPoint(self, point: TagPoint) -> int:
+    return self._append(TAG_POINTS, point)
+
+  def setPoint(self, index, point: TagPoint):
+    self._set(TAG_POINTS, index, point)
+
+  def removePoint(self, index):
+    """ Removes the point only, triangles and edges referencing it are left to the caller """
+    self._remove(TAG_POINTS, index)
+
+  def appendTriangle(self, triangle: TagTriangle) -> int:
+    return self._append(TAG_TRIANGLES, triangle)
+
+  def setTriangle(self, index, triangle: TagTriangle):
+    self._set(TAG_TRIANGLES, index, triangle)
+
+  def removeTriangle(self, index):
+    self._remove(TAG_TRIANGLES, index)
+
+  def setEdge(self, edgeId, edge: TagEdge):
+    self.applyChange(Change(TAG_EDGES, edgeId, self.vectorTagEdges.get(edgeId), edge))
+
+  def removeEdge(self, edgeId):
+    self._remove(TAG_EDGES, edgeId)
+
+  def setEdges(self, edges):
+    """ Replaces all edges by edges (pair number -> TagEdge). Only edges that differ are recorded as changes. """
+    current = self.vectorTagEdges
+    changes = [Change(TAG_EDGES, key, edge, None) for key, edge in current.items() if key not in edges]
+    changes += [Change(TAG_EDGES, key, current.get(key), edge) for key, edge in edges.items()
+                if current.get(key) != edge]
+    if changes:
+      self._record(changes, **{TAG_EDGES: PersistentMap(edges)})
+
+  @profiled
+  def readCustomData(self):
+    fielddata = self.polydata.GetFieldData()
+
+    self.labelData = tuple(self._readCustomDataLabel(fielddata))
+    self.assign(
+      vectorTagInfo=self._readCustomDataTag(fielddata),
+      vectorTagPoints=self._readCustomDataPoints(fielddata),
+      vectorLabelInfo=self._readCustomDataTriLabel(fielddata),
+      vectorTagTriangles=self._readCustomDataTri(fielddata),
+      vectorTagEdges=self._readCustomDataEdge(fielddata)
+    )
+
+  def _readCustomDataLabel(self, fielddata):
+    # TODO: not required
+    labelDBL = fielddata.GetArray("Label")
+    if not labelDBL:
+      return []
+
+    logging.debug(f"Label size {labelDBL.GetNumberOfValues()}")
+
+    from vtk.util.numpy_support import vtk_to_numpy
+    return vtk_to_numpy(labelDBL).tolist()
+
+  def _readCustomDataTag(self, fielddata):
+    vectorTagInfo = list()
+
+    tagDBL = fielddata.GetArray("TagInfo")
+    tagStr = fielddata.GetAbstractArray("TagName")
+
+    if not tagStr:
+      return vectorTagInfo
+
+    logging.debug(f"string size {tagStr.GetNumberOfValues()}")
+
+    j = 0
+    for i in range(0, tagDBL.GetNumberOfValues() - 1, 5):
+      info = TagInfo(
+        tagType=int(tagDBL.GetValue(i)),
+        tagIndex=int(tagDBL.GetValue(i + 1)),
+        tagColor=Color(tagDBL.GetValue(i + 2), tagDBL.GetValue(i + 3), tagDBL.GetValue(i + 4)),
+        tagName=tagStr.GetValue(j)
+      )
+      vectorTagInfo.append(info)
+      j += 1
+    return vectorTagInfo
+
+  def _readCustomDataPoints(self, fielddata):
+    vectorTagPoints = list()
+    ptsDBL = fielddata.GetArray("TagPoints")
+    if not ptsDBL:
+      return vectorTagPoints
+
+    for i in range(0, ptsDBL.GetNumberOfValues(), 7):
+      tagPt = TagPoint(
+        pos=Point(ptsDBL.GetValue(i), ptsDBL.GetValue(i + 1), ptsDBL.GetValue(i + 2)),
+        radius=ptsDBL.GetValue(i + 3),
+        seq=int(ptsDBL.GetValue(i + 4)),
+        typeIndex=int(ptsDBL.GetValue(i + 5)),
+        comboBoxIndex=int(ptsDBL.GetValue(i + 6))
+      )
+      vectorTagPoints.append(tagPt)
+    return vectorTagPoints
+
+  def _readCustomDataTriLabel(self, fielddata):
+    vectorLabelInfo = list()
+
+    tagTriDBL = fielddata.GetArray("LabelTriangleColor")
+    tagTriStr = fielddata.GetAbstractArray("LabelTriangleName")
+    if not tagTriStr:
+      return vectorLabelInfo
+
+    logging.debug(f"label triangle size {tagTriStr.GetNumberOfValues()}")
+
+    j = 0
+    for i in range(0, tagTriDBL.GetNumberOfValues(), 3):
+      lt = LabelTriangle(
+        labelName=tagTriStr.GetValue(j),
+        labelColor=rgbToColorName(tagTriDBL.GetValue(i), tagTriDBL.GetValue(i + 1), tagTriDBL.GetValue(i + 2))
+      )
+
+      vectorLabelInfo.append(lt)
+
+      j += 1
+    return vectorLabelInfo
+
+  def _readCustomDataTri(self, fielddata):
+    vectorTagTriangles = list()
+    triDBL = fielddata.GetArray("TagTriangles")
+    if not triDBL:
+      return vectorTagTriangles
+
+    for i in range(0, triDBL.GetNumberOfValues(), 16):
+      tri = TagTriangle(
+        p1=Point(triDBL.GetValue(i), triDBL.GetValue(i + 1), triDBL.GetValue(i + 2)),
+        id1=int(triDBL.GetValue(i + 3)),
+        seq1=int(triDBL.GetValue(i + 4)),
+        p2=Point(triDBL.GetValue(i + 5), triDBL.GetValue(i + 6), triDBL.GetValue(i + 7)),
+        id2=int(triDBL.GetValue(i + 8)),
+        seq2=int(triDBL.GetValue(i + 9)),
+        p3=Point(triDBL.GetValue(i + 10), triDBL.GetValue(i + 11), triDBL.GetValue(i + 12)),
+        id3=int(triDBL.GetValue(i + 13)),
+        seq3=int(triDBL.GetValue(i + 14)),
+        index=int(triDBL.GetValue(i + 15))
+      )
+
+      vectorTagTriangles.append(tri)
+    return vectorTagTriangles
+
+  def _readCustomDataEdge(self, fielddata):
+    vectorTagEdges = OrderedDict()
+    edgeDBL = fielddata.GetArray("TagEdges")
+    if not edgeDBL:
+      return vectorTagEdges
+
+    # only the few rows of the dense array that hold an edge are converted
+    import numpy as np
+    from vtk.util.numpy_support import vtk_to_numpy
+    values = vtk_to_numpy(edgeDBL)[:edgeDBL.GetNumberOfValues() // 5 * 5].reshape(-1, 5).astype(int)
+    for i in np.flatnonzero(values.any(axis=1)).tolist():
+      ptId1, ptId2, seq, numEdge, constrain = values[i].tolist()
+      vectorTagEdges[i] = TagEdge(ptId1=ptId1, ptId2=ptId2, seq=seq, numEdge=numEdge, constrain=constrain)
+    return vectorTagEdges
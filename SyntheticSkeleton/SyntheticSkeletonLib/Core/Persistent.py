@@ -0,0 +1,149 @@
+""" Immutable containers with structural sharing for the template vectors.
+
+Modifications return a new container that shares everything but the modified chunk (bucket) with the original one.
+A modification thus copies O(CHUNK_SIZE + n / CHUNK_SIZE) references instead of all n items, and earlier versions stay
+valid and unchanged for as long as they are referenced (e.g. by a snapshot used in a background task).
+"""
+
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+from itertools import chain
+
+
+CHUNK_SIZE = 64
+NUMBER_OF_BUCKETS = 64
+
+
+class PersistentList(Sequence):
+  """ Immutable sequence stored in chunks of up to 2 * CHUNK_SIZE items """
+
+  __slots__ = ("_chunks", "_offsets", "_length")
+
+  def __init__(self, items=()):
+    items = tuple(items)
+    self._setChunks(tuple(items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)))
+
+  def _setChunks(self, chunks, offsets=None, length=None):
+    if offsets is None:
+      offsets, length = [], 0
+      for chunk in chunks:
+        offsets.append(length)
+        length += len(chunk)
+      offsets = tuple(offsets)
+    self._chunks = chunks
+    self._offsets = offsets
+    self._length = length
+
+  @classmethod
+  def _create(cls, chunks, offsets=None, length=None):
+    other = cls.__new__(cls)
+    other._setChunks(chunks, offsets, length)
+    return other
+
+  def _locate(self, index):
+    if index < 0:
+      index += self._length
+    if not 0 <= index < self._length:
+      raise IndexError("PersistentList index out of range")
+    chunk = bisect_right(self._offsets, index) - 1
+    return chunk, index - self._offsets[chunk]
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return PersistentList(tuple(self)[index])
+    chunk, offset = self._locate(index)
+    return self._chunks[chunk][offset]
+
+  def __iter__(self):
+    return chain.from_iterable(self._chunks)
+
+  def __reversed__(self):
+    return chain.from_iterable(reversed(chunk) for chunk in reversed(self._chunks))
+
+  def __len__(self):
+    return self._length
+
+  def __eq__(self, other):
+    if isinstance(other, (PersistentList, list, tuple)):
+      return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+    return NotImplemented
+
+  def __repr__(self):
+    return f"PersistentList({list(self)!r})"
+
+  def setItem(self, index, item):
+    chunk, offset = self._locate(index)
+    items = self._chunks[chunk]
+    chunks = self._chunks[:chunk] + (items[:offset] + (item,) + items[offset + 1:],) + self._chunks[chunk + 1:]
+    return PersistentList._create(chunks, self._offsets, self._length)
+
+  def insertItem(self, index, item):
+    if index < 0:
+      index += self._length
+    if not 0 <= index <= self._length:
+      raise IndexError("PersistentList index out of range")
+    chunks = self._chunks
+    if index == self._length:
+      if chunks and len(chunks[-1]) < CHUNK_SIZE:
+        return PersistentList._create(chunks[:-1] + (chunks[-1] + (item,),), self._offsets, self._length + 1)
+      return PersistentList._create(chunks + ((item,),), self._offsets + (self._length,), self._length + 1)
+    chunk, offset = self._locate(index)
+    items = chunks[chunk][:offset] + (item,) + chunks[chunk][offset:]
+    replacement = (items,) if len(items) <= 2 * CHUNK_SIZE else (items[:CHUNK_SIZE], items[CHUNK_SIZE:])
+    return PersistentList._create(chunks[:chunk] + replacement + chunks[chunk + 1:])
+
+  def appendItem(self, item):
+    return self.insertItem(self._length, item)
+
+  def removeItem(self, index):
+    chunk, offset = self._locate(index)
+    items = self._chunks[chunk][:offset] + self._chunks[chunk][offset + 1:]
+    return PersistentList._create(self._chunks[:chunk] + ((items,) if items else ()) + self._chunks[chunk + 1:])
+
+
+class PersistentMap(Mapping):
+  """ Immutable mapping stored in NUMBER_OF_BUCKETS dictionaries by hash of the key """
+
+  __slots__ = ("_buckets", "_length")
+
+  def __init__(self, items=()):
+    buckets = [{} for _ in range(NUMBER_OF_BUCKETS)]
+    for key, value in (items.items() if isinstance(items, Mapping) else items):
+      buckets[hash(key) % NUMBER_OF_BUCKETS][key] = value
+    self._buckets = tuple(buckets)
+    self._length = sum(len(bucket) for bucket in buckets)
+
+  @classmethod
+  def _create(cls, buckets, length):
+    other = cls.__new__(cls)
+    other._buckets = buckets
+    other._length = length
+    return other
+
+  def __getitem__(self, key):
+    return self._buckets[hash(key) % NUMBER_OF_BUCKETS][key]
+
+  def __contains__(self, key):
+    return key in self._buckets[hash(key) % NUMBER_OF_BUCKETS]
+
+  def __iter__(self):
+    return chain.from_iterable(self._buckets)
+
+  def __len__(self):
+    return self._length
+
+  def __repr__(self):
+    return f"PersistentMap({dict(self.items())!r})"
+
+  def setItem(self, key, value):
+    index = hash(key) % NUMBER_OF_BUCKETS
+    bucket = dict(self._buckets[index])
+    length = self._length + (key not in bucket)
+    bucket[key] = value
+    return PersistentMap._create(self._buckets[:index] + (bucket,) + self._buckets[index + 1:], length)
+
+  def removeItem(self, key):
+    index = hash(key) % NUMBER_OF_BUCKETS
+    bucket = dict(self._buckets[index])
+    del bucket[key]
+    return PersistentMap._create(self._buckets[:index] + (bucket,) + self._buckets[index + 1:], self._length - 1)
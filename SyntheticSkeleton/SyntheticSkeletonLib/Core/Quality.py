@@ -0,0 +1,199 @@
+""" Per-triangle quality of the template mesh.
+
+MeshQuality is a listener of CustomInformation and keeps one array per quality measure, with a value per template
+triangle (in the order of vectorTagTriangles, i.e. of the cells of the template mesh):
+
+  Area          triangle area
+  AspectRatio   circumradius / (2 * inradius): 1 for equilateral triangles, growing without bound for slivers
+  MinimumAngle  smallest interior angle in degrees
+  Dihedral      largest angle in degrees between the normal of the triangle and those of the triangles sharing an edge
+                with it, 180 for a neighbour of opposite orientation
+
+An edit only marks the triangles it touches, and the triangles sharing an edge with them, as outdated. These are
+recomputed when the arrays or the summary are requested next. Replacing all points or triangles (e.g. reading a
+template) recomputes all triangles.
+"""
+
+from collections import OrderedDict
+from dataclasses import astuple
+
+import numpy as np
+
+from SyntheticSkeletonLib.Core.Constants import QUALITY_MAX_ASPECT_RATIO, QUALITY_MIN_ANGLE_DEGREES, \
+  QUALITY_MAX_DIHEDRAL_DEGREES
+from SyntheticSkeletonLib.Core.Model import CustomInformation, TAG_POINTS, TAG_TRIANGLES
+
+
+AREA = "Area"
+ASPECT_RATIO = "AspectRatio"
+MINIMUM_ANGLE = "MinimumAngle"
+DIHEDRAL = "Dihedral"
+
+QUALITY_ARRAYS = [AREA, ASPECT_RATIO, MINIMUM_ANGLE, DIHEDRAL]
+
+# triangles counted as poor in the summary
+IS_POOR = {
+  AREA: lambda values: values <= 0.0,
+  ASPECT_RATIO: lambda values: values > QUALITY_MAX_ASPECT_RATIO,
+  MINIMUM_ANGLE: lambda values: values < QUALITY_MIN_ANGLE_DEGREES,
+  DIHEDRAL: lambda values: values > QUALITY_MAX_DIHEDRAL_DEGREES
+}
+
+_CORNERS = np.array([[0, 1], [1, 2], [2, 0]])
+
+
+def computeTriangleQuality(positions):
+  """ Area, aspect ratio, minimum angle and unit normal (zero for degenerate triangles) of triangles given by the
+  positions of their vertices (n x 3 x 3)
+  """
+  p1, p2, p3 = positions[:, 0], positions[:, 1], positions[:, 2]
+  a = np.linalg.norm(p2 - p3, axis=1)
+  b = np.linalg.norm(p3 - p1, axis=1)
+  c = np.linalg.norm(p1 - p2, axis=1)
+  cross = np.cross(p2 - p1, p3 - p1)
+  doubleArea = np.linalg.norm(cross, axis=1)
+  degenerate = doubleArea == 0.0
+  s = (a + b + c) / 2.0
+  with np.errstate(divide="ignore", invalid="ignore"):
+    aspectRatio = np.where(degenerate, np.inf, a * b * c / (8.0 * (s - a) * (s - b) * (s - c)))
+    cosines = np.stack([(b * b + c * c - a * a) / (2.0 * b * c),
+                        (c * c + a * a - b * b) / (2.0 * c * a),
+                        (a * a + b * b - c * c) / (2.0 * a * b)], axis=1)
+    angles = np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+    normals = np.where(degenerate[:, None], 0.0, cross / doubleArea[:, None])
+  minimumAngle = np.where(degenerate, 0.0, np.nan_to_num(angles.min(axis=1)))
+  return doubleArea / 2.0, aspectRatio, minimumAngle, normals
+
+
+class MeshQuality(object):
+
+  def __init__(self, data: CustomInformation):
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self._reset()
+
+  def attach(self, data: CustomInformation):
+    """ Follows the edits of data from now on, e.g. once the template was replaced """
+    self.data.removeListener(self.onTemplateEdited)
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self._reset()
+
+  def _reset(self):
+    self._ids = np.array([tri.triPtIds for tri in self.data.vectorTagTriangles], dtype=np.int64).reshape(-1, 3)
+    numberOfTriangles = len(self._ids)
+    self._metrics = {name: np.full(numberOfTriangles, np.nan) for name in QUALITY_ARRAYS}
+    self._normals = np.zeros((numberOfTriangles, 3))
+    self._outdated = np.ones(numberOfTriangles, dtype=bool)
+    self._outdatedDihedral = np.ones(numberOfTriangles, dtype=bool)
+
+  def onTemplateEdited(self, data, changes):
+    if any(change.key is None and change.vector in (TAG_POINTS, TAG_TRIANGLES) for change in changes):
+      self._reset()
+      return
+    for change in changes:
+      if change.vector == TAG_TRIANGLES:
+        self._onTriangleChanged(change)
+      elif change.vector == TAG_POINTS:
+        if change.new is None:
+          # the points after the removed one move up, the triangles referencing them are renumbered by the editor
+          self._outdated |= (self._ids >= change.key).any(axis=1)
+        elif change.old is not None and change.old.pos != change.new.pos:
+          self._outdated |= (self._ids == change.key).any(axis=1)
+
+  def _onTriangleChanged(self, change):
+    index = change.key
+    if change.old is not None:
+      # the former neighbours lose this triangle
+      self._outdatedDihedral |= self._getNeighbourMask([index])
+    if change.new is None:
+      self._ids = np.delete(self._ids, index, axis=0)
+      self._normals = np.delete(self._normals, index, axis=0)
+      self._metrics = {name: np.delete(values, index) for name, values in self._metrics.items()}
+      self._outdated = np.delete(self._outdated, index)
+      self._outdatedDihedral = np.delete(self._outdatedDihedral, index)
+    elif change.old is None:
+      self._ids = np.insert(self._ids, index, change.new.triPtIds, axis=0)
+      self._normals = np.insert(self._normals, index, 0.0, axis=0)
+      self._metrics = {name: np.insert(values, index, np.nan) for name, values in self._metrics.items()}
+      self._outdated = np.insert(self._outdated, index, True)
+      self._outdatedDihedral = np.insert(self._outdatedDihedral, index, True)
+    else:
+      self._ids[index] = change.new.triPtIds
+      self._outdated[index] = True
+
+  def _getEdgeKeys(self):
+    """ Key of the (unordered) point index pair of each edge of each triangle (n x 3) """
+    pairs = np.sort(self._ids[:, _CORNERS], axis=2)
+    stride = int(self._ids.max()) + 1 if len(self._ids) else 1
+    return pairs[..., 0] * stride + pairs[..., 1]
+
+  def _getNeighbourMask(self, rows):
+    keys = self._getEdgeKeys()
+    return np.isin(keys, keys[rows].ravel()).any(axis=1)
+
+  def _getPositions(self, ids):
+    points = self.data.vectorTagPoints
+    pointIds, inverse = np.unique(ids, return_inverse=True)
+    coordinates = np.array([astuple(points[i].pos) if 0 <= i < len(points) else (np.nan,) * 3
+                            for i in pointIds.tolist()], dtype=np.float64).reshape(-1, 3)
+    return coordinates[inverse.reshape(ids.shape)]
+
+  def update(self):
+    """ Recomputes the outdated triangles """
+    rows = np.flatnonzero(self._outdated)
+    if len(rows):
+      area, aspectRatio, minimumAngle, normals = computeTriangleQuality(self._getPositions(self._ids[rows]))
+      self._metrics[AREA][rows] = area
+      self._metrics[ASPECT_RATIO][rows] = aspectRatio
+      self._metrics[MINIMUM_ANGLE][rows] = minimumAngle
+      self._normals[rows] = normals
+      self._outdatedDihedral |= self._outdated | self._getNeighbourMask(rows)
+      self._outdated[:] = False
+
+    rows = np.flatnonzero(self._outdatedDihedral)
+    if len(rows):
+      self._updateDihedrals(rows)
+      self._outdatedDihedral[:] = False
+
+  def _updateDihedrals(self, rows):
+    keys = self._getEdgeKeys()
+    flatKeys = keys.ravel()
+    order = np.argsort(flatKeys, kind="stable")
+    sortedKeys = flatKeys[order]
+    owners = order // 3
+
+    # all (triangle, triangle sharing the edge) pairs of the edges of rows
+    rowKeys = keys[rows].ravel()
+    first = np.searchsorted(sortedKeys, rowKeys, side="left")
+    counts = np.searchsorted(sortedKeys, rowKeys, side="right") - first
+    triangles = np.repeat(np.repeat(rows, 3), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    neighbours = owners[np.repeat(first, counts) + offsets]
+
+    valid = (neighbours != triangles) & self._normals[triangles].any(axis=1) & self._normals[neighbours].any(axis=1)
+    triangles, neighbours = triangles[valid], neighbours[valid]
+    cosines = np.einsum("ij,ij->i", self._normals[triangles], self._normals[neighbours])
+    dihedral = self._metrics[DIHEDRAL]
+    dihedral[rows] = 0.0
+    np.maximum.at(dihedral, triangles, np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0))))
+
+  def getArray(self, name):
+    """ Up to date values of the quality measure name for all triangles. The array must not be modified. """
+    self.update()
+    return self._metrics[name]
+
+  def getSummary(self):
+    """ Minimum, mean, maximum and number of poor triangles (see IS_POOR) per quality measure """
+    self.update()
+    summary = OrderedDict()
+    for name in QUALITY_ARRAYS:
+      values = self._metrics[name]
+      finite = values[np.isfinite(values)]
+      summary[name] = {
+        "min": finite.min() if len(finite) else np.nan,
+        "mean": finite.mean() if len(finite) else np.nan,
+        "max": finite.max() if len(finite) else np.nan,
+        "poor": int(np.count_nonzero(IS_POOR[name](values)))
+      }
+    return summary
@@ -0,0 +1,116 @@
+""" Index of the tag points by the skeleton vertex they are snapped to (TagPoint.seq).
+
+VertexTagIndex is a listener of CustomInformation and counts the tag points per skeleton vertex. Adding, moving and
+removing a point only updates the counts of its vertices, so whether a vertex is tagged already is answered in constant
+time while points are placed. The vertices with more than one tag point are kept as well, which makes the duplicate
+report of a template proportional to the number of duplicates.
+
+The point indices per vertex are kept up to date while points are appended and moved. Removing or inserting a point
+shifts the indices of the following points, so they are rebuilt when they are requested next. Points with a negative
+seq are not snapped to a vertex and not indexed.
+"""
+
+from SyntheticSkeletonLib.Core.Model import CustomInformation, TAG_POINTS
+
+
+class VertexTagIndex(object):
+
+  def __init__(self, data: CustomInformation):
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self._reset()
+
+  def attach(self, data: CustomInformation):
+    """ Follows the edits of data from now on, e.g. once the template was replaced """
+    self.data.removeListener(self.onTemplateEdited)
+    self.data = data
+    data.addListener(self.onTemplateEdited)
+    self._reset()
+
+  def _reset(self):
+    self._counts = dict()  # seq -> number of points
+    self._duplicates = set()  # seqs with more than one point
+    self._points = None  # seq -> point indices, None if outdated
+    for point in self.data.vectorTagPoints:
+      self._add(point.seq)
+
+  def _add(self, seq):
+    if seq < 0:
+      return
+    count = self._counts.get(seq, 0) + 1
+    self._counts[seq] = count
+    if count == 2:
+      self._duplicates.add(seq)
+
+  def _discard(self, seq):
+    if seq < 0:
+      return
+    count = self._counts[seq] - 1
+    if count:
+      self._counts[seq] = count
+    else:
+      del self._counts[seq]
+    if count == 1:
+      self._duplicates.discard(seq)
+
+  def onTemplateEdited(self, data, changes):
+    for change in changes:
+      if change.vector != TAG_POINTS:
+        continue
+      if change.key is None:
+        self._reset()
+        continue
+      if change.old is not None:
+        self._discard(change.old.seq)
+      if change.new is not None:
+        self._add(change.new.seq)
+      self._updatePoints(change)
+
+  def _updatePoints(self, change):
+    if self._points is None:
+      return
+    appended = change.old is None and change.key == len(self.data.vectorTagPoints) - 1
+    if change.old is not None and change.new is not None:
+      if change.old.seq != change.new.seq:
+        self._removePointIndex(change.old.seq, change.key)
+        self._addPointIndex(change.new.seq, change.key)
+    elif appended and self.data.vectorTagPoints[change.key] is change.new:
+      self._addPointIndex(change.new.seq, change.key)
+    else:
+      self._points = None
+
+  def _addPointIndex(self, seq, index):
+    if seq >= 0:
+      self._points.setdefault(seq, []).append(index)
+
+  def _removePointIndex(self, seq, index):
+    if seq >= 0:
+      indices = self._points[seq]
+      indices.remove(index)
+      if not indices:
+        del self._points[seq]
+
+  def getCount(self, seq):
+    return self._counts.get(seq, 0)
+
+  def isOccupied(self, seq, pointIndex=None):
+    """ Whether a tag point other than the one at pointIndex (e.g. a point that is moved) is on vertex seq """
+    count = self._counts.get(seq, 0)
+    if pointIndex is not None and count and self.data.vectorTagPoints[pointIndex].seq == seq:
+      count -= 1
+    return count > 0
+
+  def getPointIndices(self, seq):
+    """ Indices of the tag points on vertex seq in ascending order """
+    if self._points is None:
+      self._points = dict()
+      for index, point in enumerate(self.data.vectorTagPoints):
+        self._addPointIndex(point.seq, index)
+    return sorted(self._points.get(seq, []))
+
+  def hasDuplicates(self):
+    return len(self._duplicates) > 0
+
+  def getDuplicates(self):
+    """ Indices of the tag points by vertex, for all vertices with more than one tag point (ascending seq) """
+    return {seq: self.getPointIndices(seq) for seq in sorted(self._duplicates)}
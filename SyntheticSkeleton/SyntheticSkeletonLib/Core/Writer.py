@@ -0,0 +1,180 @@
+""" Writer of the template arrays into the field data of Affix files """
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk
+
+from SyntheticSkeletonLib.Core.Colors import colorNameToRGB
+from SyntheticSkeletonLib.Core.Geometry import pairNumber
+from SyntheticSkeletonLib.Core.Model import CustomInformation
+from SyntheticSkeletonLib.Profiling import profiled
+
+
+class CustomInformationWriter(object):
+
+  @property
+  def vectorTagTriangles(self):
+      return self.data.vectorTagTriangles
+
+  @property
+  def vectorTagInfo(self):
+      return self.data.vectorTagInfo
+
+  @property
+  def vectorLabelInfo(self):
+      return self.data.vectorLabelInfo
+
+  @property
+  def vectorTagPoints(self):
+      return self.data.vectorTagPoints
+
+  @property
+  def vectorTagEdges(self):
+      return self.data.vectorTagEdges
+
+  @property
+  def labelData(self):
+      return self.data.labelData
+
+  def __init__(self, data: CustomInformation):
+    self.data = data
+
+  @profiled
+  def writeCustomData(self, polydata):
+    finalPolyData = vtk.vtkPolyData()
+    finalPolyData.DeepCopy(polydata)
+    fielddata = finalPolyData.GetFieldData()
+
+    self._writeCustomDataLabel(fielddata)
+    self._writeCustomDataTag(fielddata)
+    self._writeCustomDataPoints(fielddata)
+    self._writeCustomDataTriLabel(fielddata)
+    self._writeCustomDataTri(fielddata)
+    self._writeCustomDataEdge(fielddata)
+
+    finalPolyData.SetFieldData(fielddata)
+    return finalPolyData
+
+  def writeCustomDataToFile(self, outputFilePath, binary=False):
+    finalPolyData = self.writeCustomData(self.data.polydata)
+    writer = vtk.vtkGenericDataObjectWriter()
+    writer.SetFileName(outputFilePath)
+    if binary:
+      writer.SetFileTypeToBinary()
+    writer.SetInputData(finalPolyData)
+    writer.Update()
+    writer.Write()
+
+  def _writeCustomDataLabel(self, fielddata):
+    if fielddata.GetArray("Label"):
+      fielddata.RemoveArray("Label")
+
+    labelData = np.zeros((self.data.polydata.GetNumberOfPoints(),), dtype=np.float32)
+    for pt in self.vectorTagPoints:
+      labelData[pt.seq] = pt.typeIndex
+
+    fltArray1 = numpy_to_vtk(labelData, deep=True, array_type=vtk.VTK_FLOAT)
+    fltArray1.SetName("Label")
+    if len(labelData) != 0:
+      fielddata.AddArray(fltArray1)
+
+
+  def _writeCustomDataTag(self, fielddata):
+    if fielddata.GetArray("TagInfo"):
+      fielddata.RemoveArray("TagInfo")
+    if fielddata.GetArray("TagName"):
+      fielddata.RemoveArray("TagName")
+
+    fltArray5 = vtk.vtkFloatArray()
+    fltArray5.SetName("TagInfo")
+    strArray1 = vtk.vtkStringArray()
+    strArray1.SetName("TagName")
+    for ti in self.vectorTagInfo:
+      fltArray5.InsertNextValue(ti.tagType)
+      fltArray5.InsertNextValue(ti.tagIndex)
+      fltArray5.InsertNextValue(ti.tagColor.r)
+      fltArray5.InsertNextValue(ti.tagColor.g)
+      fltArray5.InsertNextValue(ti.tagColor.b)
+
+      strArray1.InsertNextValue(ti.tagName)
+    if len(self.vectorTagInfo) != 0:
+      fielddata.AddArray(fltArray5)
+      fielddata.AddArray(strArray1)
+
+  def _writeCustomDataTriLabel(self, fielddata):
+    if fielddata.GetArray("LabelTriangleName"):
+      fielddata.RemoveArray("LabelTriangleName")
+    if fielddata.GetArray("LabelTriangleColor"):
+      fielddata.RemoveArray("LabelTriangleColor")
+
+    strArray2_1 = vtk.vtkStringArray()
+    strArray2_1.SetName("LabelTriangleName")
+    fltArray2_1 = vtk.vtkFloatArray()
+    fltArray2_1.SetName("LabelTriangleColor")
+    for tl in self.vectorLabelInfo:
+      strArray2_1.InsertNextValue(tl.labelName)
+      red, green, blue = colorNameToRGB(tl.labelColor)
+      fltArray2_1.InsertNextValue(red)
+      fltArray2_1.InsertNextValue(green)
+      fltArray2_1.InsertNextValue(blue)
+    if len(self.vectorLabelInfo) != 0:
+      fielddata.AddArray(strArray2_1)
+      fielddata.AddArray(fltArray2_1)
+
+  def _writeCustomDataPoints(self, fielddata):
+    if fielddata.GetArray("TagPoints"):
+      fielddata.RemoveArray("TagPoints")
+
+    fltArray4 = vtk.vtkFloatArray()
+    fltArray4.SetName("TagPoints")
+    for pt in self.vectorTagPoints:
+      fltArray4.InsertNextValue(pt.pos.x)
+      fltArray4.InsertNextValue(pt.pos.y)
+      fltArray4.InsertNextValue(pt.pos.z)
+      fltArray4.InsertNextValue(pt.radius)
+      fltArray4.InsertNextValue(pt.seq)
+      fltArray4.InsertNextValue(pt.typeIndex)
+      fltArray4.InsertNextValue(pt.comboBoxIndex)
+    if len(self.vectorTagPoints) != 0:
+      fielddata.AddArray(fltArray4)
+
+  def _writeCustomDataEdge(self, fielddata):
+    if fielddata.GetArray("TagEdges"):
+      fielddata.RemoveArray("TagEdges")
+
+    # dense array indexed by the pair number of the point indices, zeros for pairs without edge
+    maxId = pairNumber(len(self.vectorTagPoints), len(self.vectorTagPoints))
+    vectorTagEdges = np.zeros((maxId + 1, 5), dtype=np.float32)
+    for key, edge in self.vectorTagEdges.items():
+      vectorTagEdges[key] = (edge.ptId1, edge.ptId2, edge.seq, edge.numEdge, edge.constrain)
+
+    fltArray3 = numpy_to_vtk(vectorTagEdges.ravel(), deep=True, array_type=vtk.VTK_FLOAT)
+    fltArray3.SetName("TagEdges")
+    if len(vectorTagEdges) != 0:
+      fielddata.AddArray(fltArray3)
+
+  def _writeCustomDataTri(self, fielddata):
+    if fielddata.GetArray("TagTriangles"):
+      fielddata.RemoveArray("TagTriangles")
+
+    fltArray2 = vtk.vtkFloatArray()
+    fltArray2.SetName("TagTriangles")
+    for tri in self.vectorTagTriangles:
+      fltArray2.InsertNextValue(tri.p1.x)
+      fltArray2.InsertNextValue(tri.p1.y)
+      fltArray2.InsertNextValue(tri.p1.z)
+      fltArray2.InsertNextValue(tri.id1)
+      fltArray2.InsertNextValue(tri.seq1)
+      fltArray2.InsertNextValue(tri.p2.x)
+      fltArray2.InsertNextValue(tri.p2.y)
+      fltArray2.InsertNextValue(tri.p2.z)
+      fltArray2.InsertNextValue(tri.id2)
+      fltArray2.InsertNextValue(tri.seq2)
+      fltArray2.InsertNextValue(tri.p3.x)
+      fltArray2.InsertNextValue(tri.p3.y)
+      fltArray2.InsertNextValue(tri.p3.z)
+      fltArray2.InsertNextValue(tri.id3)
+      fltArray2.InsertNextValue(tri.seq3)
+      fltArray2.InsertNextValue(tri.index)
+    if len(self.vectorTagTriangles) != 0:
+      fielddata.AddArray(fltArray2)
@@ -0,0 +1,15 @@
+""" Data model, Affix readers and writers, geometry utilities and colour codec of SyntheticSkeleton.
+
+Nothing in this package depends on Qt or Slicer, so it can be used in worker processes and plain Python:
+
+  Constants  parameter names, lazily resolved defaults and tag types
+  Colors     colour names ('#rrggbb') <-> 0-255 RGB
+  Model      template data model (CustomInformation, snapshots) and Affix field data reader, standard library only
+  Persistent immutable lists and maps with structural sharing for the template vectors
+  Geometry   pairing function and plane fitting (numpy)
+  Writer     Affix field data writer (vtk)
+  History    undo and redo of template edits
+  Journal    append-only journal of template edits with Affix checkpoints for autosave and recovery
+  Quality    per-triangle quality of the template mesh, updated incrementally (numpy)
+  TagIndex   index of the tag points by skeleton vertex for duplicate detection
+"""
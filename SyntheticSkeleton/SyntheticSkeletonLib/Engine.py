@@ -0,0 +1,410 @@
+""" Headless synthetic skeleton engine.
+
+Everything in here works on plain vtk/numpy data (CustomInformation and vtkPolyData) and can be used without Slicer,
+e.g. from scripts or batch processing:
+
+  python -m SyntheticSkeletonLib.Engine --affix skeletonAffix.vtk --outputDirectory out --modelName template \\
+    --subdivisionLevel 2
+"""
+
+import argparse
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, replace
+from pathlib import Path
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk
+
+from SyntheticSkeletonLib.Artifacts import ArtifactManifest, ArtifactWriter, createKey
+from SyntheticSkeletonLib.Core.Colors import colorNameToRGB
+from SyntheticSkeletonLib.Core.Model import CustomInformation, Point
+from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+from SyntheticSkeletonLib.Profiling import profiled
+
+
+def readPolyData(filePath):
+  filePath = str(filePath)
+  if filePath.endswith(".vtp"):
+    reader = vtk.vtkXMLPolyDataReader()
+  else:
+    reader = vtk.vtkPolyDataReader()
+  reader.SetFileName(filePath)
+  reader.Update()
+  polydata = reader.GetOutput()
+  if polydata is None or (polydata.GetNumberOfPoints() == 0 and polydata.GetFieldData().GetNumberOfArrays() == 0):
+    raise IOError(f"Failed to read polydata from {filePath}")
+  return polydata
+
+
+def writePolyData(polydata, filePath):
+  filePath = str(filePath)
+  if filePath.endswith(".vtp"):
+    writer = vtk.vtkXMLPolyDataWriter()
+  else:
+    writer = vtk.vtkPolyDataWriter()
+  writer.SetFileName(filePath)
+  writer.SetInputData(polydata)
+  if not writer.Write():
+    raise IOError(f"Failed to write polydata to {filePath}")
+
+
+def createPointLocator(polydata):
+  locator = vtk.vtkKdTreePointLocator()
+  locator.SetDataSet(polydata)
+  locator.BuildLocator()
+  return locator
+
+
+def createDecimatedProxy(polydata, targetNumberOfPoints):
+  """ Reduced copy of a (large) skeleton for display and picking only. Quadric clustering runs in linear time, which
+  matters for Voronoi skeletons with millions of vertices. Point and cell data are not kept.
+  """
+  triangulate = vtk.vtkTriangleFilter()
+  triangulate.SetInputData(polydata)
+  triangulate.PassVertsOff()
+  triangulate.PassLinesOff()
+
+  bounds = polydata.GetBounds()
+  lengths = [bounds[1] - bounds[0], bounds[3] - bounds[2], bounds[5] - bounds[4]]
+  # a surface has about (number of bins)^2 vertices
+  binSize = max(lengths) / max(1, int(targetNumberOfPoints ** 0.5))
+  cluster = vtk.vtkQuadricClustering()
+  cluster.SetInputConnection(triangulate.GetOutputPort())
+  cluster.SetNumberOfDivisions(*[max(1, int(round(length / binSize))) if binSize > 0 else 1 for length in lengths])
+  cluster.Update()
+  return cluster.GetOutput()
+
+
+@profiled
+def getClosestVertexAndRadius(locator, pos):
+  vertexIdx = locator.FindClosestPoint(pos)
+  radiusArray = locator.GetDataSet().GetPointData().GetArray("Radius")
+  return vertexIdx, radiusArray.GetValue(vertexIdx)
+
+
+def createTemplatePolyData(data: CustomInformation):
+  """ Creates the triangulated template mesh (points, triangles, 'Radius' point data and 'Colors' cell scalars) """
+  meshPoly = vtk.vtkPolyData()
+  meshPoints = vtk.vtkPoints()
+  triangles = vtk.vtkCellArray()
+
+  radiusArray = vtk.vtkFloatArray()
+  radiusArray.SetName("Radius")
+
+  for pt in data.vectorTagPoints:
+    meshPoints.InsertNextPoint(astuple(pt.pos))
+    radiusArray.InsertNextValue(pt.radius)
+
+  meshPoly.GetPointData().AddArray(radiusArray)
+
+  colorsArray = vtk.vtkUnsignedCharArray()
+  colorsArray.SetNumberOfComponents(3)
+  colorsArray.SetName("Colors")
+
+  for tri in data.vectorTagTriangles:
+    triangle = vtk.vtkTriangle()
+    triangle.GetPointIds().SetId(0, tri.id1)
+    triangle.GetPointIds().SetId(1, tri.id2)
+    triangle.GetPointIds().SetId(2, tri.id3)
+    triangles.InsertNextCell(triangle)
+
+    colorsArray.InsertNextTuple3(*colorNameToRGB(data.vectorLabelInfo[tri.index].labelColor))
+
+  meshPoly.GetCellData().SetScalars(colorsArray)
+  meshPoly.SetPoints(meshPoints)
+  meshPoly.SetPolys(triangles)
+  return meshPoly
+
+
+def subdivideTemplatePolyData(polydata, numberOfSubdivisions, locator):
+  """ Loop subdivision of the template mesh. The 'Radius' of each resulting vertex is taken from the closest vertex
+  of the skeleton that the locator was built for.
+  """
+  cleanPoly = vtk.vtkCleanPolyData()
+  cleanPoly.SetInputData(polydata)
+
+  subdivisionFilter = vtk.vtkLoopSubdivisionFilter()
+  subdivisionFilter.SetNumberOfSubdivisions(numberOfSubdivisions)
+  subdivisionFilter.SetInputConnection(cleanPoly.GetOutputPort())
+  subdivisionFilter.Update()
+  subdivisionOutput = subdivisionFilter.GetOutput()
+
+  # clean radius array if exists
+  pointdata = subdivisionOutput.GetPointData()
+  if pointdata.GetArray("Radius"):
+    pointdata.RemoveArray("Radius")
+
+  fltArray1 = vtk.vtkFloatArray()
+  fltArray1.SetName("Radius")
+
+  pos = [0.0, 0.0, 0.0]
+  for i in range(subdivisionOutput.GetNumberOfPoints()):
+    subdivisionOutput.GetPoint(i, pos)
+    _, radius = getClosestVertexAndRadius(locator, pos)
+    fltArray1.InsertNextValue(radius)
+
+  pointdata.AddArray(fltArray1)
+  return subdivisionOutput
+
+
+class SubdivisionCache(object):
+  """ Subdivided template meshes by (template version, subdivision level).
+
+  Level n is built by subdividing the cached level n-1 once, so stepping through levels only computes what is
+  missing. Entries are only valid for one base mesh and skeleton locator; any other base mesh or locator drops all of
+  them. The least recently used levels are dropped when the cache exceeds maxMemoryKiB (the most recent result is
+  always kept).
+
+  The cache may be used from a worker thread. Cached polydata are shared and never modified.
+  """
+
+  def __init__(self, maxMemoryKiB=256 * 1024):
+    self.maxMemoryKiB = maxMemoryKiB
+    self._entries = OrderedDict()  # (version, level) -> vtkPolyData
+    self._base = (None, None)  # (base polydata, locator)
+    self._lock = threading.Lock()
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._base = (None, None)
+
+  def peek(self, version, level):
+    """ Returns the cached result or None without computing anything """
+    with self._lock:
+      return self._entries.get((version, level))
+
+  def get(self, polydata, version, level, locator, isCancelled=None):
+    """ Returns the base polydata subdivided level times. isCancelled is checked before every subdivision step,
+    None is returned if it returns True (levels computed so far are kept).
+    """
+    assert level > 0
+    with self._lock:
+      if self._base[0] is not polydata or self._base[1] is not locator:
+        self._entries.clear()
+        self._base = (polydata, locator)
+      key = (version, level)
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+      start = level - 1
+      while start > 0 and (version, start) not in self._entries:
+        start -= 1
+      current = polydata if start == 0 else self._entries[(version, start)]
+
+    for n in range(start + 1, level + 1):
+      if isCancelled is not None and isCancelled():
+        return None
+      current = subdivideTemplatePolyData(current, 1, locator)
+      with self._lock:
+        if self._base[0] is not polydata:
+          # cleared meanwhile
+          return current
+        self._entries[(version, n)] = current
+    with self._lock:
+      self._evict()
+    return current
+
+  def getMemorySize(self):
+    """ Memory used by the cached polydata in KiB """
+    return sum(p.GetActualMemorySize() for p in list(self._entries.values()))
+
+  def _evict(self):
+    while len(self._entries) > 1 and self.getMemorySize() > self.maxMemoryKiB:
+      self._entries.popitem(last=False)
+
+
+class TagPointGlyphs(object):
+  """ All tag points as one polydata of sphere glyphs with a 'TagType' point scalar (tag type per glyph vertex).
+
+  A single model renders thousands of tag points at interactive frame rates, whereas a markups widget per control
+  point does not. The glyph filter is kept, so updating positions or radius only regenerates the glyphs.
+  """
+
+  def __init__(self, resolution=8):
+    self._input = vtk.vtkPolyData()
+    self._sphere = vtk.vtkSphereSource()
+    self._sphere.SetThetaResolution(resolution)
+    self._sphere.SetPhiResolution(resolution)
+    self._glyph = vtk.vtkGlyph3D()
+    self._glyph.SetInputData(self._input)
+    self._glyph.SetSourceConnection(self._sphere.GetOutputPort())
+    self._glyph.ScalingOff()
+    self._glyph.OrientOff()
+    self._glyph.SetColorModeToColorByScalar()
+
+  def update(self, positions, tagTypes, radius):
+    """ Returns the glyphs of the points at positions (n x 3) with the given tag types as new polydata """
+    points = vtk.vtkPoints()
+    points.SetData(numpy_to_vtk(np.asarray(positions, dtype=np.float32).reshape(-1, 3), deep=True))
+    tagTypeArray = numpy_to_vtk(np.asarray(tagTypes, dtype=np.int32), deep=True, array_type=vtk.VTK_INT)
+    tagTypeArray.SetName("TagType")
+    self._input.Initialize()
+    self._input.SetPoints(points)
+    self._input.GetPointData().SetScalars(tagTypeArray)
+    self._sphere.SetRadius(radius)
+    self._glyph.Update()
+    glyphs = vtk.vtkPolyData()
+    glyphs.ShallowCopy(self._glyph.GetOutput())
+    return glyphs
+
+
+def createCMRepAttributes(data: CustomInformation, modelName, gridType, solverType, subdivisionLevel,
+                          constantRho=None, constantRadius=None):
+  """ Returns the ordered key/value pairs of a .cmrep file. constantRho is only used by the PDE solver and
+  constantRadius is only written if given.
+  """
+  attrs = OrderedDict({
+    "Grid.Type": gridType,
+    "Grid.Model.SolverType": solverType,
+    "Grid.Model.Atom.SubdivisionLevel": subdivisionLevel,
+    "Grid.Model.Coefficient.FileName": f"{modelName}.vtk",
+    "Grid.Model.Coefficient.FileType": "VTK",
+    "Grid.Model.nLabels": len(set([t.tagIndex for t in data.vectorTagInfo]))
+  })
+
+  if solverType == "PDE":
+    attrs["Grid.Model.Coefficient.ConstantRho"] = constantRho
+
+  if constantRadius is not None:
+    attrs["Grid.Model.Coefficient.ConstantRadius"] = constantRadius
+  return attrs
+
+
+def writeCMRepFile(outFile, attrs):
+  with open(outFile, "w") as f:
+    for key, value in attrs.items():
+      f.write(f"{key} = {value}\n")
+
+
+class SyntheticSkeletonEngine(object):
+  """ Template operations of SyntheticSkeletonLogic without MRML nodes, markups or a parameter node """
+
+  def __init__(self, data: CustomInformation = None):
+    self.data = data if data is not None else CustomInformation()
+    self.skeletonName = "Skeleton"
+    self.locator = None
+    if self.data.polydata is not None:
+      self.setSkeleton(self.data.polydata)
+
+  def setSkeleton(self, polydata, name=None):
+    if not polydata.GetPointData().GetArray("Radius"):
+      raise ValueError("No 'Radius' array found in point data. The skeleton may not be a Voronoi skeleton.")
+    self.data.polydata = polydata
+    self.locator = createPointLocator(polydata)
+    if name:
+      self.skeletonName = name
+
+  def loadSkeleton(self, filePath):
+    self.setSkeleton(readPolyData(filePath), Path(filePath).stem)
+
+  def loadAffix(self, filePath):
+    """ Reads the template from an Affix file. If no skeleton was loaded before, the Affix polydata is used as skeleton,
+    otherwise the template is snapped onto the loaded skeleton.
+    """
+    affixPolyData = readPolyData(filePath)
+    customInfo = CustomInformation(affixPolyData)
+    customInfo.readCustomData()
+    snap = self.data.polydata is not None
+    if not snap:
+      name = Path(filePath).stem
+      self.setSkeleton(affixPolyData, name[:-len("Affix")] if name.endswith("Affix") else name)
+    customInfo.polydata = self.data.polydata
+    self.data = customInfo
+    if snap:
+      self.snapTemplateToSkeleton()
+
+  def snapTemplateToSkeleton(self):
+    """ Moves every tag point onto its closest skeleton vertex (as onPointInteractionEnded does) and updates
+    position, radius and vertex index of the triangles accordingly.
+    """
+    points = self.data.polydata.GetPoints()
+    tagPoints = []
+    for pt in self.data.vectorTagPoints:
+      vertIdx, radius = getClosestVertexAndRadius(self.locator, astuple(pt.pos))
+      tagPoints.append(replace(pt, pos=Point(*points.GetPoint(vertIdx)), radius=radius, seq=vertIdx))
+
+    triangles = [replace(tri, p1=tagPoints[tri.id1].pos, p2=tagPoints[tri.id2].pos, p3=tagPoints[tri.id3].pos,
+                         seq1=tagPoints[tri.id1].seq, seq2=tagPoints[tri.id2].seq, seq3=tagPoints[tri.id3].seq)
+                 for tri in self.data.vectorTagTriangles]
+    self.data.assign(vectorTagPoints=tagPoints, vectorTagTriangles=triangles)
+
+  def createMesh(self):
+    return createTemplatePolyData(self.data)
+
+  def createSubdivideMesh(self, numberOfSubdivisions):
+    if not numberOfSubdivisions > 0:
+      return None
+    assert self.locator is not None
+    return subdivideTemplatePolyData(self.createMesh(), numberOfSubdivisions, self.locator)
+
+  def writeAffix(self, outputFilePath):
+    CustomInformationWriter(self.data).writeCustomDataToFile(str(outputFilePath))
+
+  def save(self, outputDirectory, modelName, gridType="LoopSubdivision", solverType="BruteForce", subdivisionLevel=0,
+           constantRho=-0.001, constantRadius=None):
+    """ Writes the same set of files as SyntheticSkeletonLogic.save (without the inflated model) and returns
+    their paths. Files that are unchanged according to the manifest of the output directory are not rewritten.
+    """
+    outputDirectory = Path(outputDirectory)
+    logging.info(f"Saving to directory: {outputDirectory}")
+
+    templateHash = self.data.getTemplateHash()
+    skeletonHash = self.data.getSkeletonHash()
+    artifacts = ArtifactWriter(manifest=ArtifactManifest(outputDirectory))
+
+    meshFile = outputDirectory / f"{modelName}.vtk"
+    artifacts.add("triangulatedMesh", meshFile, lambda path: writePolyData(self.createMesh(), path),
+                  key=createKey("triangulatedMesh", templateHash))
+
+    if self.data.polydata is not None:
+      artifacts.add("affix", outputDirectory / f"{self.skeletonName}Affix.vtk", self.writeAffix,
+                    key=createKey("affix", templateHash, skeletonHash))
+
+    attrs = createCMRepAttributes(self.data, modelName, gridType, solverType, subdivisionLevel, constantRho,
+                                  constantRadius)
+    artifacts.add("cmrep", outputDirectory / f"{modelName}.cmrep", lambda path: writeCMRepFile(path, attrs),
+                  key=createKey("cmrep", attrs))
+
+    if subdivisionLevel > 0:
+      artifacts.add("subdividedMesh", outputDirectory / f"{self.skeletonName}_Subdivide.vtk",
+                    lambda path: writePolyData(self.createSubdivideMesh(subdivisionLevel), path),
+                    key=createKey("subdividedMesh", templateHash, skeletonHash, subdivisionLevel))
+
+    summary = artifacts.write()
+    # triangulated mesh first, batch processing inflates it
+    return [Path(result.path) for result in sorted(summary.values(), key=lambda r: r.name != "triangulatedMesh")]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Rebuild, subdivide and export a synthetic skeleton template")
+  parser.add_argument("--skeleton", help="Voronoi skeleton (.vtk/.vtp) with a 'Radius' point array")
+  parser.add_argument("--affix", required=True, help="Affix file holding the template")
+  parser.add_argument("--outputDirectory", required=True)
+  parser.add_argument("--modelName", default="SyntheticSkeleton")
+  parser.add_argument("--gridType", default="LoopSubdivision")
+  parser.add_argument("--solverType", default="BruteForce", choices=["BruteForce", "PDE"])
+  parser.add_argument("--subdivisionLevel", type=int, default=0)
+  parser.add_argument("--constantRho", type=float, default=-0.001)
+  parser.add_argument("--constantRadius", type=float, default=None)
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+  engine = SyntheticSkeletonEngine()
+  if args.skeleton:
+    engine.loadSkeleton(args.skeleton)
+  engine.loadAffix(args.affix)
+  for filePath in engine.save(args.outputDirectory, args.modelName, args.gridType, args.solverType,
+                              args.subdivisionLevel, args.constantRho, args.constantRadius):
+    print(filePath)
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
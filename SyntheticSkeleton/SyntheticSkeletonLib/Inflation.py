@@ -0,0 +1,141 @@
+""" In-process inflation of non-branching medial meshes.
+
+Produces the same output as the InflateMedialModel CLI (points, triangles and 'MedialIndex' point data) without
+launching a process: every triangle is duplicated with opposite winding, duplicated triangles are stitched across
+edges and each resulting vertex is offset by rad times the mean normal of its triangles.
+
+Only meshes where every edge is shared by at most two triangles are supported. For those, the triangle across an
+edge is determined by winding alone, whereas branches need the angle based matching of the CLI.
+"""
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, vtk_to_numpy
+
+
+class BranchingMedialMeshError(ValueError):
+  pass
+
+
+class MedialInflation(object):
+  """ Topology of the inflated mesh. It is built once, after that inflate() only computes vertex positions, which
+  makes repeated inflation with different radii cheap.
+  """
+
+  def __init__(self, points, triangles):
+    self.points = np.asarray(points, dtype=float)
+    self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    self._buildTopology()
+
+  @classmethod
+  def fromPolyData(cls, polydata):
+    """ Raises BranchingMedialMeshError if the mesh has branches or cells other than triangles """
+    polys = polydata.GetPolys()
+    numberOfTriangles = polys.GetNumberOfCells()
+    if polydata.GetNumberOfCells() != numberOfTriangles:
+      raise BranchingMedialMeshError("Mesh contains cells that are not triangles")
+    cells = vtk_to_numpy(polys.GetData()).reshape(-1, 4) if numberOfTriangles else np.zeros((0, 4), dtype=np.int64)
+    if cells.shape[0] != numberOfTriangles or np.any(cells[:, 0] != 3):
+      raise BranchingMedialMeshError("Mesh contains cells that are not triangles")
+    return cls(vtk_to_numpy(polydata.GetPoints().GetData()), cells[:, 1:])
+
+  @staticmethod
+  def isSupported(polydata):
+    try:
+      MedialInflation.fromPolyData(polydata)
+    except BranchingMedialMeshError:
+      return False
+    return True
+
+  def _buildTopology(self):
+    triangles = self.triangles
+    numberOfDuplicates = 2 * len(triangles)
+
+    # each triangle followed by its duplicate with opposite winding
+    tdup = np.empty((numberOfDuplicates, 3), dtype=np.int64)
+    tdup[0::2] = triangles
+    tdup[1::2] = triangles[:, ::-1]
+
+    # edge k of a triangle is opposite to its vertex k: one reference per (triangle, edge)
+    k = np.arange(3)
+    v1 = tdup[:, (k + 1) % 3].ravel()
+    v2 = tdup[:, (k + 2) % 3].ravel()
+    forward = v1 > v2
+    original = np.repeat(np.arange(numberOfDuplicates) // 2, 3)
+    edges = np.minimum(v1, v2) * (len(self.points) + 1) + np.maximum(v1, v2)
+    _, edgeIds, counts = np.unique(edges, return_inverse=True, return_counts=True)
+    edgeIds = edgeIds.ravel()
+    if np.any(counts > 4):
+      raise BranchingMedialMeshError(f"{np.count_nonzero(counts > 4)} edges are shared by more than two triangles")
+
+    # Sorted by (edge, winding, original triangle), the references of a free edge are [backward, forward] of the same
+    # triangle and the references of an interior edge are [backward A, backward B, forward A, forward B]. A reference
+    # is matched to the opposite winding of the other triangle (the one at the smallest angle in the CLI).
+    order = np.lexsort((original, forward, edgeIds))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    opposite = np.empty_like(order)
+    free = starts[counts == 2]
+    opposite[order[free]] = order[free + 1]
+    opposite[order[free + 1]] = order[free]
+    interior = starts[counts == 4]
+    for a, b in [(0, 3), (1, 2)]:
+      opposite[order[interior + a]] = order[interior + b]
+      opposite[order[interior + b]] = order[interior + a]
+
+    # corners of the two triangles that are stitched together are the same vertex
+    tri, edge = np.divmod(np.arange(3 * numberOfDuplicates), 3)
+    oppositeTri, oppositeEdge = np.divmod(opposite, 3)
+    cornerA = np.concatenate([tri * 3 + (edge + 1) % 3, tri * 3 + (edge + 2) % 3])
+    cornerB = np.concatenate([oppositeTri * 3 + (oppositeEdge + 2) % 3, oppositeTri * 3 + (oppositeEdge + 1) % 3])
+
+    # connected components of the corners, labeled by their smallest corner index
+    labels = np.arange(3 * numberOfDuplicates)
+    while True:
+      smallest = np.minimum(labels[cornerA], labels[cornerB])
+      updated = labels.copy()
+      np.minimum.at(updated, cornerA, smallest)
+      np.minimum.at(updated, cornerB, smallest)
+      updated = updated[updated]
+      if np.array_equal(updated, labels):
+        break
+      labels = updated
+
+    # vertices are numbered in order of their first corner, as the CLI does
+    _, vertexIds = np.unique(labels, return_inverse=True)
+    self.tdup = tdup
+    self.vertexIds = vertexIds.ravel()
+    self.outputTriangles = self.vertexIds.reshape(-1, 3)
+    self.numberOfOutputPoints = int(self.vertexIds.max()) + 1 if len(self.vertexIds) else 0
+    self.medialIndex = np.empty(self.numberOfOutputPoints, dtype=np.int64)
+    self.medialIndex[self.vertexIds] = tdup.ravel()
+    self.valence = np.bincount(self.vertexIds, minlength=self.numberOfOutputPoints)
+
+  def inflate(self, rad, points=None):
+    """ Returns the inflated vertex positions. points may replace the medial vertex positions of the same mesh. """
+    points = self.points if points is None else np.asarray(points, dtype=float)
+    corners = points[self.tdup]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    np.divide(normals, lengths[:, None], out=normals, where=lengths[:, None] > 0)
+
+    offsets = np.zeros((self.numberOfOutputPoints, 3))
+    np.add.at(offsets, self.vertexIds, np.repeat(normals, 3, axis=0))
+    return points[self.medialIndex] + rad * offsets / self.valence[:, None]
+
+  def inflatePolyData(self, rad, points=None):
+    """ Returns the inflated mesh as polydata with a 'MedialIndex' point array like the CLI output """
+    inflatedPoints = vtk.vtkPoints()
+    inflatedPoints.SetData(numpy_to_vtk(self.inflate(rad, points).astype(np.float32), deep=True))
+
+    cells = np.hstack([np.full((len(self.outputTriangles), 1), 3), self.outputTriangles]).ravel()
+    polys = vtk.vtkCellArray()
+    polys.SetCells(len(self.outputTriangles), numpy_to_vtkIdTypeArray(cells, deep=True))
+
+    medialIndexArray = numpy_to_vtk(self.medialIndex.astype(np.int32), deep=True, array_type=vtk.VTK_INT)
+    medialIndexArray.SetName("MedialIndex")
+
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(inflatedPoints)
+    polydata.SetPolys(polys)
+    polydata.GetPointData().AddArray(medialIndexArray)
+    return polydata
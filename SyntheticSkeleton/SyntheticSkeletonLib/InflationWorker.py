@@ -0,0 +1,252 @@
+""" Long-lived InflateMedialModel process that inflates meshes without temporary files.
+
+slicer.cli.run starts a process per inflation and exchanges the models through files written and read by MRML storage
+nodes, which dominates the inflation time of small templates. InflationWorker instead keeps one InflateMedialModel
+process running in its server mode (InflateMedialModel --server) and sends the medial vertices and triangles through
+its stdin, the inflated meshes are read back from its stdout (see runServer in InflateMedialModel.cxx for the format).
+
+The inflation is the one of the CLI: topology and vertices are computed by the same code, and the vertices are
+returned as the single precision values of the CLI output model. Coordinates are passed as they are (RAS), as the CLI
+reads its input model into RAS.
+
+Requests are queued and answered in order by a thread. If the process exits (crash, killed), it is restarted and the
+request is sent once more before it fails. The process is started with the first request and stopped by close().
+
+  worker = InflationWorker(findExecutable(slicer.modules.inflatemedialmodel.path))
+  future = worker.submit(polydata, [1.0, 2.0])
+  inflatedModels = future.result()  # a polydata per radius
+"""
+
+import logging
+import queue
+import subprocess
+import sys
+import threading
+from collections import deque
+from concurrent.futures import CancelledError, Future
+from pathlib import Path
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray, vtk_to_numpy
+
+from SyntheticSkeletonLib.Inflation import BranchingMedialMeshError
+
+
+EXECUTABLE_NAME = "InflateMedialModel"
+
+REQUEST = b"INFL"
+RESPONSE_DONE = b"DONE"
+RESPONSE_FAIL = b"FAIL"
+
+# the last lines of the diagnostic output are kept for error messages
+STDERR_LINES = 20
+
+
+class InflationWorkerError(RuntimeError):
+  pass
+
+
+class _ProcessExited(Exception):
+  pass
+
+
+def findExecutable(modulePath):
+  """ InflateMedialModel executable next to the module path of the CLI (the executable or its shared library) """
+  modulePath = Path(modulePath)
+  name = EXECUTABLE_NAME + (".exe" if sys.platform == "win32" else "")
+  for candidate in [modulePath, modulePath.parent / name]:
+    if candidate.name == name and candidate.is_file():
+      return str(candidate)
+  raise FileNotFoundError(f"{name} not found next to {modulePath}")
+
+
+def getTriangles(polydata):
+  """ Points (n x 3) and triangles (m x 3) of polydata. Raises BranchingMedialMeshError for cells that are not
+  triangles, like the CLI.
+  """
+  polys = polydata.GetPolys()
+  numberOfTriangles = polys.GetNumberOfCells()
+  cells = vtk_to_numpy(polys.GetData()).reshape(-1, 4) if numberOfTriangles else np.zeros((0, 4), dtype=np.int64)
+  if polydata.GetNumberOfCells() != numberOfTriangles or cells.shape[0] != numberOfTriangles or \
+      np.any(cells[:, 0] != 3):
+    raise BranchingMedialMeshError("Mesh contains cells that are not triangles")
+  points = vtk_to_numpy(polydata.GetPoints().GetData()) if polydata.GetPoints() else np.zeros((0, 3))
+  return points, cells[:, 1:]
+
+
+def createInflatedPolyData(points, triangles, medialIndex):
+  """ Inflated mesh with a 'MedialIndex' point array like the CLI output """
+  inflatedPoints = vtk.vtkPoints()
+  inflatedPoints.SetData(numpy_to_vtk(points, deep=True))
+
+  cells = np.hstack([np.full((len(triangles), 1), 3), triangles]).ravel()
+  polys = vtk.vtkCellArray()
+  polys.SetCells(len(triangles), numpy_to_vtkIdTypeArray(cells, deep=True))
+
+  medialIndexArray = numpy_to_vtk(medialIndex, deep=True, array_type=vtk.VTK_INT)
+  medialIndexArray.SetName("MedialIndex")
+
+  polydata = vtk.vtkPolyData()
+  polydata.SetPoints(inflatedPoints)
+  polydata.SetPolys(polys)
+  polydata.GetPointData().AddArray(medialIndexArray)
+  return polydata
+
+
+class InflationWorker(object):
+
+  def __init__(self, executable, maxAttempts=2):
+    self.executable = executable
+    self.maxAttempts = maxAttempts
+    self.numberOfStarts = 0
+    self._requests = queue.Queue()
+    self._lock = threading.Lock()
+    self._process = None
+    self._running = None  # future of the request that is being inflated
+    self._cancelRunning = False
+    self._stderr = deque(maxlen=STDERR_LINES)
+    self._thread = threading.Thread(target=self._run, name="InflationWorker", daemon=True)
+    self._thread.start()
+
+  def submit(self, polydata, radii):
+    """ Queues the inflation of the triangulated mesh polydata with every radius. Returns a future of the list of
+    inflated polydata (one per radius). Meshes are copied right away, so polydata may be modified afterwards.
+    """
+    points, triangles = getTriangles(polydata)
+    request = (np.ascontiguousarray(points, dtype="=f8"), np.ascontiguousarray(triangles, dtype="=i8"),
+               np.ascontiguousarray(radii, dtype="=f8").ravel())
+    future = Future()
+    self._requests.put((future, request))
+    return future
+
+  def cancel(self, future):
+    """ Cancels a queued request, or stops the process if it is inflating the request (it is restarted for the next
+    one). The future then raises CancelledError.
+    """
+    if future.cancel():
+      return
+    with self._lock:
+      if future is self._running:
+        self._cancelRunning = True
+        self._stopProcess()
+
+  def isRunning(self):
+    return self._process is not None and self._process.poll() is None
+
+  def close(self):
+    """ Cancels all queued requests and stops the process """
+    while True:
+      try:
+        future, _ = self._requests.get_nowait()
+      except queue.Empty:
+        break
+      future.cancel()
+    self._requests.put(None)
+    with self._lock:
+      if self._running is not None:
+        self._cancelRunning = True
+      self._stopProcess()
+    self._thread.join()
+
+  def _startProcess(self):
+    self._stderr.clear()
+    self._process = subprocess.Popen([self.executable, "--server"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE)
+    self.numberOfStarts += 1
+    threading.Thread(target=self._readDiagnostics, args=(self._process.stderr,), daemon=True).start()
+    logging.debug(f"Started inflation worker {self._process.pid}")
+
+  def _stopProcess(self):
+    process, self._process = self._process, None
+    if process is None:
+      return
+    # killed first, a pending read of the response then ends instead of blocking the close of its stream
+    if process.poll() is None:
+      process.kill()
+    process.wait()
+    for stream in [process.stdin, process.stdout]:
+      try:
+        stream.close()
+      except OSError:
+        pass
+
+  def _readDiagnostics(self, stream):
+    for line in stream:
+      self._stderr.append(line.decode(errors="replace").rstrip())
+    stream.close()
+
+  def _run(self):
+    while True:
+      item = self._requests.get()
+      if item is None:
+        return
+      future, request = item
+      if not future.set_running_or_notify_cancel():
+        continue
+      with self._lock:
+        self._running = future
+        self._cancelRunning = False
+      try:
+        result = self._inflate(request)
+      except BaseException as exc:
+        result = exc
+      with self._lock:
+        self._running = None
+        if self._cancelRunning:
+          result = CancelledError()
+      if isinstance(result, BaseException):
+        future.set_exception(result)
+      else:
+        future.set_result(result)
+
+  def _inflate(self, request):
+    for attempt in range(1, self.maxAttempts + 1):
+      with self._lock:
+        if self._cancelRunning:
+          raise CancelledError()
+        if not self.isRunning():
+          self._stopProcess()
+          self._startProcess()
+        process = self._process
+      try:
+        return self._exchange(process, request)
+      except (_ProcessExited, OSError, ValueError) as exc:
+        with self._lock:
+          if process is self._process:
+            self._stopProcess()
+          if self._cancelRunning:
+            raise CancelledError()
+        message = f"Inflation worker exited ({exc}): {' / '.join(self._stderr) or 'no output'}"
+        if attempt == self.maxAttempts:
+          raise InflationWorkerError(message)
+        logging.warning(f"{message}, restarting")
+
+  @staticmethod
+  def _readExactly(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+      raise _ProcessExited("response incomplete")
+    return data
+
+  def _exchange(self, process, request):
+    points, triangles, radii = request
+    header = np.array([len(points), len(triangles), len(radii)], dtype="=u8")
+    process.stdin.write(REQUEST + header.tobytes() + points.tobytes() + triangles.tobytes() + radii.tobytes())
+    process.stdin.flush()
+
+    stream = process.stdout
+    status = self._readExactly(stream, 4)
+    if status == RESPONSE_FAIL:
+      length = int(np.frombuffer(self._readExactly(stream, 8), dtype="=u8")[0])
+      raise InflationWorkerError(self._readExactly(stream, length).decode(errors="replace"))
+    if status != RESPONSE_DONE:
+      raise _ProcessExited(f"unexpected response {status!r}")
+    numberOfPoints, numberOfTriangles = np.frombuffer(self._readExactly(stream, 16), dtype="=u8").tolist()
+    outputTriangles = np.frombuffer(self._readExactly(stream, 24 * numberOfTriangles), dtype="=i8").reshape(-1, 3)
+    medialIndex = np.frombuffer(self._readExactly(stream, 4 * numberOfPoints), dtype="=i4")
+    models = []
+    for _ in radii:
+      inflatedPoints = np.frombuffer(self._readExactly(stream, 12 * numberOfPoints), dtype="=f4").reshape(-1, 3)
+      models.append(createInflatedPolyData(inflatedPoints, outputTriangles, medialIndex))
+    return models
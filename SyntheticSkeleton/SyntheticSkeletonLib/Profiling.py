@@ -0,0 +1,154 @@
+""" Opt-in timing instrumentation of hot paths.
+
+Functions decorated with @profiled record call count, wall time and allocated memory once profiling was enabled.
+While disabled, the decorator only adds a flag check to every call.
+
+  from SyntheticSkeletonLib import Profiling
+  Profiling.enable()
+  ...
+  Profiling.logStatistics()
+  Profiling.exportJSON("profile.json")
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque, OrderedDict
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class Operation:
+  name: str
+  start: float  # seconds since the epoch
+  seconds: float
+  bytes: int  # net allocation, 0 if allocations are not tracked
+  thread: str
+
+
+@dataclass
+class Statistic:
+  count: int = 0
+  seconds: float = 0.0
+  maxSeconds: float = 0.0
+  bytes: int = 0
+
+  @property
+  def meanSeconds(self):
+    return self.seconds / self.count if self.count else 0.0
+
+
+_enabled = False
+_trackAllocations = False
+_startedTracemalloc = False
+_lock = threading.Lock()
+_statistics = OrderedDict()
+_history = deque(maxlen=100)
+
+
+def enable(trackAllocations=True, historySize=100):
+  """ Starts recording. trackAllocations uses tracemalloc, which slows down Python allocations noticeably. """
+  global _enabled, _trackAllocations, _startedTracemalloc, _history
+  with _lock:
+    if historySize != _history.maxlen:
+      _history = deque(_history, maxlen=historySize)
+  if trackAllocations and not tracemalloc.is_tracing():
+    tracemalloc.start()
+    _startedTracemalloc = True
+  _trackAllocations = trackAllocations
+  _enabled = True
+
+
+def disable():
+  global _enabled, _trackAllocations, _startedTracemalloc
+  _enabled = False
+  _trackAllocations = False
+  if _startedTracemalloc:
+    tracemalloc.stop()
+    _startedTracemalloc = False
+
+
+def isEnabled():
+  return _enabled
+
+
+def reset():
+  with _lock:
+    _statistics.clear()
+    _history.clear()
+
+
+def record(name, start, seconds, allocated=0):
+  with _lock:
+    statistic = _statistics.setdefault(name, Statistic())
+    statistic.count += 1
+    statistic.seconds += seconds
+    statistic.maxSeconds = max(statistic.maxSeconds, seconds)
+    statistic.bytes += allocated
+    _history.append(Operation(name, start, seconds, allocated, threading.current_thread().name))
+
+
+def profiled(func=None, name=None):
+  """ Decorator recording every call of func under name (default: qualified function name) while enabled """
+  if func is None:
+    return functools.partial(profiled, name=name)
+  name = name or func.__qualname__
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    if not _enabled:
+      return func(*args, **kwargs)
+    trackAllocations = _trackAllocations and tracemalloc.is_tracing()
+    memoryBefore = tracemalloc.get_traced_memory()[0] if trackAllocations else 0
+    start = time.time()
+    counter = time.perf_counter()
+    try:
+      return func(*args, **kwargs)
+    finally:
+      seconds = time.perf_counter() - counter
+      allocated = tracemalloc.get_traced_memory()[0] - memoryBefore if trackAllocations else 0
+      record(name, start, seconds, allocated)
+  return wrapper
+
+
+def getStatistics():
+  """ Copy of the per operation statistics ordered by first call """
+  with _lock:
+    return OrderedDict((name, Statistic(**asdict(s))) for name, s in _statistics.items())
+
+
+def getRecentOperations(count=None):
+  """ The most recent operations, newest first """
+  with _lock:
+    operations = list(_history)
+  operations.reverse()
+  return operations[:count] if count else operations
+
+
+def toDict():
+  statistics = getStatistics()
+  return {
+    "statistics": {name: dict(asdict(s), meanSeconds=s.meanSeconds) for name, s in statistics.items()},
+    "recent": [asdict(o) for o in getRecentOperations()]
+  }
+
+
+def exportJSON(filePath):
+  with open(filePath, "w") as f:
+    json.dump(toDict(), f, indent=2)
+
+
+def formatStatistics():
+  lines = [f"{'Operation':<50} {'Calls':>8} {'Total [s]':>10} {'Mean [ms]':>10} {'Max [ms]':>10} {'Alloc [KiB]':>12}"]
+  for name, s in sorted(getStatistics().items(), key=lambda item: -item[1].seconds):
+    lines.append(f"{name:<50} {s.count:>8} {s.seconds:>10.3f} {s.meanSeconds * 1000:>10.2f} {s.maxSeconds * 1000:>10.2f} "
+                 f"{s.bytes / 1024:>12.1f}")
+  return "\n".join(lines)
+
+
+def logStatistics(level=logging.INFO):
+  """ Writes the statistics to the log (the Slicer log when running in Slicer) """
+  logging.log(level, "Profiling statistics:\n" + formatStatistics())
@@ -0,0 +1,127 @@
+""" Grid search over the SkeletonTool pruning parameters.
+
+The Voronoi diagram of the input surface is computed once into a cache directory. Every setting of the grid then runs
+SkeletonTool in prune-only mode from that cache, in parallel. Face/point counts and timings are reported per setting.
+
+  python -m SyntheticSkeletonLib.PruneSweep surface.vtk --outputDirectory sweep --xPrune 1.2 1.5 2.0 --nDegrees 2 3 \\
+    --skeletonTool "/path/to/Slicer --launch SkeletonTool" --workers 8
+"""
+
+import argparse
+import csv
+import itertools
+import logging
+import os
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from SyntheticSkeletonLib.Batch import getSkeletonToolArguments, runCLI, toCommand, STATUS_DONE, STATUS_FAILED
+
+
+SWEEP_PARAMETERS = ["nDegrees", "xPrune", "nComp", "nBins"]
+
+
+def getSettingName(setting):
+  return "_".join(f"{name}{setting[name]:g}" for name in SWEEP_PARAMETERS if name in setting)
+
+
+def createGrid(**values):
+  """ All combinations of the given parameter values, e.g. createGrid(xPrune=[1.2, 1.5], nDegrees=[2, 3]) """
+  names = [name for name in SWEEP_PARAMETERS if values.get(name)]
+  return [dict(zip(names, combination)) for combination in itertools.product(*[values[name] for name in names])]
+
+
+def runSetting(skeletonTool, surface, outputDirectory, cacheDirectory, setting, pruneOnly=True):
+  """ Runs SkeletonTool for one setting and returns its report record """
+  from SyntheticSkeletonLib.Engine import readPolyData
+
+  name = getSettingName(setting)
+  outputSkeleton = Path(outputDirectory) / f"skeleton_{name}.vtk"
+  arguments = ["--cacheDirectory", cacheDirectory] + (["--pruneOnly"] if pruneOnly else [])
+  record = dict(setting, setting=name, faces="", points="", seconds=0.0, status=STATUS_DONE, error="",
+                output=str(outputSkeleton))
+  start = time.perf_counter()
+  try:
+    runCLI(skeletonTool, arguments + getSkeletonToolArguments(setting, surface, outputSkeleton),
+           Path(outputDirectory) / f"skeleton_{name}.log")
+    record["seconds"] = time.perf_counter() - start
+    skeleton = readPolyData(outputSkeleton)
+    record["faces"] = skeleton.GetNumberOfCells()
+    record["points"] = skeleton.GetNumberOfPoints()
+  except Exception as exc:
+    logging.error(f"{name}: {exc}")
+    record.update(seconds=time.perf_counter() - start, status=STATUS_FAILED, error=str(exc))
+  return record
+
+
+def runSweep(skeletonTool, surface, outputDirectory, grid, cacheDirectory=None, workers=None):
+  """ Runs all settings of the grid and returns their records. The first setting computes the Voronoi diagram (unless
+  it is cached already), all others only prune.
+  """
+  outputDirectory = Path(outputDirectory)
+  outputDirectory.mkdir(parents=True, exist_ok=True)
+  cacheDirectory = str(cacheDirectory or outputDirectory / "VoronoiCache")
+  if not grid:
+    return []
+
+  records = [runSetting(skeletonTool, surface, outputDirectory, cacheDirectory, grid[0], pruneOnly=False)]
+  logging.info(f"{records[0]['setting']}: {records[0]['faces']} faces ({records[0]['seconds']:.1f}s, with Voronoi)")
+  if records[0]["status"] == STATUS_FAILED:
+    return records
+
+  # SkeletonTool runs in its own process, threads are enough to keep the workers busy
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    for record in executor.map(lambda s: runSetting(skeletonTool, surface, outputDirectory, cacheDirectory, s),
+                               grid[1:]):
+      logging.info(f"{record['setting']}: {record['faces']} faces ({record['seconds']:.1f}s)")
+      records.append(record)
+  return records
+
+
+def writeReport(records, reportPath):
+  parameters = [name for name in SWEEP_PARAMETERS if any(name in r for r in records)]
+  with open(reportPath, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=["setting"] + parameters +
+                                          ["faces", "points", "seconds", "status", "error", "output"],
+                            extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+      writer.writerow(dict(record, seconds=f"{record['seconds']:.3f}"))
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Evaluate a grid of SkeletonTool pruning settings from one Voronoi "
+                                               "diagram")
+  parser.add_argument("surface", help="input surface model")
+  parser.add_argument("--outputDirectory", required=True)
+  parser.add_argument("--skeletonTool", default="SkeletonTool", help="SkeletonTool executable or command")
+  parser.add_argument("--cacheDirectory", default=None, help="Voronoi cache (default: <outputDirectory>/VoronoiCache)")
+  parser.add_argument("--nDegrees", type=int, nargs="+", default=[3])
+  parser.add_argument("--xPrune", type=float, nargs="+", default=[1.2])
+  parser.add_argument("--nComp", type=int, nargs="+", default=None)
+  parser.add_argument("--nBins", type=int, nargs="+", default=None)
+  parser.add_argument("--workers", type=int, default=os.cpu_count())
+  parser.add_argument("--report", default=None, help="report (default: <outputDirectory>/pruneSweep.csv)")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+  skeletonTool = toCommand(shlex.split(args.skeletonTool))
+  if len(skeletonTool) == 1:
+    skeletonTool = toCommand(skeletonTool[0])
+  grid = createGrid(nDegrees=args.nDegrees, xPrune=args.xPrune, nComp=args.nComp, nBins=args.nBins)
+  records = runSweep(skeletonTool, str(Path(args.surface).resolve()), args.outputDirectory, grid,
+                     args.cacheDirectory, args.workers)
+
+  reportPath = args.report or str(Path(args.outputDirectory) / "pruneSweep.csv")
+  writeReport(records, reportPath)
+  logging.info(f"Report written to {reportPath}")
+  return 1 if any(r["status"] == STATUS_FAILED for r in records) else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,170 @@
+""" Recording of template editing sessions for replay.
+
+While a recording is active, every logic operation decorated with @recorded is appended to a JSON lines file with its
+arguments, its duration and the error it raised (if any). The first line holds the state at the start of the
+recording: the Affix file with skeleton and template, the markups and triangle label nodes and the mapping of control
+points to template points. Nodes referenced by an operation are described (name, attributes, colour) whenever that
+description changed since it was last written.
+
+Testing/Python/ReplaySession.py drives SyntheticSkeletonLogic headless through a recorded session and reports the
+latency of every operation type.
+"""
+
+import functools
+import json
+import logging
+import time
+from pathlib import Path
+
+
+SESSION_FORMAT = "SyntheticSkeletonSession"
+SESSION_VERSION = 1
+
+# node attributes the logic depends on
+NODE_ATTRIBUTES = ["ModuleName", "Type", "TypeIndex", "AnatomicalIndex", "Color", "SubjectID"]
+
+OP_NODE = "node"
+OP_END = "end"
+
+
+def getNodeDescription(node, controlPoints=False):
+  """ JSON serializable description of a markups or triangle label node """
+  description = {
+    "id": node.GetID(),
+    "class": node.GetClassName(),
+    "name": node.GetName(),
+    "attributes": {name: node.GetAttribute(name) for name in NODE_ATTRIBUTES if node.GetAttribute(name) is not None}
+  }
+  if node.IsA("vtkMRMLMarkupsNode"):
+    displayNode = node.GetDisplayNode()
+    if displayNode is not None:
+      description["color"] = list(displayNode.GetSelectedColor())
+    if controlPoints:
+      description["controlPoints"] = [list(node.GetNthControlPointPosition(i))
+                                      for i in range(node.GetNumberOfControlPoints())]
+  return description
+
+
+class SessionRecorder(object):
+
+  def __init__(self, filePath):
+    self.filePath = Path(filePath)
+    self._file = None
+    self._start = None
+    self._nodes = {}  # node ID -> last written description
+    self._depth = 0
+
+  def start(self, header):
+    self._file = open(self.filePath, "w")
+    self._start = time.perf_counter()
+    for description in header.get("nodes", []):
+      self._nodes[description["id"]] = {k: v for k, v in description.items() if k != "controlPoints"}
+    self._writeLine(dict(header, format=SESSION_FORMAT, version=SESSION_VERSION,
+                         started=time.strftime("%Y-%m-%dT%H:%M:%S")))
+
+  def stop(self, **summary):
+    self.write(OP_END, summary)
+    self._file.close()
+    self._file = None
+
+  def describeNode(self, node):
+    """ Writes the description of node if it changed and returns its ID """
+    if node is None:
+      return None
+    description = getNodeDescription(node)
+    if self._nodes.get(description["id"]) != description:
+      self._nodes[description["id"]] = description
+      self.write(OP_NODE, description)
+    return description["id"]
+
+  def write(self, op, args, seconds=None, error=None):
+    record = {"t": round(time.perf_counter() - self._start, 6), "op": op, "args": args}
+    if seconds is not None:
+      record["seconds"] = seconds
+    if error is not None:
+      record["error"] = error
+    self._writeLine(record)
+
+  def _writeLine(self, record):
+    self._file.write(json.dumps(record) + "\n")
+    self._file.flush()
+
+
+_recorder = None
+
+
+def start(filePath, header):
+  """ Starts recording into filePath. header describes the state at the start (see module documentation). """
+  global _recorder
+  if _recorder is not None:
+    stop()
+  recorder = SessionRecorder(filePath)
+  recorder.start(header)
+  _recorder = recorder
+  logging.info(f"Recording session to {filePath}")
+  return recorder
+
+
+def stop(**summary):
+  """ Stops recording. summary (e.g. a hash of the resulting template) is written as last record. """
+  global _recorder
+  recorder, _recorder = _recorder, None
+  if recorder is not None:
+    recorder.stop(**summary)
+    logging.info(f"Session recorded to {recorder.filePath}")
+
+
+def isRecording():
+  return _recorder is not None
+
+
+def recorded(encode):
+  """ Decorator recording every call while a recording is active. encode(recorder, *args, **kwargs) is called before
+  the function with the same arguments and returns the JSON serializable arguments to write. Calls made from within a
+  recorded call are not recorded themselves.
+  """
+  def decorator(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      recorder = _recorder
+      if recorder is None or recorder._depth > 0:
+        return func(*args, **kwargs)
+      arguments = encode(recorder, *args, **kwargs)
+      error = None
+      recorder._depth += 1
+      start = time.perf_counter()
+      try:
+        return func(*args, **kwargs)
+      except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+      finally:
+        seconds = time.perf_counter() - start
+        recorder._depth -= 1
+        recorder.write(name, arguments, seconds, error)
+    return wrapper
+  return decorator
+
+
+def encodeControlPoint(recorder, node, pointIdx):
+  return {"node": recorder.describeNode(node), "point": int(pointIdx),
+          "position": [float(c) for c in node.GetNthControlPointPosition(pointIdx)]}
+
+
+def encodePosition(position):
+  return [float(c) for c in position]
+
+
+def readSession(filePath):
+  """ Returns header, operation records and end record (None if the recording was not stopped) of a session file """
+  with open(filePath) as f:
+    lines = [json.loads(line) for line in f if line.strip()]
+  if not lines or lines[0].get("format") != SESSION_FORMAT:
+    raise ValueError(f"{filePath} is not a recorded session")
+  if lines[0]["version"] > SESSION_VERSION:
+    raise ValueError(f"Session version {lines[0]['version']} is not supported")
+  header, records = lines[0], lines[1:]
+  end = records.pop() if records and records[-1]["op"] == OP_END else None
+  return header, records, end
@@ -0,0 +1,224 @@
+""" Workspaces of several subjects (input skeletons) that are kept open at the same time.
+
+A SubjectWorkspace holds everything that belongs to one subject: skeleton, template, mapping of control points to
+template points, undo history, index of the tag points by skeleton vertex, point locator, skeleton normals and
+subdivision previews. Switching subjects thus only
+switches the active workspace.
+
+Locator, normals and previews are derived from skeleton and template and are built on first use. SubjectSession keeps
+the memory they use within a budget by evicting them from the least recently active subjects first (the active one is
+never evicted): previews are dropped, the locator is dropped and rebuilt when needed, and normals are written to a
+cache directory and read back when needed. Skeletons belong to the scene and are reported, but not evicted.
+"""
+
+import logging
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import vtk_to_numpy
+
+from SyntheticSkeletonLib.Core.Constants import SUBDIVISION_CACHE_MAX_MEMORY_KIB
+from SyntheticSkeletonLib.Core.History import EditHistory
+from SyntheticSkeletonLib.Core.Model import CustomInformation
+from SyntheticSkeletonLib.Core.TagIndex import VertexTagIndex
+from SyntheticSkeletonLib.Engine import createPointLocator, SubdivisionCache
+from SyntheticSkeletonLib.Profiling import profiled
+
+
+PREVIEW = "preview"
+LOCATOR = "locator"
+NORMALS = "normals"
+SKELETON = "skeleton"
+
+# cheapest to rebuild first
+EVICTION_ORDER = [PREVIEW, LOCATOR, NORMALS]
+
+# vtkKdTreePointLocator keeps a point id and the point per skeleton vertex, there is no API for its actual size
+LOCATOR_BYTES_PER_POINT = 32
+
+
+class SubjectWorkspace(object):
+
+  def __init__(self, subjectID, skeleton=None, name=""):
+    self.subjectID = subjectID
+    self.name = name
+    self.skeleton = skeleton
+    self.data = CustomInformation(skeleton)
+    self.pointArray = dict()
+    self.history = EditHistory(self.data)
+    self.tagIndex = VertexTagIndex(self.data)
+    self.subdivisionCache = SubdivisionCache(SUBDIVISION_CACHE_MAX_MEMORY_KIB)
+    self.proxyNodeID = ""
+    self._locator = (None, None)  # ((skeleton, MTime), locator)
+    self._normals = (None, None)  # ((skeleton, MTime), array)
+    self._normalsFile = (None, None)  # ((skeleton, MTime), file path)
+
+  def setData(self, data: CustomInformation):
+    """ Replaces the template, which clears the undo history """
+    self.data = data
+    self.history.attach(data)
+    self.tagIndex.attach(data)
+
+  def setSkeleton(self, skeleton):
+    if skeleton is not self.skeleton:
+      self.skeleton = skeleton
+      self.subdivisionCache.clear()
+
+  def _getStamp(self):
+    return None if self.skeleton is None else (self.skeleton, self.skeleton.GetMTime())
+
+  def getLocator(self):
+    stamp = self._getStamp()
+    if stamp is None:
+      return None
+    if self._locator[0] != stamp:
+      self._locator = (stamp, createPointLocator(self.skeleton))
+    return self._locator[1]
+
+  @profiled
+  def getNormals(self):
+    """ Point normals of the skeleton (vtkPolyDataNormals) as numpy array, or None if the skeleton has no polygons """
+    stamp = self._getStamp()
+    if stamp is None:
+      return None
+    if self._normals[0] != stamp:
+      stored, filePath = self._normalsFile
+      if stored == stamp:
+        self._normals = (stamp, np.load(filePath))
+      else:
+        normalGenerator = vtk.vtkPolyDataNormals()
+        normalGenerator.SetInputData(self.skeleton)
+        normalGenerator.Update()
+        normals = normalGenerator.GetOutput().GetPointData().GetArray("Normals")
+        self._normals = (stamp, None if normals is None else vtk_to_numpy(normals).copy())
+    return self._normals[1]
+
+  def getMemorySizes(self):
+    """ Resident memory in KiB by structure """
+    sizes = OrderedDict()
+    sizes[SKELETON] = self.skeleton.GetActualMemorySize() if self.skeleton is not None else 0
+    sizes[LOCATOR] = self.skeleton.GetNumberOfPoints() * LOCATOR_BYTES_PER_POINT // 1024 \
+      if self._locator[1] is not None else 0
+    sizes[NORMALS] = self._normals[1].nbytes // 1024 if self._normals[1] is not None else 0
+    sizes[PREVIEW] = self.subdivisionCache.getMemorySize()
+    return sizes
+
+  def getEvictableMemorySize(self):
+    sizes = self.getMemorySizes()
+    return sum(sizes[name] for name in EVICTION_ORDER)
+
+  def evict(self, name, cacheDirectory=None):
+    """ Drops the structure name. Normals are written to cacheDirectory (if given) to be read back when needed. """
+    if name == PREVIEW:
+      self.subdivisionCache.clear()
+    elif name == LOCATOR:
+      self._locator = (None, None)
+    elif name == NORMALS:
+      stamp, normals = self._normals
+      if normals is None:
+        return
+      if self._normalsFile[0] != stamp and cacheDirectory is not None:
+        filePath = Path(cacheDirectory) / f"{self.subjectID}Normals.npy"
+        np.save(filePath, normals)
+        self._normalsFile = (stamp, filePath)
+      self._normals = (None, None)
+    logging.debug(f"Evicted {name} of {self.name or self.subjectID}")
+
+  def release(self):
+    """ Drops all derived structures including the normals written to the cache directory """
+    self.subdivisionCache.clear()
+    self._locator = (None, None)
+    self._normals = (None, None)
+    _, filePath = self._normalsFile
+    if filePath is not None:
+      Path(filePath).unlink(missing_ok=True)
+    self._normalsFile = (None, None)
+
+
+class SubjectSession(object):
+  """ Open subject workspaces by subject ID (the ID of the input model node), least recently active first """
+
+  def __init__(self, memoryBudgetKiB, cacheDirectory=None):
+    self.memoryBudgetKiB = memoryBudgetKiB
+    self._cacheDirectory = cacheDirectory
+    self._temporaryDirectory = None
+    self._workspaces = OrderedDict()
+    self.active = None
+
+  def __contains__(self, subjectID):
+    return subjectID in self._workspaces
+
+  def __iter__(self):
+    return iter(list(self._workspaces.values()))
+
+  def __len__(self):
+    return len(self._workspaces)
+
+  def get(self, subjectID):
+    return self._workspaces.get(subjectID)
+
+  def getCacheDirectory(self):
+    if self._cacheDirectory is None:
+      self._temporaryDirectory = tempfile.mkdtemp(prefix="SyntheticSkeletonSession")
+      self._cacheDirectory = self._temporaryDirectory
+    return self._cacheDirectory
+
+  def activate(self, subjectID, skeleton=None, name=""):
+    """ Makes the workspace of subjectID the active one, opening it with skeleton if it is not open yet """
+    workspace = self._workspaces.get(subjectID)
+    if workspace is None:
+      workspace = SubjectWorkspace(subjectID, skeleton, name)
+      self._workspaces[subjectID] = workspace
+    self._workspaces.move_to_end(subjectID)
+    self.active = workspace
+    self.enforceBudget()
+    return workspace
+
+  def close(self, subjectID):
+    workspace = self._workspaces.pop(subjectID, None)
+    if workspace is not None:
+      workspace.release()
+      if workspace is self.active:
+        self.active = None
+
+  def closeAll(self):
+    for workspace in self._workspaces.values():
+      workspace.release()
+    self._workspaces.clear()
+    self.active = None
+    if self._temporaryDirectory is not None:
+      shutil.rmtree(self._temporaryDirectory, ignore_errors=True)
+      self._temporaryDirectory = self._cacheDirectory = None
+
+  def getEvictableMemorySize(self):
+    return sum(workspace.getEvictableMemorySize() for workspace in self._workspaces.values())
+
+  def enforceBudget(self):
+    """ Evicts previews, locators and normals (in this order) of inactive subjects, least recently active first,
+    until locators, normals and previews of all subjects fit into the memory budget
+    """
+    for name in EVICTION_ORDER:
+      for workspace in list(self._workspaces.values()):
+        if self.getEvictableMemorySize() <= self.memoryBudgetKiB:
+          return
+        if workspace is not self.active and workspace.getMemorySizes()[name] > 0:
+          workspace.evict(name, self.getCacheDirectory())
+
+  def getMemoryReport(self):
+    """ Resident memory in KiB by structure per subject ID, most recently active last """
+    return OrderedDict((workspace.subjectID, workspace.getMemorySizes()) for workspace in self._workspaces.values())
+
+  def logMemoryReport(self):
+    names = [SKELETON] + EVICTION_ORDER
+    lines = [f"  {'Subject':<28} " + " ".join(f"{name + ' [KiB]':>16}" for name in names)]
+    for workspace in self._workspaces.values():
+      sizes = workspace.getMemorySizes()
+      active = "*" if workspace is self.active else " "
+      lines.append(f"{active} {workspace.name or str(workspace.subjectID):<28} " +
+                   " ".join(f"{sizes[name]:>16}" for name in names))
+    lines.append(f"Locators, normals and previews: {self.getEvictableMemorySize()} of {self.memoryBudgetKiB} KiB")
+    logging.info("\n".join(lines))
@@ -0,0 +1,246 @@
+""" Quality assurance statistics of a cohort of templates.
+
+Affix files are read through a fast path that converts their template arrays directly into numpy arrays (no
+CustomInformation is created) and all metrics are computed on these arrays:
+
+  triangleArea        triangle areas per triangle label (count is the number of triangles, sum the label area)
+  edgeLength          lengths of the template edges
+  radius              radii of the tagged points per tag type
+  freeEdgeLoopLength  lengths of the loops formed by free edges (edges of a single triangle)
+
+Like the template mesh, triangles are placed at the tag points they reference. The positions stored with the triangles
+are those at the time the triangle was created and are ignored.
+
+Files are processed in parallel by a process pool. The result is one tidy table with a row per subject, metric and
+group (triangle label, tag type or "all") holding count, sum, mean, standard deviation, minimum, quartiles and maximum.
+It is written as CSV or, if the output file ends with .npz, as numpy archive with one array per column.
+
+  python -m SyntheticSkeletonLib.Statistics subject01Affix.vtk subject02Affix.vtk --output cohort.csv --workers 8
+  python -m SyntheticSkeletonLib.Statistics --manifest manifest.json --output cohort.npz
+
+Subjects of a manifest (see Batch.py) without "affix" are ignored.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from vtk.util.numpy_support import vtk_to_numpy
+
+from SyntheticSkeletonLib.Core.Constants import TAG_TYPES
+
+
+COLUMNS = ["subject", "metric", "group", "count", "sum", "mean", "std", "min", "q1", "median", "q3", "max"]
+
+GROUP_ALL = "all"
+
+# columns of the template arrays in the field data of Affix files (see Core/Writer.py)
+TAG_INFO_COLUMNS = 5  # tagType, tagIndex, r, g, b
+TAG_POINT_COLUMNS = 7  # x, y, z, radius, seq, typeIndex, comboBoxIndex
+TRIANGLE_COLUMNS = 16  # (x, y, z, id, seq) per vertex, label index
+TRIANGLE_IDS = [3, 8, 13]
+TRIANGLE_LABEL = 15
+
+
+def readTemplateArrays(filePath):
+  """ Template arrays of an Affix file: tagInfo, tagPoints and triangles as float arrays with one row per item, and
+  the names of the triangle labels
+  """
+  from SyntheticSkeletonLib.Engine import readPolyData
+
+  fielddata = readPolyData(filePath).GetFieldData()
+
+  def rows(name, columns):
+    array = fielddata.GetArray(name)
+    if not array:
+      return np.zeros((0, columns))
+    values = vtk_to_numpy(array).astype(np.float64)
+    return values[:len(values) // columns * columns].reshape(-1, columns)
+
+  names = fielddata.GetAbstractArray("LabelTriangleName")
+  return {
+    "tagInfo": rows("TagInfo", TAG_INFO_COLUMNS),
+    "tagPoints": rows("TagPoints", TAG_POINT_COLUMNS),
+    "triangles": rows("TagTriangles", TRIANGLE_COLUMNS),
+    "labelNames": [names.GetValue(i) for i in range(names.GetNumberOfValues())] if names else []
+  }
+
+
+def summarize(values):
+  """ Summary of the finite values (e.g. without the areas of triangles referencing a missing point) """
+  values = np.asarray(values, dtype=np.float64)
+  values = values[np.isfinite(values)]
+  if len(values) == 0:
+    return dict({name: np.nan for name in COLUMNS[4:]}, count=0, sum=0.0)
+  q1, median, q3 = np.percentile(values, [25, 50, 75])
+  return {"count": len(values), "sum": values.sum(), "mean": values.mean(), "std": values.std(), "min": values.min(),
+          "q1": q1, "median": median, "q3": q3, "max": values.max()}
+
+
+def getTrianglePositions(triangles, tagPoints):
+  """ Positions of the tag points referenced by the triangles (n x 3 x 3), NaN for invalid point indices """
+  ids = triangles[:, TRIANGLE_IDS].astype(np.int64)
+  valid = (ids >= 0) & (ids < len(tagPoints))
+  positions = np.full(ids.shape + (3,), np.nan)
+  positions[valid] = tagPoints[ids[valid], :3]
+  return positions
+
+
+def getTriangleAreas(triangles, tagPoints):
+  positions = getTrianglePositions(triangles, tagPoints)
+  p1, p2, p3 = positions[:, 0], positions[:, 1], positions[:, 2]
+  return 0.5 * np.linalg.norm(np.cross(p2 - p1, p3 - p1), axis=1)
+
+
+def getEdges(triangles, tagPoints):
+  """ Point index pairs (ascending), lengths and number of triangles of all template edges """
+  ids = triangles[:, TRIANGLE_IDS].astype(np.int64)
+  positions = getTrianglePositions(triangles, tagPoints)
+  corners = np.array([[0, 1], [1, 2], [2, 0]])
+  pairs = np.sort(ids[:, corners].reshape(-1, 2), axis=1)
+  lengths = np.linalg.norm(positions[:, corners[:, 0]] - positions[:, corners[:, 1]], axis=2).ravel()
+  pairs, first, counts = np.unique(pairs, axis=0, return_index=True, return_counts=True)
+  return pairs, lengths[first], counts
+
+
+def getLoopLengths(pairs, lengths):
+  """ Total length of every connected component of the given edges """
+  if len(pairs) == 0:
+    return np.zeros(0)
+  _, ends = np.unique(pairs, return_inverse=True)
+  ends = ends.reshape(-1, 2)
+  # propagate the smallest point label along the edges until every component has a single label
+  labels = np.arange(ends.max() + 1)
+  while True:
+    merged = np.minimum(labels[ends[:, 0]], labels[ends[:, 1]])
+    propagated = labels.copy()
+    np.minimum.at(propagated, ends[:, 0], merged)
+    np.minimum.at(propagated, ends[:, 1], merged)
+    propagated = propagated[propagated]
+    if np.array_equal(propagated, labels):
+      break
+    labels = propagated
+  _, loops = np.unique(labels[ends[:, 0]], return_inverse=True)
+  return np.bincount(loops.ravel(), weights=lengths)
+
+
+def getTagTypeName(tagType):
+  if 0 < tagType < len(TAG_TYPES):
+    return TAG_TYPES[tagType]
+  return "Unassigned" if tagType == 0 else f"Type {tagType}"
+
+
+def computeStatistics(arrays):
+  """ Rows of all metrics (without subject) of the template arrays returned by readTemplateArrays """
+  records = []
+
+  def add(metric, group, values):
+    records.append(dict(summarize(values), metric=metric, group=group))
+
+  triangles, tagPoints, tagInfo = arrays["triangles"], arrays["tagPoints"], arrays["tagInfo"]
+  areas = getTriangleAreas(triangles, tagPoints)
+  labels = triangles[:, TRIANGLE_LABEL].astype(np.int64)
+  labelNames = arrays["labelNames"]
+  add("triangleArea", GROUP_ALL, areas)
+  for label in np.unique(labels).tolist():
+    group = labelNames[label] if 0 <= label < len(labelNames) else f"Label {label}"
+    add("triangleArea", group, areas[labels == label])
+
+  pairs, lengths, counts = getEdges(triangles, tagPoints)
+  add("edgeLength", GROUP_ALL, lengths)
+  free = counts == 1
+  add("freeEdgeLoopLength", GROUP_ALL, getLoopLengths(pairs[free], lengths[free]))
+
+  radii = tagPoints[:, 3]
+  tagIndices = tagPoints[:, 6].astype(np.int64)
+  valid = (tagIndices >= 0) & (tagIndices < len(tagInfo))
+  tagTypes = np.full(len(tagPoints), -1, dtype=np.int64)
+  tagTypes[valid] = tagInfo[tagIndices[valid], 0].astype(np.int64)
+  add("radius", GROUP_ALL, radii)
+  for tagType in np.unique(tagTypes).tolist():
+    add("radius", getTagTypeName(tagType), radii[tagTypes == tagType])
+  return records
+
+
+def processFile(subjectID, filePath, logLevel=logging.INFO):
+  """ Statistics rows of one Affix file. Executed in a worker process. """
+  logging.basicConfig(level=logLevel)
+  return [dict(record, subject=subjectID) for record in computeStatistics(readTemplateArrays(filePath))]
+
+
+def getSubjectID(filePath):
+  stem = Path(filePath).stem
+  return stem[:-len("Affix")] if stem.endswith("Affix") and stem != "Affix" else stem
+
+
+def runStatistics(files, workers=None, logLevel=logging.INFO):
+  """ Computes the statistics of files (subject ID -> Affix file) in parallel. Returns the rows sorted by subject and
+  the IDs of the subjects that failed.
+  """
+  records = []
+  failed = []
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = {executor.submit(processFile, subjectID, str(filePath), logLevel): subjectID
+               for subjectID, filePath in files.items()}
+    for future in as_completed(futures):
+      try:
+        records.extend(future.result())
+      except Exception as exc:
+        logging.error(f"{futures[future]}: {exc}")
+        failed.append(futures[future])
+  subjects = list(files)
+  records.sort(key=lambda r: subjects.index(r["subject"]))
+  return records, failed
+
+
+def writeTable(records, outputPath):
+  """ Writes the rows as CSV, or as one array per column if outputPath ends with .npz """
+  if str(outputPath).endswith(".npz"):
+    np.savez_compressed(outputPath, **{column: np.array([r[column] for r in records]) for column in COLUMNS})
+    return
+  with open(outputPath, "w", newline="") as f:
+    writer = csv.DictWriter(f, fieldnames=COLUMNS)
+    writer.writeheader()
+    for record in records:
+      writer.writerow({column: f"{value:.6g}" if isinstance(value, float) else value
+                       for column, value in record.items()})
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Compute quality assurance statistics of a cohort of Affix templates")
+  parser.add_argument("affix", nargs="*", help="Affix files (subject ID: file name without 'Affix.vtk')")
+  parser.add_argument("--manifest", default=None, help="Batch manifest whose Affix files are added")
+  parser.add_argument("--output", required=True, help="tidy table (.csv or .npz)")
+  parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of files processed in parallel")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logLevel = logging.DEBUG if args.verbose else logging.INFO
+  logging.basicConfig(level=logLevel)
+
+  files = dict()
+  if args.manifest:
+    from SyntheticSkeletonLib.Batch import readManifest
+    files.update((subject["id"], subject["affix"]) for subject in readManifest(args.manifest)["subjects"]
+                 if subject.get("affix"))
+  for filePath in args.affix:
+    subjectID = getSubjectID(filePath)
+    if subjectID in files:
+      parser.error(f"Duplicate subject id '{subjectID}'")
+    files[subjectID] = filePath
+  if not files:
+    parser.error("No Affix files given")
+
+  records, failed = runStatistics(files, args.workers, logLevel)
+  writeTable(records, args.output)
+  logging.info(f"Statistics of {len(files) - len(failed)} of {len(files)} subjects written to {args.output}")
+  return 1 if failed else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -1,7 +1,8 @@
-import numpy as np
 import logging
 from functools import wraps
-import slicer
+
+# moved to SyntheticSkeletonLib.Core.Geometry, imported for compatibility
+from SyntheticSkeletonLib.Core.Geometry import pairNumber, planeFit, getBasePointToLineAngle, getSortedPointIndices
 
 
 def whenDoneCall(functionToCall):
@@ -20,72 +21,18 @@ def whenDoneCall(functionToCall):
   return decorator
 
 
-def pairNumber(a: int, b: int) -> int:
-  """ Cantor pairing function """
-  a1 = min(a, b)
-  b1 = max(a, b)
-  return int((a1 + b1) * (a1 + b1 + 1) / 2.0 + b1)
-
-
-# source: http://stackoverflow.com/questions/12299540/plane-fitting-to-4-or-more-xyz-points
-def planeFit(points):
-  """
-  p, n = planeFit(points)
-
-  Given an array, points, of shape (d,...)
-  representing points in d-dimensional space,
-  fit an d-dimensional plane to the points.
-  Return a point, p, on the plane (the point-cloud centroid),
-  and the normal, n.
-  """
-  from numpy.linalg import svd
-  points = np.reshape(points, (np.shape(points)[0], -1)) # Collapse trialing dimensions
-  assert points.shape[0] <= points.shape[1], "There are only {} points in {} dimensions.".format(points.shape[1],
-                                                                                                 points.shape[0])
-  ctr = points.mean(axis=1)
-  x = points - ctr[:,np.newaxis]
-  M = np.dot(x, x.T) # Could also use np.cov(x) here.
-  return ctr, svd(M)[0][:,-1]
-
-
-def getBasePointToLineAngle(planeNormal, basePoint, lineOrigin, lineTip):
-  import numpy as np
-  def getUnitVector(lineOrigin, lineTip):
-    vector = lineTip - lineOrigin
-    return vector / np.linalg.norm(vector)
-  planeNormal = planeNormal / np.linalg.norm(planeNormal)
-  v1 = getUnitVector(lineOrigin, lineTip)
-  v2 = getUnitVector(lineOrigin, basePoint)
-  dot = np.dot(v1, v2)
-  det = np.dot(planeNormal, np.cross(v1, v2))
-  angle_deg = np.rad2deg(np.arctan2(det, dot))
-  angle_deg = np.abs(angle_deg) if angle_deg < 0 else 360.0 - angle_deg
-  return angle_deg
-
-
-def getSortedPointIndices(rawPointsArray):
-  import numpy as np
-  planePosition, planeNormal = planeFit(rawPointsArray.T)
-  base = rawPointsArray[0]
-  angles = []
-  for pos in rawPointsArray:
-    angles.append(getBasePointToLineAngle(planeNormal, base, planePosition, pos))
-  return list(np.argsort(angles))
-
-
 def reload(packageName, submoduleNames):
-  import imp
-  f, filename, description = imp.find_module(packageName)
-  package = imp.load_module(packageName, f, filename, description)
+  """ Reloads the package and then its submodules in the given order. Modules of subpackages are given by their
+  dotted name relative to the package (e.g. 'Core.Model').
+  """
+  import importlib
+  importlib.reload(importlib.import_module(packageName))
   for submoduleName in submoduleNames:
-    f, filename, description = imp.find_module(submoduleName, package.__path__)
-    try:
-      imp.load_module(packageName + '.' + submoduleName, f, filename, description)
-    finally:
-      f.close()
+    importlib.reload(importlib.import_module(packageName + '.' + submoduleName))
 
 
 def getOrCreateModelNode(name):
+  import slicer
   try:
     node = slicer.util.getNode(name)
   except slicer.util.MRMLNodeNotFoundException:
@@ -94,9 +41,23 @@ def getOrCreateModelNode(name):
 
 
 def deleteNode(name):
+  import slicer
   try:
     node = slicer.util.getNode(name)
     if node:
       slicer.mrmlScene.RemoveNode(node)
   except slicer.util.MRMLNodeNotFoundException:
-    pass
\ No newline at end of file
+    pass
+
+
+def writeModelFile(polydata, filePath):
+  """ Writes polydata the same way slicer.util.saveNode writes a model node, without adding nodes to the scene.
+  Can be called from a worker thread as long as polydata is not modified concurrently.
+  """
+  import slicer
+  modelNode = slicer.vtkMRMLModelNode()
+  modelNode.SetAndObservePolyData(polydata)
+  storageNode = slicer.vtkMRMLModelStorageNode()
+  storageNode.SetFileName(str(filePath))
+  if not storageNode.WriteData(modelNode):
+    raise IOError(f"Failed to write model file {filePath}")
@@ -0,0 +1,128 @@
+""" Compares two result sets of SyntheticSkeletonBenchmark.py and fails on performance regressions.
+
+Benchmarks are matched by name and case. A benchmark regressed if its median time grew by more than the threshold
+(relative to the baseline) and the growth is larger than the noise of both runs, i.e. more than noiseFactor times the
+larger of both interquartile ranges. Differences below minDifference seconds are never reported as regressions, which
+keeps sub-millisecond benchmarks from failing on timer jitter.
+
+  python CompareBenchmarks.py baseline.json current.json --threshold 0.1
+
+Exits with 1 if at least one benchmark regressed, 0 otherwise.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+
+STATUS_REGRESSED = "regressed"
+STATUS_IMPROVED = "improved"
+STATUS_UNCHANGED = "unchanged"
+STATUS_MISSING = "missing"
+STATUS_SKIPPED = "skipped"
+
+
+@dataclass
+class Comparison:
+  name: str
+  case: str
+  status: str
+  baselineMedian: float = float("nan")
+  baselineIQR: float = float("nan")
+  currentMedian: float = float("nan")
+  currentIQR: float = float("nan")
+
+  @property
+  def change(self):
+    """ Relative change of the median, positive if slower """
+    return self.currentMedian / self.baselineMedian - 1.0 if self.baselineMedian > 0 else float("nan")
+
+
+def loadResults(filePath):
+  """ Returns the benchmarks of a result file by (name, case) """
+  with open(filePath) as f:
+    results = json.load(f)
+  return {(b["name"], b["case"]): b for b in results["benchmarks"]}
+
+
+def getMedianAndIQR(samples):
+  q25, median, q75 = np.percentile(samples, [25, 50, 75])
+  return float(median), float(q75 - q25)
+
+
+def compareBenchmark(name, case, baseline, current, threshold, noiseFactor=1.0, minDifference=0.0):
+  if current is None:
+    return Comparison(name, case, STATUS_MISSING)
+  if baseline.get("skipped") or current.get("skipped") or not baseline["samples"] or not current["samples"]:
+    return Comparison(name, case, STATUS_SKIPPED)
+
+  comparison = Comparison(name, case, STATUS_UNCHANGED, *getMedianAndIQR(baseline["samples"]),
+                          *getMedianAndIQR(current["samples"]))
+  difference = comparison.currentMedian - comparison.baselineMedian
+  noise = noiseFactor * max(comparison.baselineIQR, comparison.currentIQR)
+  if abs(difference) > max(noise, minDifference) and abs(comparison.change) > threshold:
+    comparison.status = STATUS_REGRESSED if difference > 0 else STATUS_IMPROVED
+  return comparison
+
+
+def compareResults(baselineResults, currentResults, threshold, noiseFactor=1.0, minDifference=0.0, names=None):
+  """ Comparisons of all baseline benchmarks (optionally only the given names) in baseline order """
+  comparisons = []
+  for (name, case), baseline in baselineResults.items():
+    if names and name not in names:
+      continue
+    comparisons.append(compareBenchmark(name, case, baseline, currentResults.get((name, case)), threshold,
+                                        noiseFactor, minDifference))
+  return comparisons
+
+
+def formatComparisons(comparisons):
+  lines = [f"{'Benchmark':<30} {'Case':<28} {'Baseline [ms]':>16} {'Current [ms]':>16} {'Change':>8}  Status"]
+  for c in comparisons:
+    if c.status in (STATUS_MISSING, STATUS_SKIPPED):
+      lines.append(f"{c.name:<30} {c.case:<28} {'':>16} {'':>16} {'':>8}  {c.status}")
+      continue
+    baseline = f"{c.baselineMedian * 1000:.2f} ±{c.baselineIQR * 1000:.2f}"
+    current = f"{c.currentMedian * 1000:.2f} ±{c.currentIQR * 1000:.2f}"
+    lines.append(f"{c.name:<30} {c.case:<28} {baseline:>16} {current:>16} {c.change:>+8.1%}  {c.status}")
+  return "\n".join(lines)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Compare SyntheticSkeleton benchmark results against a baseline")
+  parser.add_argument("baseline", help="baseline results (JSON)")
+  parser.add_argument("current", help="current results (JSON)")
+  parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative slowdown of the median")
+  parser.add_argument("--noiseFactor", type=float, default=1.0,
+                      help="slowdowns within this factor of the larger interquartile range are considered noise")
+  parser.add_argument("--minDifference", type=float, default=0.0005,
+                      help="slowdowns below this many seconds are considered noise")
+  parser.add_argument("--benchmarks", nargs="+", default=None, help="only compare benchmarks with these names")
+  parser.add_argument("--failOnMissing", action="store_true", help="fail if a baseline benchmark was not run")
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+  comparisons = compareResults(loadResults(args.baseline), loadResults(args.current), args.threshold,
+                               args.noiseFactor, args.minDifference, args.benchmarks)
+  logging.info(formatComparisons(comparisons))
+
+  for c in comparisons:
+    if c.status == STATUS_MISSING:
+      logging.warning(f"{c.name} [{c.case}] is missing in {args.current}")
+
+  regressed = [c for c in comparisons if c.status == STATUS_REGRESSED]
+  missing = [c for c in comparisons if c.status == STATUS_MISSING] if args.failOnMissing else []
+  if regressed:
+    logging.error(f"{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}")
+  if missing:
+    logging.error(f"{len(missing)} benchmark(s) of the baseline were not run")
+  return 1 if regressed or missing else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,105 @@
+""" Checks that SyntheticSkeletonLib.Core imports and works without Qt and Slicer.
+
+Every check runs in a fresh interpreter in which importing qt, slicer, ctk or PythonQt fails, so that modules already
+loaded by the test runner (e.g. when run by the Slicer launcher) cannot hide a dependency:
+
+  python -m unittest CoreImportTest
+"""
+
+import subprocess
+import sys
+import textwrap
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+BLOCKED_MODULES = ["qt", "slicer", "ctk", "PythonQt"]
+
+PRELUDE = f"""
+import importlib.abc
+import sys
+
+class BlockingFinder(importlib.abc.MetaPathFinder):
+  def find_spec(self, name, path=None, target=None):
+    if name.split(".")[0] in {BLOCKED_MODULES!r}:
+      raise ImportError(f"{{name}} is blocked")
+    return None
+
+for name in list(sys.modules):
+  if name.split(".")[0] in {BLOCKED_MODULES!r}:
+    del sys.modules[name]
+sys.meta_path.insert(0, BlockingFinder())
+sys.path.insert(0, {str(MODULE_DIR)!r})
+"""
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+class CoreImportTest(unittest.TestCase):
+
+  def runIsolated(self, code):
+    result = subprocess.run([sys.executable, "-c", PRELUDE + textwrap.dedent(code)], capture_output=True, text=True)
+    self.assertEqual(result.returncode, 0, msg=result.stderr)
+    return result.stdout
+
+  def test_ModelImportsStandardLibraryOnly(self):
+    self.runIsolated("""
+      from SyntheticSkeletonLib.Core import Colors, Constants, Model
+      loaded = [name for name in ["numpy", "vtk", "qt", "slicer"] if name in sys.modules]
+      assert not loaded, f"importing the data model loaded {loaded}"
+    """)
+
+  @unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+  def test_CoreImportsWithoutQtAndSlicer(self):
+    self.runIsolated("""
+      import SyntheticSkeletonLib.Core.Geometry
+      import SyntheticSkeletonLib.Core.Writer
+      import SyntheticSkeletonLib.CustomData, SyntheticSkeletonLib.Constants, SyntheticSkeletonLib.Utils
+      loaded = [name for name in ["qt", "slicer"] if name in sys.modules]
+      assert not loaded, f"importing the core loaded {loaded}"
+    """)
+
+  def test_DefaultsAreResolvedLazily(self):
+    self.runIsolated("""
+      import tempfile
+      from SyntheticSkeletonLib.Core.Constants import PARAM_DEFAULTS, PARAM_OUTPUT_DIRECTORY
+      assert PARAM_DEFAULTS[PARAM_OUTPUT_DIRECTORY] == tempfile.gettempdir()
+      PARAM_DEFAULTS[PARAM_OUTPUT_DIRECTORY] = lambda: "/output"
+      assert dict(PARAM_DEFAULTS.items())[PARAM_OUTPUT_DIRECTORY] == "/output"
+    """)
+
+  def test_ColorCodec(self):
+    from SyntheticSkeletonLib.Core.Colors import colorNameToRGB, rgbToColorName, normalizeColorName
+    self.assertEqual(colorNameToRGB("#ff8000"), (255, 128, 0))
+    self.assertEqual(colorNameToRGB("#f80"), (255, 136, 0))
+    self.assertEqual(colorNameToRGB("#80ff8000"), (255, 128, 0))
+    self.assertEqual(rgbToColorName(255.0, 128.0, 300), "#ff80ff")
+    self.assertEqual(normalizeColorName("#FF8000"), "#ff8000")
+    self.assertEqual(normalizeColorName("", "#ff0000"), "#ff0000")
+
+  @unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+  def test_WriteAndReadTemplate(self):
+    self.runIsolated("""
+      import vtk
+      from SyntheticSkeletonLib.Core.Model import CustomInformation, LabelTriangle
+      from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+
+      source = vtk.vtkSphereSource()
+      source.Update()
+      data = CustomInformation(source.GetOutput())
+      data.appendLabelInfo(LabelTriangle(labelName="Sheet", labelColor="#ff8000"))
+      read = CustomInformation(CustomInformationWriter(data).writeCustomData(data.polydata))
+      read.readCustomData()
+      assert read.vectorLabelInfo == data.vectorLabelInfo, read.vectorLabelInfo
+      assert "qt" not in sys.modules and "slicer" not in sys.modules
+    """)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,130 @@
+""" Runs the headless engine entry point (python -m SyntheticSkeletonLib.Engine) on a generated skeleton and template,
+without Slicer:
+
+  python -m unittest EngineTest
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+GRID_SIZE = 3  # template points per side
+SKELETON_RESOLUTION = 10
+SKELETON_LENGTH = 40.0
+
+
+def createSkeleton():
+  """ Triangulated square sheet with a 'Radius' point array """
+  import vtk
+  plane = vtk.vtkPlaneSource()
+  plane.SetOrigin(0, 0, 0)
+  plane.SetPoint1(SKELETON_LENGTH, 0, 0)
+  plane.SetPoint2(0, SKELETON_LENGTH, 0)
+  plane.SetResolution(SKELETON_RESOLUTION, SKELETON_RESOLUTION)
+  triangulate = vtk.vtkTriangleFilter()
+  triangulate.SetInputConnection(plane.GetOutputPort())
+  triangulate.Update()
+  skeleton = vtk.vtkPolyData()
+  skeleton.DeepCopy(triangulate.GetOutput())
+
+  radius = vtk.vtkFloatArray()
+  radius.SetName("Radius")
+  for i in range(skeleton.GetNumberOfPoints()):
+    radius.InsertNextValue(1.0 + skeleton.GetPoint(i)[0] / SKELETON_LENGTH)
+  skeleton.GetPointData().AddArray(radius)
+  return skeleton
+
+
+def createTemplate(skeleton):
+  """ Manifold (GRID_SIZE x GRID_SIZE) template of edge and interior points placed next to skeleton vertices """
+  from SyntheticSkeletonLib.Core.Model import CustomInformation, Color, LabelTriangle, Point, TagInfo, TagPoint, \
+    TagTriangle
+
+  data = CustomInformation(skeleton)
+  data.appendTagInfo(TagInfo(tagName="Edge", tagType=2, tagColor=Color(0, 255, 255), tagIndex=1))
+  data.appendTagInfo(TagInfo(tagName="Interior", tagType=3, tagColor=Color(255, 0, 255), tagIndex=2))
+  data.appendLabelInfo(LabelTriangle(labelName="Sheet", labelColor="#ff8000"))
+
+  step = SKELETON_LENGTH / (GRID_SIZE - 1)
+  for j in range(GRID_SIZE):
+    for i in range(GRID_SIZE):
+      interior = 0 < i < GRID_SIZE - 1 and 0 < j < GRID_SIZE - 1
+      # off the skeleton vertex, the engine snaps it
+      data.appendPoint(TagPoint(pos=Point(i * step + 0.3, j * step - 0.3, 0.5), radius=1.0,
+                                typeIndex=2 if interior else 1, comboBoxIndex=1 if interior else 0, seq=-1))
+
+  points = data.vectorTagPoints
+  for j in range(GRID_SIZE - 1):
+    for i in range(GRID_SIZE - 1):
+      a, b = j * GRID_SIZE + i, j * GRID_SIZE + i + 1
+      c, d = a + GRID_SIZE, b + GRID_SIZE
+      for id1, id2, id3 in [(a, b, d), (a, d, c)]:
+        data.appendTriangle(TagTriangle(points[id1].pos, points[id2].pos, points[id3].pos, id1, id2, id3,
+                                        -1, -1, -1, index=0))
+  return data
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class EngineTest(unittest.TestCase):
+
+  def test_MainWritesTemplateOutputs(self):
+    from SyntheticSkeletonLib.Core.Model import CustomInformation
+    from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+    from SyntheticSkeletonLib.Engine import main, readPolyData, writePolyData
+
+    with tempfile.TemporaryDirectory() as directory:
+      directory = Path(directory)
+      skeleton = createSkeleton()
+      writePolyData(skeleton, directory / "sheet.vtk")
+      CustomInformationWriter(createTemplate(skeleton)).writeCustomDataToFile(str(directory / "sheetAffix.vtk"))
+
+      output = io.StringIO()
+      with contextlib.redirect_stdout(output):
+        returnCode = main(["--skeleton", str(directory / "sheet.vtk"), "--affix", str(directory / "sheetAffix.vtk"),
+                           "--outputDirectory", str(directory / "output"), "--modelName", "template",
+                           "--subdivisionLevel", "1"])
+      self.assertEqual(returnCode, 0)
+
+      meshFile = directory / "output" / "template.vtk"
+      affixFile = directory / "output" / "sheetAffix.vtk"
+      cmrepFile = directory / "output" / "template.cmrep"
+      subdividedFile = directory / "output" / "sheet_Subdivide.vtk"
+      writtenFiles = output.getvalue().split()
+      # triangulated mesh first
+      self.assertEqual(writtenFiles[0], str(meshFile))
+      self.assertEqual(sorted(writtenFiles[1:]), sorted(map(str, [affixFile, cmrepFile, subdividedFile])))
+
+      mesh = readPolyData(meshFile)
+      self.assertEqual(mesh.GetNumberOfPoints(), GRID_SIZE * GRID_SIZE)
+      self.assertEqual(mesh.GetNumberOfPolys(), 2 * (GRID_SIZE - 1) ** 2)
+      # snapped onto the skeleton sheet
+      self.assertEqual(mesh.GetBounds()[4:], (0.0, 0.0))
+
+      affix = CustomInformation(readPolyData(affixFile))
+      affix.readCustomData()
+      self.assertEqual(len(affix.vectorTagPoints), GRID_SIZE * GRID_SIZE)
+      self.assertTrue(all(point.seq >= 0 for point in affix.vectorTagPoints))
+
+      cmrep = cmrepFile.read_text().splitlines()
+      self.assertIn("Grid.Model.Coefficient.FileName = template.vtk", cmrep)
+      self.assertIn("Grid.Model.Atom.SubdivisionLevel = 1", cmrep)
+
+      subdivided = readPolyData(subdividedFile)
+      self.assertEqual(subdivided.GetNumberOfPolys(), 4 * mesh.GetNumberOfPolys())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,75 @@
+""" Tests of the undo and redo of template edits (Core/History.py):
+
+  python -m unittest HistoryTest
+"""
+
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+from SyntheticSkeletonLib.Core.History import EditHistory, mergeChanges
+from SyntheticSkeletonLib.Core.Model import CustomInformation, Change, Point, TagEdge, TagPoint, TAG_POINTS
+
+
+def createPoint(x, y=0, z=0):
+  return TagPoint(pos=Point(x, y, z), radius=1.0, typeIndex=1, comboBoxIndex=0, seq=x)
+
+
+class EditHistoryTest(unittest.TestCase):
+
+  def setUp(self):
+    self.data = CustomInformation()
+    self.history = EditHistory(self.data)
+    for i in range(3):
+      self.data.appendPoint(createPoint(i))
+
+  def test_UndoAndRedo(self):
+    data, history = self.data, self.history
+    initial = data.snapshot()
+
+    history.beginGroup()
+    for x in range(10):
+      data.setPoint(1, replace(data.vectorTagPoints[1], pos=Point(x, 1, 1)))
+    history.endGroup()
+    with data.edit():
+      data.setEdge(5, TagEdge(ptId1=1, ptId2=2, constrain=2, numEdge=1, seq=-1))
+      data.removePoint(0)
+    edited = data.snapshot()
+
+    # the dragged point is restored in one step
+    self.assertTrue(history.undo())
+    self.assertTrue(history.undo())
+    self.assertEqual(list(data.vectorTagPoints), list(initial.vectorTagPoints))
+    self.assertEqual(len(data.vectorTagEdges), 0)
+    while history.canRedo():
+      history.redo()
+    self.assertEqual(list(data.vectorTagPoints), list(edited.vectorTagPoints))
+    self.assertEqual(dict(data.vectorTagEdges.items()), dict(edited.vectorTagEdges.items()))
+
+  def test_NewEditClearsRedo(self):
+    self.data.removePoint(0)
+    self.history.undo()
+    self.assertTrue(self.history.canRedo())
+    self.data.appendPoint(createPoint(5))
+    self.assertFalse(self.history.canRedo())
+    self.assertEqual(self.history.redo(), [])
+
+  def test_ReplacingVectorClearsHistory(self):
+    self.data.assign(vectorTagPoints=[])
+    self.assertFalse(self.history.canUndo())
+    self.assertFalse(self.history.canRedo())
+    self.assertEqual(self.history.undo(), [])
+
+  def test_MergeChanges(self):
+    a, b, c = createPoint(0), createPoint(1), createPoint(2)
+    changes = mergeChanges([Change(TAG_POINTS, 0, a, b), Change(TAG_POINTS, 0, b, c), Change(TAG_POINTS, 1, a, a)])
+    self.assertEqual(changes, [Change(TAG_POINTS, 0, a, c)])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,85 @@
+""" Tests of the long-lived InflateMedialModel server process (InflationWorker.py). Requires the built CLI, whose path
+is given by the InflateMedialModel_EXECUTABLE environment variable (set by CTest):
+
+  InflateMedialModel_EXECUTABLE=/path/to/InflateMedialModel python -m unittest InflationWorkerTest
+"""
+
+import os
+import sys
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+EXECUTABLE = os.environ.get("InflateMedialModel_EXECUTABLE", "")
+
+RADII = [1.0, 2.0]
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+def createMedialMesh(resolution=4):
+  import vtk
+  plane = vtk.vtkPlaneSource()
+  plane.SetResolution(resolution, resolution)
+  triangulate = vtk.vtkTriangleFilter()
+  triangulate.SetInputConnection(plane.GetOutputPort())
+  triangulate.Update()
+  return triangulate.GetOutput()
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+@unittest.skipUnless(os.path.isfile(EXECUTABLE), "InflateMedialModel_EXECUTABLE is not set to the built CLI")
+class InflationWorkerTest(unittest.TestCase):
+
+  def setUp(self):
+    from SyntheticSkeletonLib.InflationWorker import InflationWorker
+
+    self.worker = InflationWorker(EXECUTABLE)
+    self.addCleanup(self.worker.close)
+    self.mesh = createMedialMesh()
+
+  def inflate(self):
+    models = self.worker.submit(self.mesh, RADII).result(timeout=60)
+    self.assertEqual(len(models), len(RADII))
+    for model in models:
+      self.assertGreater(model.GetNumberOfPoints(), 0)
+      self.assertEqual(model.GetPointData().GetArray("MedialIndex").GetNumberOfTuples(), model.GetNumberOfPoints())
+    return models
+
+  def test_RestartsKilledProcess(self):
+    first = self.inflate()
+    self.inflate()
+    self.assertEqual(self.worker.numberOfStarts, 1)
+    self.assertTrue(self.worker.isRunning())
+
+    process = self.worker._process
+    process.kill()
+    process.wait()
+    self.assertFalse(self.worker.isRunning())
+
+    models = self.inflate()
+    self.assertEqual(self.worker.numberOfStarts, 2)
+    self.assertTrue(self.worker.isRunning())
+    self.assertEqual([model.GetNumberOfPoints() for model in models], [model.GetNumberOfPoints() for model in first])
+
+  def test_CloseCancelsQueuedRequests(self):
+    from concurrent.futures import CancelledError
+
+    futures = [self.worker.submit(self.mesh, RADII) for _ in range(20)]
+    self.worker.close()
+    self.assertFalse(self.worker.isRunning())
+    for future in futures:
+      try:
+        self.assertEqual(len(future.result(timeout=60)), len(RADII))
+      except CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,62 @@
+""" Tests of the edit journal and crash recovery (Core/Journal.py):
+
+  python -m unittest JournalTest
+"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class JournalTest(unittest.TestCase):
+
+  def setUp(self):
+    import vtk
+    from SyntheticSkeletonLib.Core.Model import CustomInformation, Color, TagInfo
+
+    source = vtk.vtkSphereSource()
+    source.Update()
+    self.data = CustomInformation(source.GetOutput())
+    self.data.appendTagInfo(TagInfo(tagName="Edge", tagType=2, tagColor=Color(255, 0, 0), tagIndex=1))
+    self.directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.directory)
+
+  def test_RecoverIgnoresIncompleteEdit(self):
+    from SyntheticSkeletonLib.Core.Journal import JournalWriter, getGenerations, recover
+    from SyntheticSkeletonLib.Core.Model import LabelTriangle, Point, TagPoint
+
+    data = self.data
+    journal = JournalWriter(self.directory, data, compactionChanges=5)
+    for i in range(7):
+      data.appendPoint(TagPoint(pos=Point(i, 0, 0), radius=1.0, typeIndex=2, comboBoxIndex=0, seq=i))
+    data.removePoint(3)
+    data.appendLabelInfo(LabelTriangle(labelName="Sheet", labelColor="#ff8000"))
+    journal.flush()
+    journal.close()
+
+    self.assertIsNone(journal.error)
+    self.assertEqual(len(getGenerations(self.directory)), 1)
+    with open(f"{self.directory}/journal{getGenerations(self.directory)[-1]:06d}.jsonl", "a") as f:
+      f.write('{"changes": [["vectorTagPoints", 0, null')  # edit cut off by a crash
+    with self.assertLogs(level="WARNING"):
+      recovered = recover(self.directory, data.getSkeletonHash())
+    # ints of the edits and floats read from the checkpoint hash the same
+    self.assertEqual(recovered.getTemplateHash(), data.getTemplateHash())
+    self.assertEqual([point.pos.x for point in recovered.vectorTagPoints], [0, 1, 2, 4, 5, 6])
+    self.assertIsNone(recover(self.directory, "another skeleton"))
+
+
+if __name__ == "__main__":
+  unittest.main()
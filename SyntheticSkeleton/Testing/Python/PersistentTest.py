@@ -0,0 +1,119 @@
+""" Tests of the persistent template vectors (Core/Persistent.py) and of template snapshots:
+
+  python -m unittest PersistentTest
+"""
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+from SyntheticSkeletonLib.Core.Model import CustomInformation, Point, TagEdge, TagPoint
+from SyntheticSkeletonLib.Core.Persistent import CHUNK_SIZE, PersistentList, PersistentMap
+
+
+def createPoint(x):
+  return TagPoint(pos=Point(x, 0, 0), radius=1.0, typeIndex=1, comboBoxIndex=0, seq=x)
+
+
+class PersistentListTest(unittest.TestCase):
+
+  def test_SetAppendAndRemove(self):
+    items = PersistentList(range(3))
+    self.assertEqual(items.setItem(1, "a"), [0, "a", 2])
+    self.assertEqual(items.setItem(-1, "a"), [0, 1, "a"])
+    self.assertEqual(items.appendItem(3), [0, 1, 2, 3])
+    self.assertEqual(items.insertItem(0, -1), [-1, 0, 1, 2])
+    self.assertEqual(items.removeItem(1), [0, 2])
+    self.assertEqual(items.removeItem(0).removeItem(0).removeItem(0), [])
+    self.assertEqual(items, [0, 1, 2])
+    with self.assertRaises(IndexError):
+      items.setItem(3, "a")
+    with self.assertRaises(IndexError):
+      items.insertItem(4, "a")
+
+  def test_MatchesListAcrossChunks(self):
+    rng = random.Random(0)
+    expected = list(range(3 * CHUNK_SIZE))
+    items = PersistentList(expected)
+    versions = [(items, list(expected))]
+    for step in range(2000):
+      operation = rng.random()
+      if operation < 0.4 or not expected:
+        index = rng.randint(0, len(expected))
+        expected.insert(index, step)
+        items = items.insertItem(index, step)
+      elif operation < 0.7:
+        index = rng.randrange(len(expected))
+        expected[index] = step
+        items = items.setItem(index, step)
+      else:
+        index = rng.randrange(len(expected))
+        del expected[index]
+        items = items.removeItem(index)
+      if step % 100 == 0:
+        versions.append((items, list(expected)))
+    self.assertEqual(list(items), expected)
+    self.assertEqual(list(reversed(items)), expected[::-1])
+    self.assertEqual([items[i] for i in range(-len(expected), len(expected))], expected + expected)
+    # earlier versions are unchanged
+    for version, versionItems in versions:
+      self.assertEqual(version, versionItems)
+
+
+class PersistentMapTest(unittest.TestCase):
+
+  def test_SetAndRemove(self):
+    rng = random.Random(0)
+    expected = dict()
+    items = PersistentMap()
+    versions = []
+    for step in range(1000):
+      key = rng.randrange(300)
+      if key in expected and rng.random() < 0.4:
+        del expected[key]
+        items = items.removeItem(key)
+      else:
+        expected[key] = step
+        items = items.setItem(key, step)
+      if step % 100 == 0:
+        versions.append((items, dict(expected)))
+    self.assertEqual(dict(items.items()), expected)
+    self.assertEqual(len(items), len(expected))
+    self.assertTrue(all(key in items for key in expected))
+    for version, versionItems in versions:
+      self.assertEqual(dict(version.items()), versionItems)
+    with self.assertRaises(KeyError):
+      items.removeItem(-1)
+
+
+class SnapshotTest(unittest.TestCase):
+
+  def test_SnapshotIsUnchangedByEdits(self):
+    data = CustomInformation()
+    for x in range(2 * CHUNK_SIZE):
+      data.appendPoint(createPoint(x))
+    data.setEdge(5, TagEdge(ptId1=0, ptId2=1, constrain=1, numEdge=1, seq=-1))
+    snapshot = data.snapshot()
+    points = list(data.vectorTagPoints)
+
+    data.setPoint(3, createPoint(-3))
+    data.removePoint(0)
+    data.appendPoint(createPoint(-1))
+    data.setEdge(5, TagEdge(ptId1=0, ptId2=2, constrain=2, numEdge=1, seq=-1))
+    data.setEdge(7, TagEdge(ptId1=1, ptId2=2, constrain=2, numEdge=1, seq=-1))
+
+    self.assertEqual(list(snapshot.vectorTagPoints), points)
+    self.assertEqual(dict(snapshot.vectorTagEdges.items()),
+                     {5: TagEdge(ptId1=0, ptId2=1, constrain=1, numEdge=1, seq=-1)})
+    self.assertNotEqual(snapshot.version, data.version)
+    self.assertEqual(data.vectorTagPoints[2], createPoint(-3))
+    self.assertEqual(len(data.vectorTagEdges), 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,67 @@
+""" Tests of the incrementally maintained per-triangle mesh quality (Core/Quality.py):
+
+  python -m unittest QualityTest
+"""
+
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+@unittest.skipUnless(hasModule("numpy"), "requires numpy")
+class MeshQualityTest(unittest.TestCase):
+
+  def setUp(self):
+    from SyntheticSkeletonLib.Core.Model import CustomInformation, Point, TagPoint, TagTriangle
+    from SyntheticSkeletonLib.Core.Quality import MeshQuality
+
+    # unit square of two triangles
+    self.data = data = CustomInformation()
+    self.quality = MeshQuality(data)
+    for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]:
+      data.appendPoint(TagPoint(pos=Point(x, y, 0), radius=1.0, typeIndex=1, comboBoxIndex=0, seq=0))
+    for ids in [(0, 1, 2), (0, 2, 3)]:
+      p1, p2, p3 = (data.vectorTagPoints[i].pos for i in ids)
+      data.appendTriangle(TagTriangle(p1, p2, p3, *ids, 0, 0, 0, index=0))
+
+  def test_Metrics(self):
+    self.assertEqual(list(self.quality.getArray("Area")), [0.5, 0.5])
+    self.assertAlmostEqual(self.quality.getArray("MinimumAngle")[0], 45.0)
+    self.assertAlmostEqual(self.quality.getArray("AspectRatio")[0], (1.0 + 2.0 ** 0.5) / 2.0)
+    self.assertEqual(list(self.quality.getArray("Dihedral")), [0.0, 0.0])
+
+  def test_EditsUpdateMetrics(self):
+    from SyntheticSkeletonLib.Core.Model import Point
+
+    data, quality = self.data, self.quality
+    data.setTriangle(1, replace(data.vectorTagTriangles[1], id2=3, id3=2))
+    self.assertEqual(list(quality.getArray("Dihedral")), [180.0, 180.0])
+    data.setPoint(3, replace(data.vectorTagPoints[3], pos=Point(0, 2, 0)))
+    self.assertEqual(list(quality.getArray("Area")), [0.5, 1.0])
+    self.assertEqual(quality.getSummary()["Dihedral"]["poor"], 2)
+
+  def test_RemovedTriangle(self):
+    self.data.removeTriangle(0)
+    self.assertEqual(list(self.quality.getArray("Area")), [0.5])
+    self.assertEqual(list(self.quality.getArray("Dihedral")), [0.0])
+
+  def test_DegenerateTriangle(self):
+    from SyntheticSkeletonLib.Core.Model import Point
+
+    self.data.setPoint(3, replace(self.data.vectorTagPoints[3], pos=Point(2, 2, 0)))
+    self.assertEqual(self.quality.getArray("Area")[1], 0.0)
+    self.assertEqual(self.quality.getSummary()["Area"]["poor"], 1)
+
+
+if __name__ == "__main__":
+  unittest.main()
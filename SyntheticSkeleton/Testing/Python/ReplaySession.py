@@ -0,0 +1,243 @@
+""" Headless replay of recorded editing sessions (see SyntheticSkeletonLib/Recording.py).
+
+SyntheticSkeletonLogic is driven through the recorded operations with stand-ins for the MRML nodes. The template is
+restored from the Affix file of the recording, control points are moved as recorded before every operation, and only
+the logic call itself is timed. Latency percentiles are reported per operation type and can be written in the result
+format of SyntheticSkeletonBenchmark.py (one benchmark per operation type) for CompareBenchmarks.py:
+
+  python ReplaySession.py session.jsonl --repeat 5 --output sessionLatency.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import SlicerStandIns
+if not SlicerStandIns.install(force=True):
+  raise RuntimeError("Sessions can only be replayed with the Slicer stand-ins")
+
+import slicer
+
+from SyntheticSkeletonLib.Core.Constants import PARAM_INPUT_MODEL
+from SyntheticSkeletonLib.Core.Model import CustomInformation
+from SyntheticSkeletonLib.Engine import readPolyData
+from SyntheticSkeletonLib.Recording import readSession, OP_NODE
+from SyntheticSkeleton import SyntheticSkeletonLogic
+
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+class SessionReplay(object):
+  """ Logic and stand-in nodes in the state at the start of a recorded session """
+
+  def __init__(self, sessionFile):
+    self.sessionFile = Path(sessionFile)
+    self.header, self.records, self.end = readSession(sessionFile)
+
+  def setUp(self):
+    scene = slicer.mrmlScene
+    scene.Clear()
+    for description in self.header["nodes"]:
+      node = self._createNode(description)
+      for position in description.get("controlPoints", []):
+        node.AddControlPoint(position)
+
+    self.logic = SyntheticSkeletonLogic()
+    for name, value in self.header.get("parameters", {}).items():
+      self.logic.parameterNode.SetParameter(name, value)
+
+    affix = readPolyData(self.sessionFile.with_name(self.header["affix"]))
+    skeleton = scene.AddNode(SlicerStandIns.StandInModelNode("Skeleton"))
+    skeleton.SetAndObservePolyData(affix)
+    # the template is restored from the recording instead of through the inputModel setter
+    self.logic.parameterNode.SetNodeReferenceID(PARAM_INPUT_MODEL, skeleton.GetID())
+    self.logic.configurePointLocator(skeleton)
+
+    data = CustomInformation(affix)
+    data.readCustomData()
+    for tagIdx, (ti, nodeID) in enumerate(zip(data.vectorTagInfo, self.header["tagInfoNodeIDs"])):
+      data.setTagInfo(tagIdx, replace(ti, mrmlNodeID=nodeID))
+    for lblIdx, (tl, nodeID) in enumerate(zip(data.vectorLabelInfo, self.header["labelInfoNodeIDs"])):
+      data.setLabelInfo(lblIdx, replace(tl, mrmlNodeID=nodeID))
+    self.logic.data = data
+    self.logic._outputMesh.data = data
+    self.logic.pointArray = {(mnId, pIdx): globPIdx for mnId, pIdx, globPIdx in self.header["pointArray"]}
+    self.logic.setOutputModel(scene.AddNode(SlicerStandIns.StandInModelNode("Output")))
+
+  def _createNode(self, description):
+    node = slicer.mrmlScene.nodeClasses[description["class"]](description["name"])
+    node.id = description["id"]
+    node.CreateDefaultDisplayNodes()
+    self._updateNode(node, description)
+    return slicer.mrmlScene.AddNode(node)
+
+  @staticmethod
+  def _updateNode(node, description):
+    node.SetName(description["name"])
+    node.attributes.clear()
+    for name, value in description["attributes"].items():
+      node.SetAttribute(name, value)
+    if "color" in description:
+      node.GetDisplayNode().SetSelectedColor(description["color"])
+
+  def getNode(self, nodeID):
+    return slicer.mrmlScene.GetNodeByID(nodeID)
+
+  def _moveControlPoint(self, args, active=True):
+    node = self.getNode(args["node"])
+    node.SetNthControlPointPosition(args["point"], args["position"])
+    if active:
+      node.GetDisplayNode().SetActiveControlPoint(args["point"])
+    return node
+
+  def prepare(self, op, args):
+    """ Brings the stand-in nodes into the state the operation saw and returns the call to time (None for records
+    that only update the nodes)
+    """
+    logic = self.logic
+    if op == OP_NODE:
+      node = self.getNode(args["id"])
+      if node is None:
+        self._createNode(args)
+        return None
+      self._updateNode(node, args)
+      if node.IsA("vtkMRMLMarkupsNode"):
+        return lambda: logic.onMarkupsNodeModified(node, None)
+      return lambda: logic.onTriangleModified(node, None)
+    if op == "onPointLabelAdded":
+      return lambda: logic.onPointLabelAdded(self.getNode(args["node"]))
+    if op == "onTriangleLabelAdded":
+      return lambda: logic.onTriangleLabelAdded(self.getNode(args["node"]))
+    if op == "onPointAdded":
+      node = self.getNode(args["node"])
+      node.AddControlPoint(args["position"])
+      return lambda: logic.onPointAdded(node, node.PointPositionDefinedEvent)
+    if op == "onPointModified":
+      node = self._moveControlPoint(args)
+      return lambda: logic.onPointModified(node, node.PointModifiedEvent, args["point"])
+    if op == "onPointInteractionEnded":
+      node = self._moveControlPoint(args)
+      return lambda: logic.onPointInteractionEnded(node, node.PointEndInteractionEvent)
+    if op == "onPointRemoved":
+      node = self.getNode(args["node"])
+
+      def removePoint():
+        logic.onPointRemoved(node, node.PointAboutToBeRemovedEvent, args["point"])
+        node.RemoveNthControlPoint(args["point"])
+      return removePoint
+    if op == "attemptToAddTriangle":
+      return lambda: logic.attemptToAddTriangle([tuple(p) for p in args["points"]], args["label"])
+    if op == "assignTriangleLabel":
+      return lambda: logic.assignTriangleLabel(np.array(args["position"]), args["label"])
+    if op == "attemptTriangleDeletion":
+      return lambda: logic.attemptTriangleDeletion(np.array(args["position"]))
+    if op == "flipTriangleNormal":
+      return lambda: logic.flipTriangleNormal(np.array(args["position"]))
+    if op in ("undo", "redo"):
+      return getattr(logic, op)
+    raise ValueError(f"Unknown operation '{op}'")
+
+  def run(self):
+    """ Replays the session once and returns the latencies by operation type and the number of operations whose
+    outcome (error or not) differed from the recording
+    """
+    self.setUp()
+    latencies = OrderedDict()
+    divergences = 0
+    for record in self.records:
+      call = self.prepare(record["op"], record["args"])
+      if call is None:
+        continue
+      name = "onMarkupsNodeModified" if record["op"] == OP_NODE else record["op"]
+      error = None
+      start = time.perf_counter()
+      try:
+        call()
+      except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+      latencies.setdefault(name, []).append(time.perf_counter() - start)
+      if record["op"] != OP_NODE and (error is None) != (record.get("error") is None):
+        divergences += 1
+        logging.warning(f"{name} at {record['t']:.3f}s: recorded {record.get('error') or 'success'}, "
+                        f"replayed {error or 'success'}")
+
+    if self.end and self.end["args"].get("templateHash") not in (None, self.logic.data.getTemplateHash()):
+      logging.warning("The replayed template differs from the recorded one")
+    return latencies, divergences
+
+  def getRecordedLatencies(self):
+    latencies = OrderedDict()
+    for record in self.records:
+      if "seconds" in record:
+        latencies.setdefault(record["op"], []).append(record["seconds"])
+    return latencies
+
+
+def formatLatencies(latencies, recorded=None):
+  header = f"{'Operation':<28} {'Count':>6} " + " ".join(f"{f'p{p} [ms]':>10}" for p in PERCENTILES) + \
+           f" {'max [ms]':>10}"
+  if recorded is not None:
+    header += f" {'recorded p50':>13}"
+  lines = [header]
+  for name, samples in latencies.items():
+    values = np.percentile(samples, PERCENTILES) * 1000
+    line = f"{name:<28} {len(samples):>6} " + " ".join(f"{v:>10.2f}" for v in values) + \
+           f" {max(samples) * 1000:>10.2f}"
+    if recorded is not None:
+      line += f" {np.median(recorded[name]) * 1000:>13.2f}" if name in recorded else f" {'':>13}"
+    lines.append(line)
+  return "\n".join(lines)
+
+
+def toBenchmarkResults(sessionFile, latencies, repeat):
+  from SyntheticSkeletonBenchmark import RESULTS_FORMAT_VERSION, getMetadata
+  case = f"session={Path(sessionFile).stem}"
+  return {
+    "version": RESULTS_FORMAT_VERSION,
+    "metadata": dict(getMetadata(), repeat=repeat, warmup=0, session=str(sessionFile)),
+    "benchmarks": [{"name": name, "case": case, "parameters": {"operations": len(samples) // repeat}, "unit": "s",
+                    "samples": samples} for name, samples in latencies.items()]
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Replay a recorded SyntheticSkeleton editing session headless and "
+                                               "report the latency of every operation type")
+  parser.add_argument("session", help="recorded session (.jsonl)")
+  parser.add_argument("--repeat", type=int, default=1, help="number of replays, latencies of all replays are pooled")
+  parser.add_argument("--output", default=None, help="write latencies as benchmark results (JSON)")
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+  replay = SessionReplay(args.session)
+  latencies = OrderedDict()
+  divergences = 0
+  for _ in range(args.repeat):
+    runLatencies, runDivergences = replay.run()
+    divergences += runDivergences
+    for name, samples in runLatencies.items():
+      latencies.setdefault(name, []).extend(samples)
+
+  logging.info(formatLatencies(latencies, replay.getRecordedLatencies()))
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(toBenchmarkResults(args.session, latencies, args.repeat), f, indent=2)
+    logging.info(f"Results written to {args.output}")
+  return 1 if divergences else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
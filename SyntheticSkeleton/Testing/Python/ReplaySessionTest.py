@@ -0,0 +1,163 @@
+""" Records an editing session of SyntheticSkeletonLogic with the Slicer stand-ins and replays it with
+ReplaySession.py:
+
+  python -m unittest ReplaySessionTest
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+SKELETON_RESOLUTION = 10
+SKELETON_LENGTH = 10.0
+
+
+def createSkeleton():
+  """ Triangulated square sheet with a 'Radius' point array """
+  import vtk
+  plane = vtk.vtkPlaneSource()
+  plane.SetOrigin(0, 0, 0)
+  plane.SetPoint1(SKELETON_LENGTH, 0, 0)
+  plane.SetPoint2(0, SKELETON_LENGTH, 0)
+  plane.SetResolution(SKELETON_RESOLUTION, SKELETON_RESOLUTION)
+  triangulate = vtk.vtkTriangleFilter()
+  triangulate.SetInputConnection(plane.GetOutputPort())
+  triangulate.Update()
+  skeleton = triangulate.GetOutput()
+
+  radius = vtk.vtkFloatArray()
+  radius.SetName("Radius")
+  for i in range(skeleton.GetNumberOfPoints()):
+    radius.InsertNextValue(1.0)
+  skeleton.GetPointData().AddArray(radius)
+  return skeleton
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class ReplaySessionTest(unittest.TestCase):
+
+  def setUp(self):
+    # installs the stand-ins
+    import ReplaySession
+    import slicer
+    from SyntheticSkeleton import SyntheticSkeletonLogic
+    from SlicerStandIns import StandInModelNode
+
+    self.ReplaySession = ReplaySession
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.sessionFile = Path(self.directory.name) / "session.jsonl"
+
+    scene = slicer.mrmlScene
+    scene.Clear()
+    self.logic = logic = SyntheticSkeletonLogic()
+    skeleton = scene.AddNode(StandInModelNode("Skeleton"))
+    skeleton.SetAndObservePolyData(createSkeleton())
+    logic.inputModel = skeleton
+
+    # scene observers are not invoked by the stand-ins
+    self.markups = scene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", "Edge")
+    for name, value in [("ModuleName", logic.moduleName), ("TypeIndex", "2"), ("AnatomicalIndex", "1")]:
+      self.markups.SetAttribute(name, value)
+    logic.onNodeAdded(scene, None, self.markups)
+    self.label = scene.AddNewNodeByClass("vtkMRMLScriptedModuleNode", "Sheet")
+    for name, value in [("ModuleName", logic.moduleName), ("Type", "Triangle"), ("Color", "#ff8000")]:
+      self.label.SetAttribute(name, value)
+    logic.onNodeAdded(scene, None, self.label)
+
+  def addPoint(self, x, y):
+    import vtk
+    self.markups.AddControlPoint(vtk.vtkVector3d(x, y, 0))
+    self.logic.onPointAdded(self.markups, self.markups.PointPositionDefinedEvent)
+
+  def dragPoint(self, index, positions):
+    logic, markups = self.logic, self.markups
+    logic.onPointInteractionStarted(markups, markups.PointStartInteractionEvent)
+    markups.GetDisplayNode().SetActiveControlPoint(index)
+    for position in positions:
+      markups.SetNthControlPointPosition(index, position)
+      logic.onPointModified(markups, markups.PointModifiedEvent, index)
+    logic.onPointInteractionEnded(markups, markups.PointEndInteractionEvent)
+
+  def replay(self):
+    """ Return code of ReplaySession.py and the template hashes of the recording and of the replay """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), self.assertLogs(level="INFO") as logs:
+      returnCode = self.ReplaySession.main([str(self.sessionFile), "--repeat", "2"])
+    self.assertFalse([line for line in logs.output if line.startswith("WARNING") and "tagged already" not in line])
+    replay = self.ReplaySession.SessionReplay(self.sessionFile)
+    with contextlib.redirect_stdout(output):
+      _, divergences = replay.run()
+    self.assertEqual(divergences, 0)
+    return returnCode, replay.end["args"]["templateHash"], replay.logic.data.getTemplateHash()
+
+  def test_RecordAndReplay(self):
+    logic = self.logic
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), self.assertLogs(level="INFO"):
+      logic.startSessionRecording(self.sessionFile)
+      for x, y in [(0, 0), (5, 0), (5, 5), (0, 5)]:
+        self.addPoint(x, y)
+      logic.attemptToAddTriangle([(self.markups.GetID(), i) for i in range(3)], self.label.GetID())
+      self.dragPoint(3, [(0.3 * i, 5, 0) for i in range(5)])
+      logic.undo()
+      logic.redo()
+      # fails in the recording and the replay alike
+      with self.assertRaises(ValueError):
+        logic.attemptToAddTriangle([(self.markups.GetID(), i) for i in range(3)], "no label")
+      logic.stopSessionRecording()
+
+    self.assertEqual(len(logic.data.vectorTagPoints), 4)
+    self.assertEqual(len(logic.data.vectorTagTriangles), 1)
+    returnCode, recordedHash, replayedHash = self.replay()
+    self.assertEqual(returnCode, 0)
+    self.assertEqual(replayedHash, recordedHash)
+
+  def recordDuplicateTag(self, reject):
+    from SyntheticSkeletonLib.Core.Constants import PARAM_REJECT_DUPLICATE_TAGS
+
+    logic = self.logic
+    logic.parameterNode.SetParameter(PARAM_REJECT_DUPLICATE_TAGS, str(reject))
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), self.assertLogs(level="WARNING") as logs:
+      logic.startSessionRecording(self.sessionFile)
+      self.addPoint(5, 5)
+      self.addPoint(5, 5)
+      logic.stopSessionRecording()
+    self.assertTrue(any("is tagged already by Edge-1" in line for line in logs.output))
+
+  def test_DuplicateTagIsPlaced(self):
+    self.recordDuplicateTag(reject=False)
+    self.assertEqual(len(self.logic.data.vectorTagPoints), 2)
+    self.assertEqual(self.markups.GetNumberOfControlPoints(), 2)
+    self.assertEqual(list(self.logic.tagIndex.getDuplicates().values()), [[0, 1]])
+    returnCode, recordedHash, replayedHash = self.replay()
+    self.assertEqual(returnCode, 0)
+    self.assertEqual(replayedHash, recordedHash)
+
+  def test_DuplicateTagIsRejected(self):
+    self.recordDuplicateTag(reject=True)
+    self.assertEqual(len(self.logic.data.vectorTagPoints), 1)
+    self.assertEqual(self.markups.GetNumberOfControlPoints(), 1)
+    self.assertFalse(self.logic.tagIndex.hasDuplicates())
+    returnCode, recordedHash, replayedHash = self.replay()
+    self.assertEqual(returnCode, 0)
+    self.assertEqual(replayedHash, recordedHash)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,137 @@
+""" Tests of the subject workspaces and their memory-bounded eviction (Session.py):
+
+  python -m unittest SessionTest
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+def createSkeleton(resolution=100):
+  import vtk
+  source = vtk.vtkSphereSource()
+  source.SetThetaResolution(resolution)
+  source.SetPhiResolution(resolution)
+  source.Update()
+  return source.GetOutput()
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class SubjectSessionTest(unittest.TestCase):
+
+  def setUp(self):
+    from SyntheticSkeletonLib.Session import SubjectSession
+
+    self.session = SubjectSession(memoryBudgetKiB=1 << 20)
+    self.addCleanup(self.session.closeAll)
+
+  def openSubjects(self, subjectIDs):
+    """ Opens the subjects in the given order with locator and normals built """
+    for subjectID in subjectIDs:
+      workspace = self.session.activate(subjectID, createSkeleton(), name=subjectID)
+      workspace.getLocator()
+      workspace.getNormals()
+
+  def getSizes(self, subjectID, name):
+    return self.session.get(subjectID).getMemorySizes()[name]
+
+  def test_EvictsLeastRecentlyActiveFirst(self):
+    from SyntheticSkeletonLib.Session import LOCATOR, NORMALS
+
+    self.openSubjects(["A", "B"])
+    self.session.activate("C", createSkeleton(resolution=8))
+    locatorSize, normalsSize = self.getSizes("A", LOCATOR), self.getSizes("A", NORMALS)
+    self.assertGreater(locatorSize, 0)
+    self.assertGreater(normalsSize, 0)
+
+    # the locator of A is enough
+    self.session.memoryBudgetKiB = self.session.getEvictableMemorySize() - locatorSize
+    self.session.enforceBudget()
+    self.assertEqual([self.getSizes(subjectID, LOCATOR) for subjectID in "AB"], [0, locatorSize])
+    self.assertEqual([self.getSizes(subjectID, NORMALS) for subjectID in "AB"], [normalsSize, normalsSize])
+
+    # all locators go before any normals
+    self.session.memoryBudgetKiB = normalsSize
+    self.session.enforceBudget()
+    self.assertEqual([self.getSizes(subjectID, LOCATOR) for subjectID in "AB"], [0, 0])
+    self.assertEqual([self.getSizes(subjectID, NORMALS) for subjectID in "AB"], [0, normalsSize])
+
+  def test_ActiveSubjectIsNotEvicted(self):
+    from SyntheticSkeletonLib.Session import LOCATOR, NORMALS
+
+    self.openSubjects(["A", "B"])
+    self.session.memoryBudgetKiB = 0
+    self.session.activate("A")
+    self.assertEqual(list(self.session.getMemoryReport()), ["B", "A"])
+    self.assertGreater(self.getSizes("A", LOCATOR), 0)
+    self.assertGreater(self.getSizes("A", NORMALS), 0)
+    self.assertEqual(self.getSizes("B", LOCATOR) + self.getSizes("B", NORMALS), 0)
+
+  def test_NormalsAreReadBackFromCache(self):
+    import numpy as np
+    from SyntheticSkeletonLib.Session import NORMALS
+
+    self.openSubjects(["A"])
+    workspace = self.session.get("A")
+    normals = workspace.getNormals().copy()
+    workspace.evict(NORMALS, self.session.getCacheDirectory())
+    self.assertEqual(workspace.getMemorySizes()[NORMALS], 0)
+    cachedFiles = list(Path(self.session.getCacheDirectory()).iterdir())
+    self.assertEqual(len(cachedFiles), 1)
+
+    np.testing.assert_array_equal(np.load(cachedFiles[0]), normals)
+    # read back instead of recomputed
+    np.save(cachedFiles[0], np.zeros_like(normals))
+    np.testing.assert_array_equal(workspace.getNormals(), np.zeros_like(normals))
+
+    # a changed skeleton is not served from the cache
+    workspace.evict(NORMALS, self.session.getCacheDirectory())
+    workspace.skeleton.Modified()
+    np.testing.assert_array_equal(workspace.getNormals(), normals)
+
+  def test_CloseRemovesCachedNormals(self):
+    from SyntheticSkeletonLib.Session import NORMALS
+
+    self.openSubjects(["A", "B"])
+    for subjectID in "AB":
+      self.session.get(subjectID).evict(NORMALS, self.session.getCacheDirectory())
+    cacheDirectory = Path(self.session.getCacheDirectory())
+    self.assertEqual(len(list(cacheDirectory.iterdir())), 2)
+
+    self.session.close("B")
+    self.assertNotIn("B", self.session)
+    self.assertIsNone(self.session.active)
+    self.assertEqual([path.name for path in cacheDirectory.iterdir()], ["ANormals.npy"])
+
+    self.session.closeAll()
+    self.assertEqual(len(self.session), 0)
+    # the temporary cache directory created by the session is removed
+    self.assertFalse(cacheDirectory.exists())
+
+  def test_CloseAllKeepsGivenCacheDirectory(self):
+    from SyntheticSkeletonLib.Session import NORMALS, SubjectSession
+
+    with tempfile.TemporaryDirectory() as directory:
+      session = SubjectSession(memoryBudgetKiB=0, cacheDirectory=directory)
+      for subjectID in "AB":
+        session.activate(subjectID, createSkeleton()).getNormals()
+      self.assertEqual(session.get("A").getMemorySizes()[NORMALS], 0)
+      self.assertEqual([path.name for path in Path(directory).iterdir()], ["ANormals.npy"])
+      session.closeAll()
+      self.assertTrue(Path(directory).is_dir())
+      self.assertEqual(list(Path(directory).iterdir()), [])
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,392 @@
+""" Stand-ins for the slicer and qt modules, so that SyntheticSkeleton.py and SyntheticSkeletonLib can be imported with
+plain vtk and numpy (benchmarks, headless tests, session replay).
+
+Every attribute of the stand-ins exists and every call succeeds, returning another stand-in. The MRML scene only
+holds the nodes the SyntheticSkeleton logic works with (model, markups, scripted module and parameter nodes) with
+their attributes, control points and node references. Nothing is rendered and no events are invoked, so only code
+paths that do not depend on other Slicer behaviour can be exercised.
+
+  import SlicerStandIns
+  SlicerStandIns.install()
+  import SyntheticSkeleton
+"""
+
+import importlib
+import sys
+import tempfile
+import types
+from collections import OrderedDict
+
+
+class StandIn(object):
+  """ Accepts any attribute access and call """
+
+  def __init__(self, name="StandIn", **attributes):
+    self._name = name
+    self.__dict__.update(attributes)
+
+  def __getattr__(self, name):
+    if name.startswith("__"):
+      raise AttributeError(name)
+    return StandIn(f"{self._name}.{name}")
+
+  def __call__(self, *args, **kwargs):
+    return StandIn(f"{self._name}()")
+
+  def __repr__(self):
+    return f"<StandIn {self._name}>"
+
+
+class StandInNode(StandIn):
+  """ MRML node with name, ID and attributes. Methods that are not implemented are accepted and do nothing. """
+
+  classHierarchy = ("vtkMRMLNode",)
+
+  def __init__(self, name=""):
+    StandIn.__init__(self, self.classHierarchy[0])
+    self.id = None
+    self.name = name
+    self.attributes = OrderedDict()
+    self.scene = None
+    self.displayNode = None
+    self.displayVisibility = True
+
+  def GetClassName(self):
+    return self.classHierarchy[0]
+
+  def IsA(self, className):
+    return className in self.classHierarchy
+
+  def GetID(self):
+    return self.id
+
+  def GetName(self):
+    return self.name
+
+  def SetName(self, name):
+    self.name = name
+
+  def GetAttribute(self, name):
+    return self.attributes.get(name)
+
+  def SetAttribute(self, name, value):
+    self.attributes[name] = value
+
+  def RemoveAttribute(self, name):
+    self.attributes.pop(name, None)
+
+  def GetDisplayNode(self):
+    return self.displayNode
+
+  def GetDisplayVisibility(self):
+    return self.displayVisibility
+
+  def SetDisplayVisibility(self, visible):
+    self.displayVisibility = bool(visible)
+
+  def Modified(self):
+    pass
+
+
+class StandInModelNode(StandInNode):
+  """ Model node holding a polydata, enough for Mesh.updateMesh """
+
+  classHierarchy = ("vtkMRMLModelNode", "vtkMRMLDisplayableNode", "vtkMRMLNode")
+
+  def __init__(self, name="Model"):
+    StandInNode.__init__(self, name)
+    self.polydata = None
+
+  def SetAndObservePolyData(self, polydata):
+    self.polydata = polydata
+
+  def GetPolyData(self):
+    return self.polydata
+
+
+class StandInScriptedModuleNode(StandInNode):
+  """ Parameter node or triangle label node """
+
+  classHierarchy = ("vtkMRMLScriptedModuleNode", "vtkMRMLNode")
+
+  def __init__(self, name=""):
+    StandInNode.__init__(self, name)
+    self.parameters = OrderedDict()
+    self.references = {}
+
+  def GetParameter(self, name):
+    return self.parameters.get(name, "")
+
+  def SetParameter(self, name, value):
+    self.parameters[name] = str(value)
+
+  def GetNodeReferenceID(self, role):
+    return self.references.get(role)
+
+  def SetNodeReferenceID(self, role, nodeID):
+    if nodeID:
+      self.references[role] = nodeID
+    else:
+      self.references.pop(role, None)
+
+  def GetNodeReference(self, role):
+    nodeID = self.GetNodeReferenceID(role)
+    return self.scene.GetNodeByID(nodeID) if nodeID and self.scene is not None else None
+
+
+class StandInMarkupsDisplayNode(StandInNode):
+
+  classHierarchy = ("vtkMRMLMarkupsDisplayNode", "vtkMRMLDisplayNode", "vtkMRMLNode")
+
+  def __init__(self, name=""):
+    StandInNode.__init__(self, name)
+    self.selectedColor = (1.0, 0.5, 0.5)
+    self.activeControlPoint = -1
+
+  def GetSelectedColor(self):
+    return self.selectedColor
+
+  def SetSelectedColor(self, *color):
+    self.selectedColor = tuple(color[0] if len(color) == 1 else color)
+
+  def GetActiveControlPoint(self):
+    return self.activeControlPoint
+
+  def SetActiveControlPoint(self, index):
+    self.activeControlPoint = index
+
+
+class StandInMarkupsFiducialNode(StandInNode):
+  """ Point list with control point positions """
+
+  classHierarchy = ("vtkMRMLMarkupsFiducialNode", "vtkMRMLMarkupsNode", "vtkMRMLDisplayableNode", "vtkMRMLNode")
+
+  PointModifiedEvent = 19001
+  PointPositionDefinedEvent = 19006
+  PointAboutToBeRemovedEvent = 19003
+  PointStartInteractionEvent = 19008
+  PointEndInteractionEvent = 19009
+
+  def __init__(self, name=""):
+    StandInNode.__init__(self, name)
+    self.controlPoints = []
+    self.controlPointLabels = []
+
+  def CreateDefaultDisplayNodes(self):
+    if self.displayNode is None:
+      self.displayNode = StandInMarkupsDisplayNode(f"{self.name}Display")
+
+  def GetNumberOfControlPoints(self):
+    return len(self.controlPoints)
+
+  def GetNthControlPointPosition(self, index):
+    return tuple(self.controlPoints[index])
+
+  def SetNthControlPointPosition(self, index, *position):
+    self.controlPoints[index] = [float(c) for c in (position[0] if len(position) == 1 else position)]
+
+  def GetNthControlPointLabel(self, index):
+    return self.controlPointLabels[index]
+
+  def SetNthControlPointLabel(self, index, label):
+    self.controlPointLabels[index] = label
+
+  def AddControlPoint(self, position, label=""):
+    if hasattr(position, "GetX"):
+      position = (position.GetX(), position.GetY(), position.GetZ())
+    self.controlPoints.append([float(c) for c in position])
+    self.controlPointLabels.append(label or f"{self.name}-{len(self.controlPoints)}")
+    return len(self.controlPoints) - 1
+
+  def RemoveNthControlPoint(self, index):
+    del self.controlPoints[index]
+    del self.controlPointLabels[index]
+
+  def RemoveAllControlPoints(self):
+    self.controlPoints = []
+    self.controlPointLabels = []
+
+
+class StandInScene(StandIn):
+  """ Nodes by ID in the order they were added """
+
+  nodeClasses = {cls.classHierarchy[0]: cls for cls in [StandInNode, StandInModelNode, StandInScriptedModuleNode,
+                                                        StandInMarkupsFiducialNode]}
+
+  def __init__(self):
+    StandIn.__init__(self, "slicer.mrmlScene")
+    self.nodes = OrderedDict()
+    self._nextIndex = 1
+
+  def AddNode(self, node):
+    if node.id is None or node.id in self.nodes:
+      # distinct from the IDs Slicer assigns, which replayed nodes keep
+      node.id = f"{node.GetClassName()}StandIn{self._nextIndex}"
+      self._nextIndex += 1
+    node.scene = self
+    self.nodes[node.id] = node
+    return node
+
+  def AddNewNodeByClass(self, className, name=""):
+    node = self.nodeClasses.get(className, StandInNode)(name)
+    node.CreateDefaultDisplayNodes()
+    return self.AddNode(node)
+
+  def GetNodeByID(self, nodeID):
+    return self.nodes.get(nodeID)
+
+  def GetNodesByClass(self, className):
+    return [node for node in self.nodes.values() if node.IsA(className)]
+
+  def RemoveNode(self, node):
+    self.nodes.pop(node.GetID(), None)
+
+  def Clear(self, removeSingletons=False):
+    self.nodes.clear()
+
+
+class StandInQColor(object):
+  """ Colour given by name ('#rrggbb') """
+
+  def __init__(self, name="#000000"):
+    self._name = str(name).lower()
+
+  def name(self):
+    return self._name
+
+  def __str__(self):
+    return self._name
+
+
+class MRMLNodeNotFoundException(Exception):
+  pass
+
+
+class _ScriptedLoadableModuleBase(object):
+
+  def __init__(self, *args, **kwargs):
+    self.moduleName = type(self).__name__.replace("Logic", "").replace("Widget", "").replace("Test", "")
+
+  def delayDisplay(self, message, msec=None):
+    pass
+
+
+class _ScriptedLoadableModuleLogic(_ScriptedLoadableModuleBase):
+
+  def createParameterNode(self):
+    node = StandInScriptedModuleNode(self.moduleName)
+    node.SetAttribute("ModuleName", self.moduleName)
+    return node
+
+  def getParameterNode(self):
+    parameterNode = getattr(self, "_standInParameterNode", None)
+    if parameterNode is None:
+      parameterNode = self._standInParameterNode = sys.modules["slicer"].mrmlScene.AddNode(self.createParameterNode())
+    return parameterNode
+
+
+class _VTKObservationMixin(object):
+  """ Keeps the observations like slicer.util.VTKObservationMixin, but nothing is observed """
+
+  def __init__(self):
+    self.Observations = []
+
+  def addObserver(self, obj, event, method, group="none", priority=0.0):
+    if not self.hasObserver(obj, event, method):
+      self.Observations.append([obj, event, method, group, None, priority])
+
+  def hasObserver(self, obj, event, method):
+    return any(o == obj and e == event and m == method for o, e, m, *_ in self.Observations)
+
+  def removeObserver(self, obj, event, method):
+    self.Observations = [observation for observation in self.Observations
+                         if observation[:3] != [obj, event, method]]
+
+  def removeObservers(self, method=None):
+    self.Observations = [observation for observation in self.Observations
+                         if method is not None and observation[2] != method]
+
+
+def _toBool(value):
+  """ Like slicer.util.toBool: integers by value, strings are True only if equal to 'true' (any case) """
+  try:
+    return bool(int(value))
+  except (ValueError, TypeError):
+    return value.lower() in ["true"] if isinstance(value, str) else bool(value)
+
+
+def _createModule(name, **attributes):
+  module = types.ModuleType(name)
+  module.__dict__.update(attributes)
+
+  def getAttribute(attribute):
+    if attribute.startswith("__"):
+      raise AttributeError(attribute)
+    return StandIn(f"{name}.{attribute}")
+
+  module.__getattr__ = getAttribute
+  return module
+
+
+def isInstalled():
+  return isinstance(sys.modules.get("slicer"), types.ModuleType) and \
+         getattr(sys.modules["slicer"], "__standIn__", False)
+
+
+def install(force=False):
+  """ Registers the stand-ins as slicer and qt modules. The real modules are kept if they can be imported (i.e. when
+  running in Slicer), unless force is set. Returns True if the stand-ins are used.
+  """
+  if isInstalled():
+    return True
+  if not force:
+    try:
+      for name in ["slicer", "qt"]:
+        importlib.import_module(name)
+      return False
+    except ImportError:
+      pass
+
+  scene = StandInScene()
+
+  def getNode(pattern):
+    node = scene.GetNodeByID(pattern) or next((n for n in scene.nodes.values() if n.GetName() == pattern), None)
+    if node is None:
+      raise MRMLNodeNotFoundException(f"could not find node: {pattern}")
+    return node
+
+  scriptedLoadableModule = _createModule(
+    "slicer.ScriptedLoadableModule",
+    ScriptedLoadableModule=type("ScriptedLoadableModule", (_ScriptedLoadableModuleBase,), {}),
+    ScriptedLoadableModuleWidget=type("ScriptedLoadableModuleWidget", (_ScriptedLoadableModuleBase,), {}),
+    ScriptedLoadableModuleLogic=type("ScriptedLoadableModuleLogic", (_ScriptedLoadableModuleLogic,), {}),
+    ScriptedLoadableModuleTest=type("ScriptedLoadableModuleTest", (_ScriptedLoadableModuleBase,), {})
+  )
+  scriptedLoadableModule.__all__ = ["ScriptedLoadableModule", "ScriptedLoadableModuleWidget",
+                                    "ScriptedLoadableModuleLogic", "ScriptedLoadableModuleTest"]
+  util = _createModule(
+    "slicer.util",
+    VTKObservationMixin=_VTKObservationMixin,
+    MRMLNodeNotFoundException=MRMLNodeNotFoundException,
+    getNode=getNode,
+    getNodesByClass=scene.GetNodesByClass,
+    toBool=_toBool
+  )
+  slicer = _createModule(
+    "slicer",
+    __standIn__=True,
+    app=StandIn("slicer.app", temporaryPath=tempfile.gettempdir()),
+    mrmlScene=scene,
+    util=util,
+    ScriptedLoadableModule=scriptedLoadableModule,
+    **{cls.classHierarchy[0]: cls for cls in StandInScene.nodeClasses.values()}
+  )
+  qt = _createModule("qt", QColor=StandInQColor)
+
+  sys.modules.update({
+    "slicer": slicer,
+    "slicer.util": util,
+    "slicer.ScriptedLoadableModule": scriptedLoadableModule,
+    "qt": qt
+  })
+  return True
@@ -0,0 +1,113 @@
+""" Tests of the cohort statistics over Affix templates (Statistics.py):
+
+  python -m unittest StatisticsTest
+"""
+
+import csv
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+def createTemplate():
+  """ Unit square of two triangles with one branch point and three edge points """
+  import vtk
+  from SyntheticSkeletonLib.Core.Model import CustomInformation, Color, LabelTriangle, Point, TagInfo, TagPoint, \
+    TagTriangle
+
+  source = vtk.vtkSphereSource()
+  source.Update()
+  data = CustomInformation(source.GetOutput())
+  data.appendTagInfo(TagInfo(tagName="Branch", tagType=1, tagColor=Color(255, 0, 0), tagIndex=1))
+  data.appendTagInfo(TagInfo(tagName="Edge", tagType=2, tagColor=Color(0, 255, 0), tagIndex=2))
+  data.appendLabelInfo(LabelTriangle(labelName="Sheet", labelColor="#ff8000"))
+  for i, (x, y) in enumerate([(0, 0), (1, 0), (1, 1), (0, 1)]):
+    data.appendPoint(TagPoint(pos=Point(x, y, 0), radius=1.0 + i, typeIndex=1 if i == 0 else 2,
+                              comboBoxIndex=0 if i == 0 else 1, seq=i))
+  for ids in [(0, 1, 2), (0, 2, 3)]:
+    p1, p2, p3 = (data.vectorTagPoints[i].pos for i in ids)
+    data.appendTriangle(TagTriangle(p1, p2, p3, *ids, 0, 1, 2, index=0))
+  return data
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class StatisticsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def writeAffix(self, data, subjectID):
+    from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+    filePath = Path(self.directory.name) / f"{subjectID}Affix.vtk"
+    CustomInformationWriter(data).writeCustomDataToFile(str(filePath))
+    return filePath
+
+  def computeStatistics(self, data):
+    from SyntheticSkeletonLib.Statistics import computeStatistics, readTemplateArrays
+    records = computeStatistics(readTemplateArrays(self.writeAffix(data, "subject")))
+    return {(record["metric"], record["group"]): record for record in records}
+
+  def test_Metrics(self):
+    from SyntheticSkeletonLib.Core.Constants import BRANCH_POINT, EDGE_POINT
+
+    statistics = self.computeStatistics(createTemplate())
+    self.assertEqual(statistics["triangleArea", "all"]["sum"], 1.0)
+    self.assertEqual(statistics["triangleArea", "Sheet"]["count"], 2)
+    self.assertEqual(statistics["edgeLength", "all"]["count"], 5)
+    self.assertAlmostEqual(statistics["edgeLength", "all"]["max"], 2.0 ** 0.5)
+    self.assertEqual(statistics["freeEdgeLoopLength", "all"]["count"], 1)
+    self.assertAlmostEqual(statistics["freeEdgeLoopLength", "all"]["sum"], 4.0)
+    self.assertEqual(statistics["radius", BRANCH_POINT]["sum"], 1.0)
+    self.assertEqual(statistics["radius", EDGE_POINT]["sum"], 2.0 + 3.0 + 4.0)
+
+  def test_MovedPointMatchesMeshQuality(self):
+    from SyntheticSkeletonLib.Core.Model import Point
+    from SyntheticSkeletonLib.Core.Quality import MeshQuality
+
+    # the positions stored with the triangles are not updated when a point is moved
+    data = createTemplate()
+    data.setPoint(3, replace(data.vectorTagPoints[3], pos=Point(0, 2, 0)))
+    areas = MeshQuality(data).getArray("Area")
+    statistics = self.computeStatistics(data)
+    self.assertEqual(list(areas), [0.5, 1.0])
+    self.assertEqual(statistics["triangleArea", "all"]["sum"], areas.sum())
+    self.assertEqual(statistics["triangleArea", "all"]["max"], areas.max())
+    self.assertAlmostEqual(statistics["edgeLength", "all"]["max"], 2.0)
+    self.assertAlmostEqual(statistics["freeEdgeLoopLength", "all"]["sum"], 4.0 + 2.0 ** 0.5)
+
+  def test_InvalidPointIndex(self):
+    data = createTemplate()
+    data.setTriangle(1, replace(data.vectorTagTriangles[1], id3=7))
+    statistics = self.computeStatistics(data)
+    # not counted
+    self.assertEqual(statistics["triangleArea", "all"]["count"], 1)
+    self.assertEqual(statistics["triangleArea", "all"]["sum"], 0.5)
+
+  def test_Main(self):
+    from SyntheticSkeletonLib.Statistics import COLUMNS, main
+
+    files = [str(self.writeAffix(createTemplate(), subjectID)) for subjectID in ["subject01", "subject02"]]
+    outputPath = Path(self.directory.name) / "cohort.csv"
+    with self.assertLogs(level="INFO"):
+      self.assertEqual(main(files + ["--output", str(outputPath), "--workers", "2"]), 0)
+    with open(outputPath, newline="") as f:
+      rows = list(csv.DictReader(f))
+    self.assertEqual(list(rows[0]), COLUMNS)
+    self.assertEqual(sorted({row["subject"] for row in rows}), ["subject01", "subject02"])
+    self.assertEqual(rows[0]["subject"], "subject01")
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,373 @@
+""" Benchmarks of the template editing hot paths on synthetic data.
+
+Skeletons are generated as three sheets meeting at a branch curve (the typical shape of a Voronoi skeleton) with a
+'Radius' point array. Templates are tagged grids on those sheets with branch, free edge and interior points and one
+triangle label per sheet. Loop subdivision requires a manifold mesh, so subdivision is measured on templates of a
+single sheet.
+
+Runs headless with vtk and numpy (slicer and qt are replaced by stand-ins unless running in Slicer) and writes
+repeated timings of every benchmark to JSON, so that runs of different commits can be compared:
+
+  python SyntheticSkeletonBenchmark.py --output benchmark.json --skeletonSizes 1e3 1e6 --templateSizes 1e2 1e5
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import SlicerStandIns
+SlicerStandIns.install()
+
+import vtk
+from vtk.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+
+from SyntheticSkeletonLib.Core.Model import CustomInformation, TagInfo, LabelTriangle, TagPoint, TagTriangle, Point, \
+  Color
+from SyntheticSkeletonLib.Core.Writer import CustomInformationWriter
+from SyntheticSkeletonLib.Engine import SyntheticSkeletonEngine, readPolyData, createPointLocator, \
+  getClosestVertexAndRadius
+from SyntheticSkeletonLib.Core.Geometry import pairNumber
+from SyntheticSkeletonLib.Core.Constants import SESSION_MEMORY_BUDGET_KIB
+from SyntheticSkeletonLib.Session import SubjectSession
+from SyntheticSkeleton import SyntheticSkeletonLogic, Mesh
+
+
+RESULTS_FORMAT_VERSION = 1
+
+NUMBER_OF_SHEETS = 3
+SHEET_LENGTH = 40.0
+SHEET_HEIGHT = 60.0
+
+BRANCH, EDGE, INTERIOR = 1, 2, 3
+LABEL_COLORS = ["#e41a1c", "#377eb8", "#4daf4a"]
+
+
+def _createTrianglePolyData(points, triangles):
+  polydata = vtk.vtkPolyData()
+  vtkPoints = vtk.vtkPoints()
+  vtkPoints.SetData(numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float32), deep=True))
+  polydata.SetPoints(vtkPoints)
+  cells = np.hstack([np.full((len(triangles), 1), 3), triangles]).ravel()
+  polys = vtk.vtkCellArray()
+  polys.SetCells(len(triangles), numpy_to_vtkIdTypeArray(cells.astype(np.int64), deep=True))
+  polydata.SetPolys(polys)
+  return polydata
+
+
+def _createSheetGrid(numberOfRadial, numberOfAxial, numberOfSheets=NUMBER_OF_SHEETS):
+  """ Vertex ids and triangles of numberOfSheets (numberOfRadial x numberOfAxial) grids sharing their first column (the
+  branch curve). Returns (sheet, radial, axial) parameters of every vertex and the triangles with their sheet.
+
+  Diagonals are chosen so that no triangle connects two free edge vertices across a corner, i.e. the grid is a valid
+  template for the edge constraints.
+  """
+  ids = np.empty((numberOfSheets, numberOfRadial, numberOfAxial), dtype=np.int64)
+  ids[:, 0, :] = np.arange(numberOfAxial)
+  numberOfSheetVertices = (numberOfRadial - 1) * numberOfAxial
+  ids[:, 1:, :] = numberOfAxial + np.arange(numberOfSheets * numberOfSheetVertices).reshape(
+    numberOfSheets, numberOfRadial - 1, numberOfAxial)
+  seam = np.stack([np.zeros(numberOfAxial), np.zeros(numberOfAxial), np.arange(numberOfAxial)], axis=1)
+  sheetParameters = np.stack(np.meshgrid(np.arange(numberOfSheets), np.arange(1, numberOfRadial),
+                                         np.arange(numberOfAxial), indexing="ij"), axis=-1).reshape(-1, 3)
+  parameters = np.concatenate([seam, sheetParameters]).astype(float)
+
+  i, j = np.meshgrid(np.arange(numberOfRadial - 1), np.arange(numberOfAxial - 1), indexing="ij")
+  i, j = i.ravel(), j.ravel()
+  mainDiagonal = 2 * j >= numberOfAxial - 1
+  triangles, sheets = [], []
+  for s in range(numberOfSheets):
+    a, b, c, d = ids[s, i, j], ids[s, i + 1, j], ids[s, i, j + 1], ids[s, i + 1, j + 1]
+    first = np.where(mainDiagonal[:, None], np.stack([a, b, d], axis=1), np.stack([a, b, c], axis=1))
+    second = np.where(mainDiagonal[:, None], np.stack([a, d, c], axis=1), np.stack([b, d, c], axis=1))
+    triangles += [first, second]
+    sheets += [np.full(len(i), s)] * 2
+  return parameters, np.concatenate(triangles), np.concatenate(sheets)
+
+
+def _toPositions(parameters, numberOfRadial, numberOfAxial):
+  sheet, radial, axial = parameters.T
+  angle = 2 * np.pi * sheet / NUMBER_OF_SHEETS
+  r = radial / max(1, numberOfRadial - 1) * SHEET_LENGTH
+  z = axial / max(1, numberOfAxial - 1) * SHEET_HEIGHT
+  # slightly curved sheets
+  bend = 2.0 * np.sin(np.pi * z / SHEET_HEIGHT) * (r / SHEET_LENGTH) ** 2
+  return np.stack([r * np.cos(angle) - bend * np.sin(angle), r * np.sin(angle) + bend * np.cos(angle), z], axis=1)
+
+
+def _getGridSize(numberOfCells):
+  return max(3, int(round(np.sqrt(numberOfCells))) + 1)
+
+
+def createSkeletonPolyData(numberOfPoints):
+  """ Synthetic Voronoi skeleton with about numberOfPoints vertices and a 'Radius' point array """
+  n = _getGridSize(numberOfPoints / NUMBER_OF_SHEETS) - 1
+  parameters, triangles, _ = _createSheetGrid(n, n)
+  points = _toPositions(parameters, n, n)
+  polydata = _createTrianglePolyData(points, triangles)
+
+  # thickest at the branch curve, thinning out towards the free edges
+  radial, axial = parameters[:, 1] / (n - 1), parameters[:, 2] / (n - 1)
+  radius = 1.0 + 4.0 * (1.0 - radial) * np.sin(np.pi * (0.05 + 0.9 * axial))
+  radiusArray = numpy_to_vtk(radius.astype(np.float32), deep=True)
+  radiusArray.SetName("Radius")
+  polydata.GetPointData().AddArray(radiusArray)
+  return polydata
+
+
+def createTemplate(skeleton, numberOfTriangles, locator=None, numberOfSheets=NUMBER_OF_SHEETS):
+  """ Tagged template with about numberOfTriangles triangles on numberOfSheets of the skeleton sheets, snapped onto the
+  skeleton. Templates of more than one sheet are non-manifold at the branch curve.
+  """
+  n = _getGridSize(numberOfTriangles / (2 * numberOfSheets))
+  parameters, triangles, sheets = _createSheetGrid(n, n, numberOfSheets)
+  positions = _toPositions(parameters, n, n)
+
+  locator = locator or createPointLocator(skeleton)
+  skeletonPoints = skeleton.GetPoints()
+  radiusArray = skeleton.GetPointData().GetArray("Radius")
+
+  tagInfo = [
+    TagInfo(tagName="Branch", tagType=BRANCH, tagColor=Color(255, 255, 0), tagIndex=1),
+    TagInfo(tagName="Edge", tagType=EDGE, tagColor=Color(0, 255, 255), tagIndex=2),
+    TagInfo(tagName="Interior", tagType=INTERIOR, tagColor=Color(255, 0, 255), tagIndex=3)
+  ]
+  labelInfo = [LabelTriangle(labelName=f"Sheet{s}", labelColor=LABEL_COLORS[s % len(LABEL_COLORS)])
+               for s in range(numberOfSheets)]
+
+  _, radial, axial = parameters.T
+  tagPoints = []
+  for (r, a), pos in zip(zip(radial, axial), positions):
+    if r == 0 and numberOfSheets > 1:
+      comboBoxIndex = 0
+    elif r == 0 or r == n - 1 or a == 0 or a == n - 1:
+      comboBoxIndex = 1
+    else:
+      comboBoxIndex = 2
+    seq = locator.FindClosestPoint(pos)
+    tagPoints.append(TagPoint(
+      pos=Point(*skeletonPoints.GetPoint(seq)),
+      radius=radiusArray.GetValue(seq),
+      typeIndex=tagInfo[comboBoxIndex].tagIndex,
+      comboBoxIndex=comboBoxIndex,
+      seq=seq
+    ))
+
+  tagTriangles = []
+  for (id1, id2, id3), sheet in zip(triangles.tolist(), sheets.tolist()):
+    tagTriangles.append(TagTriangle(
+      p1=tagPoints[id1].pos, p2=tagPoints[id2].pos, p3=tagPoints[id3].pos,
+      id1=id1, id2=id2, id3=id3,
+      seq1=tagPoints[id1].seq, seq2=tagPoints[id2].seq, seq3=tagPoints[id3].seq,
+      index=sheet
+    ))
+
+  data = CustomInformation(skeleton)
+  data.assign(vectorTagInfo=tagInfo, vectorLabelInfo=labelInfo, vectorTagPoints=tagPoints,
+              vectorTagTriangles=tagTriangles)
+  createLogic(data).generateEdges()
+  return data
+
+
+def createLogic(data):
+  """ Logic operating on data without parameter node, scene observers or timers, enough for the template methods
+  that do not touch MRML nodes.
+  """
+  logic = SyntheticSkeletonLogic.__new__(SyntheticSkeletonLogic)
+  # template and point locator are kept by the workspace of the active subject
+  logic.session = SubjectSession(SESSION_MEMORY_BUDGET_KIB)
+  logic._workspace = logic.session.activate(None, data.polydata)
+  logic.data = data
+  return logic
+
+
+def measure(func, repeat, warmup, setup=None):
+  """ Wall times in seconds of repeat calls of func after warmup calls. setup runs untimed before every call. """
+  samples = []
+  for i in range(warmup + repeat):
+    if setup is not None:
+      setup()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    if i >= warmup:
+      samples.append(seconds)
+  return samples
+
+
+class BenchmarkRunner(object):
+
+  def __init__(self, repeat=5, warmup=1, filters=None):
+    self.repeat = repeat
+    self.warmup = warmup
+    self.filters = filters or []
+    self.results = []
+
+  def isSelected(self, name):
+    return not self.filters or any(f in name for f in self.filters)
+
+  def run(self, name, case, func, setup=None, **parameters):
+    if not self.isSelected(name):
+      return
+    samples = measure(func, self.repeat, self.warmup, setup)
+    logging.info(f"{name} [{case}]: median {np.median(samples) * 1000:.2f} ms ({len(samples)} samples)")
+    self.results.append({"name": name, "case": case, "parameters": parameters, "unit": "s", "samples": samples})
+
+  def skip(self, name, case, reason, **parameters):
+    if not self.isSelected(name):
+      return
+    logging.info(f"{name} [{case}]: skipped ({reason})")
+    self.results.append({"name": name, "case": case, "parameters": parameters, "unit": "s", "samples": [],
+                         "skipped": reason})
+
+
+def runSkeletonBenchmarks(runner, numberOfPoints, pickCount, seed):
+  skeleton = createSkeletonPolyData(numberOfPoints)
+  case = f"skeleton={skeleton.GetNumberOfPoints()}"
+  parameters = dict(skeletonPoints=skeleton.GetNumberOfPoints())
+
+  runner.run("createPointLocator", case, lambda: createPointLocator(skeleton), **parameters)
+
+  locator = createPointLocator(skeleton)
+  bounds = np.array(skeleton.GetBounds()).reshape(3, 2)
+  positions = np.random.default_rng(seed).uniform(bounds[:, 0], bounds[:, 1], (pickCount, 3))
+
+  def pick():
+    for pos in positions:
+      getClosestVertexAndRadius(locator, pos)
+
+  runner.run("getClosestVertexAndRadius", case, pick, picks=pickCount, **parameters)
+
+
+def runTemplateBenchmarks(runner, skeleton, locator, numberOfTriangles, subdivisionLevels, maxAffixEdgeSlots,
+                          workDirectory):
+  data = createTemplate(skeleton, numberOfTriangles, locator)
+  numberOfPoints = len(data.vectorTagPoints)
+  case = f"triangles={len(data.vectorTagTriangles)}"
+  parameters = dict(skeletonPoints=skeleton.GetNumberOfPoints(), templatePoints=numberOfPoints,
+                    templateTriangles=len(data.vectorTagTriangles))
+
+  mesh = Mesh(data)
+  mesh.meshModelNode = SlicerStandIns.StandInModelNode()
+  runner.run("updateMesh", case, mesh.updateMesh, **parameters)
+
+  logic = createLogic(data)
+  runner.run("generateEdges", case, logic.generateEdges, **parameters)
+
+  # the Affix file stores a dense array of all possible edges
+  edgeSlots = pairNumber(numberOfPoints, numberOfPoints) + 1
+  affixFile = str(Path(workDirectory) / f"benchmark{numberOfPoints}Affix.vtk")
+  if edgeSlots > maxAffixEdgeSlots:
+    reason = f"{edgeSlots} edge slots exceed {maxAffixEdgeSlots}"
+    runner.skip("writeCustomDataToFile", case, reason, **parameters)
+    runner.skip("readCustomData", case, reason, **parameters)
+  else:
+    writer = CustomInformationWriter(data)
+    runner.run("writeCustomDataToFile", case, lambda: writer.writeCustomDataToFile(affixFile), **parameters)
+    if not os.path.exists(affixFile):
+      writer.writeCustomDataToFile(affixFile)
+
+    def read():
+      customInfo = CustomInformation(readPolyData(affixFile))
+      customInfo.readCustomData()
+
+    runner.run("readCustomData", case, read, **parameters)
+
+  # Loop subdivision fails on the branch curve of the multi-sheet template
+  engine = SyntheticSkeletonEngine()
+  engine.data = createTemplate(skeleton, numberOfTriangles, locator, numberOfSheets=1)
+  engine.locator = locator
+  sheetParameters = dict(parameters, templatePoints=len(engine.data.vectorTagPoints),
+                         templateTriangles=len(engine.data.vectorTagTriangles))
+  sheetCase = f"sheetTriangles={len(engine.data.vectorTagTriangles)}"
+  for level in subdivisionLevels:
+    if not runner.isSelected("createSubdivideMesh"):
+      break
+    subdivided = engine.createSubdivideMesh(level)
+    if subdivided is None or subdivided.GetNumberOfCells() == 0:
+      raise RuntimeError(f"Subdivision of the {sheetCase} template at level {level} produced no cells")
+    runner.run("createSubdivideMesh", f"{sheetCase},level={level}", lambda: engine.createSubdivideMesh(level),
+               subdivisionLevel=level, **sheetParameters)
+
+
+def getMetadata():
+  metadata = {
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "processor": platform.processor(),
+    "numpy": np.__version__,
+    "vtk": vtk.vtkVersion.GetVTKVersion(),
+    "slicerStandIns": SlicerStandIns.isInstalled()
+  }
+  try:
+    metadata["commit"] = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=Path(__file__).resolve().parent,
+                                                 stderr=subprocess.DEVNULL, text=True).strip()
+  except (OSError, subprocess.CalledProcessError):
+    pass
+  return metadata
+
+
+def runBenchmarks(skeletonSizes, templateSizes, templateSkeletonSize, subdivisionLevels, repeat=5, warmup=1,
+                  pickCount=1000, maxAffixEdgeSlots=1e6, filters=None, seed=0):
+  """ Runs all benchmarks and returns the results dictionary written to JSON """
+  runner = BenchmarkRunner(repeat, warmup, filters)
+  for size in skeletonSizes:
+    runSkeletonBenchmarks(runner, int(size), pickCount, seed)
+
+  skeleton = createSkeletonPolyData(int(templateSkeletonSize))
+  locator = createPointLocator(skeleton)
+  with tempfile.TemporaryDirectory() as workDirectory:
+    for size in templateSizes:
+      runTemplateBenchmarks(runner, skeleton, locator, int(size), subdivisionLevels, maxAffixEdgeSlots, workDirectory)
+
+  return {
+    "version": RESULTS_FORMAT_VERSION,
+    "metadata": dict(getMetadata(), repeat=repeat, warmup=warmup),
+    "benchmarks": runner.results
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmark SyntheticSkeleton template operations on synthetic data")
+  parser.add_argument("--output", required=True, help="JSON results file")
+  parser.add_argument("--skeletonSizes", type=float, nargs="+", default=[1e2, 1e4, 1e6],
+                      help="number of skeleton vertices for locator and picking benchmarks")
+  parser.add_argument("--templateSizes", type=float, nargs="+", default=[1e2, 1e3, 1e4],
+                      help="number of template triangles for mesh, edge, Affix and subdivision benchmarks")
+  parser.add_argument("--templateSkeletonSize", type=float, default=1e5,
+                      help="number of vertices of the skeleton the templates are placed on")
+  parser.add_argument("--subdivisionLevels", type=int, nargs="+", default=[1, 2])
+  parser.add_argument("--repeat", type=int, default=5, help="timed samples per benchmark")
+  parser.add_argument("--warmup", type=int, default=1, help="untimed calls before sampling")
+  parser.add_argument("--pickCount", type=int, default=1000, help="positions picked per sample")
+  parser.add_argument("--maxAffixEdgeSlots", type=float, default=1e6,
+                      help="skip Affix benchmarks of templates whose dense edge array is larger")
+  parser.add_argument("--filter", nargs="+", default=None, help="only run benchmarks whose name contains one of these")
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("-v", "--verbose", action="store_true")
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+
+  results = runBenchmarks(args.skeletonSizes, args.templateSizes, args.templateSkeletonSize, args.subdivisionLevels,
+                          args.repeat, args.warmup, args.pickCount, args.maxAffixEdgeSlots, args.filter, args.seed)
+  with open(args.output, "w") as f:
+    json.dump(results, f, indent=2)
+  logging.info(f"Results written to {args.output}")
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
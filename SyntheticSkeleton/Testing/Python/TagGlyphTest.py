@@ -0,0 +1,96 @@
+""" Tests of the glyph model of the tag points (SyntheticSkeletonLogic.updateTagGlyphs) with the Slicer stand-ins:
+
+  python -m unittest TagGlyphTest
+"""
+
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def hasModule(name):
+  import importlib.util
+  return importlib.util.find_spec(name) is not None
+
+
+@unittest.skipUnless(hasModule("numpy") and hasModule("vtk"), "requires numpy and vtk")
+class TagGlyphTest(unittest.TestCase):
+
+  def setUp(self):
+    import SlicerStandIns
+    SlicerStandIns.install(force=True)
+    import slicer
+    import vtk
+    from SyntheticSkeleton import SyntheticSkeletonLogic
+    from SyntheticSkeletonLib.Core.Constants import PARAM_TAG_GLYPH_DISPLAY
+    from SyntheticSkeletonLib.Core.Model import Color, Point, TagInfo, TagPoint
+
+    slicer.mrmlScene.Clear()
+    self.logic = logic = SyntheticSkeletonLogic()
+    source = vtk.vtkSphereSource()
+    source.Update()
+    skeleton = slicer.mrmlScene.AddNode(SlicerStandIns.StandInModelNode("Skeleton"))
+    skeleton.SetAndObservePolyData(source.GetOutput())
+    logic.inputModel = skeleton
+
+    # three branch points and one edge point, the edge points are interactive
+    self.nodes = [slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", name) for name in ["B", "E"]]
+    with logic.data.edit():
+      for tagType, node in enumerate(self.nodes, start=1):
+        logic.data.appendTagInfo(TagInfo(tagName=node.GetName(), tagType=tagType, tagColor=Color(255, 0, 0),
+                                         tagIndex=tagType, mrmlNodeID=node.GetID()))
+      for i, comboBoxIndex in enumerate([0, 0, 1, 0]):
+        logic.data.appendPoint(TagPoint(pos=Point(i, 0, 0), radius=1.0, typeIndex=1, comboBoxIndex=comboBoxIndex,
+                                        seq=i))
+    logic.parameterNode.SetParameter(PARAM_TAG_GLYPH_DISPLAY, "true")
+    logic.setInteractiveTagNodes([self.nodes[1]])
+
+  def getGlyphs(self):
+    from SyntheticSkeletonLib.Core.Constants import PARAM_TAG_GLYPH_MODEL
+    return self.logic.parameterNode.GetNodeReference(PARAM_TAG_GLYPH_MODEL).GetPolyData()
+
+  def movePoint(self, index, x):
+    from SyntheticSkeletonLib.Core.Model import Point
+    data = self.logic.data
+    data.setPoint(index, replace(data.vectorTagPoints[index], pos=Point(x, 1, 0)))
+    self.logic.onTemplateModified()
+
+  def test_GlyphsOfPointsThatAreNotInteractive(self):
+    from vtk.util.numpy_support import vtk_to_numpy
+
+    glyphs = self.getGlyphs()
+    tagTypes = vtk_to_numpy(glyphs.GetPointData().GetArray("TagType"))
+    self.assertEqual(set(tagTypes.tolist()), {1})
+    glyphPoints = glyphs.GetNumberOfPoints()
+    self.assertEqual(glyphPoints % 3, 0)
+
+    self.logic.setInteractiveTagNodes([])
+    glyphs = self.getGlyphs()
+    self.assertEqual(glyphs.GetNumberOfPoints(), glyphPoints // 3 * 4)
+    self.assertEqual(set(vtk_to_numpy(glyphs.GetPointData().GetArray("TagType")).tolist()), {1, 2})
+
+  def test_InteractivePointDoesNotRebuildGlyphs(self):
+    glyphs = self.getGlyphs()
+    for x in range(5):
+      self.movePoint(2, x)
+    self.assertTrue(self.logic._workspace.history.undo())
+    self.logic.onTemplateModified()
+    self.assertIs(self.getGlyphs(), glyphs)
+
+    self.movePoint(1, 5)
+    rebuilt = self.getGlyphs()
+    self.assertIsNot(rebuilt, glyphs)
+    self.assertAlmostEqual(rebuilt.GetBounds()[3] - glyphs.GetBounds()[3], 1.0, places=5)
+    self.logic.data.removePoint(2)
+    self.logic.onTemplateModified()
+    self.assertIs(self.getGlyphs(), rebuilt)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,72 @@
+""" Tests of the index of the tag points by skeleton vertex (Core/TagIndex.py):
+
+  python -m unittest TagIndexTest
+"""
+
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+
+MODULE_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(MODULE_DIR))
+
+from SyntheticSkeletonLib.Core.History import EditHistory
+from SyntheticSkeletonLib.Core.Model import CustomInformation, Point, TagPoint
+from SyntheticSkeletonLib.Core.TagIndex import VertexTagIndex
+
+
+def createPoint(seq):
+  return TagPoint(pos=Point(seq, 0, 0), radius=1.0, typeIndex=1, comboBoxIndex=0, seq=seq)
+
+
+class VertexTagIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.data = CustomInformation()
+    self.history = EditHistory(self.data)
+    self.index = VertexTagIndex(self.data)
+    for seq in [4, 7, 4, 9]:
+      self.data.appendPoint(createPoint(seq))
+
+  def test_IsOccupied(self):
+    index = self.index
+    self.assertTrue(index.isOccupied(7))
+    self.assertFalse(index.isOccupied(8))
+    # the point moved is not counted
+    self.assertFalse(index.isOccupied(7, pointIndex=1))
+    self.assertTrue(index.isOccupied(4, pointIndex=0))
+
+  def test_DuplicatesFollowEdits(self):
+    data, index = self.data, self.index
+    self.assertEqual(index.getDuplicates(), {4: [0, 2]})
+    data.removePoint(0)
+    self.assertEqual(index.getDuplicates(), {})
+    self.assertEqual(index.getPointIndices(9), [2])
+    data.setPoint(2, replace(data.vectorTagPoints[2], seq=7))
+    self.assertEqual(index.getDuplicates(), {7: [0, 2]})
+    self.history.undo()
+    self.history.undo()
+    self.assertEqual(index.getDuplicates(), {4: [0, 2]})
+    self.assertEqual(index.getCount(9), 1)
+
+  def test_UnsnappedPointsAreNotIndexed(self):
+    self.data.appendPoint(createPoint(-1))
+    self.data.appendPoint(createPoint(-1))
+    self.assertEqual(self.index.getCount(-1), 0)
+    self.assertEqual(self.index.getDuplicates(), {4: [0, 2]})
+
+  def test_AttachResetsIndex(self):
+    other = CustomInformation()
+    other.appendPoint(createPoint(3))
+    self.index.attach(other)
+    self.assertFalse(self.index.hasDuplicates())
+    self.assertEqual(self.index.getPointIndices(3), [0])
+    # edits of the former template are ignored
+    self.data.appendPoint(createPoint(3))
+    self.assertEqual(self.index.getCount(3), 1)
+
+
+if __name__ == "__main__":
+  unittest.main()